@@ -8,9 +8,13 @@ import mouse
 import threading
 import os
 from typing import Dict, List, Optional, Tuple, Union
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from enum import Enum, auto
 import tkinter as tk
+from automation_engine import WAIT_CONDITIONS, WAIT_TIMEOUT, compile_commands, describe_command, parse_color
+from image_anchor import TemplateMatcher, capture_reference
+from input_drivers import RecordingDriver
+from script_library import ScriptLibrary
 
 # Set appearance mode and default color theme
 ctk.set_appearance_mode("Dark")  # Modes: "System" (standard), "Dark", "Light"
@@ -19,12 +23,21 @@ ctk.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark
 # File paths for saving data
 COMMANDS_FILE = "commands.json"
 WINDOW_STATE_FILE = "window_state.json"
+ANCHOR_DIR = os.path.join("scripts", "images")  # reference images captured for image clicks
+TRACE_DIR = os.path.join("scripts", "traces")  # dry-run traces
+MARKER_BATCH = 25  # markers created per event-loop pass when a script loads
 
 class CommandType(Enum):
     CLICK = auto()
     TYPE = auto()
     HOTKEY = auto()
     DELAY = auto()
+    WAIT_UNTIL = auto()
+    LOOP = auto()
+    IF = auto()
+    ELSE = auto()
+    END = auto()
+    CALL = auto()
 
 @dataclass
 class Command:
@@ -36,6 +49,34 @@ class Command:
     text: Optional[str] = None
     keys: Optional[str] = None
     seconds: Optional[float] = None
+    image: Optional[str] = None  # reference image the click is located by at run time
+    confidence: Optional[float] = None  # match threshold for image
+    condition: Optional[str] = None  # WAIT_UNTIL/IF: 'pixel', 'image', 'region_changed' or 'region_stable'
+    region: Optional[Tuple[int, int, int, int]] = None  # left, top, width, height a condition looks at
+    color: Optional[str] = None  # '#rrggbb' of a pixel condition
+    tolerance: int = 0  # per-channel colour tolerance of a pixel condition
+    negate: bool = False  # wait for / branch on the condition not holding
+    count: Optional[int] = None  # LOOP repetitions
+    script: Optional[str] = None  # CALL: name of the saved script to run
+
+def command_to_dict(cmd):
+    # Commands are saved with their type as its number
+    cmd_dict = asdict(cmd)
+    cmd_dict["type"] = cmd.type.value
+    return cmd_dict
+
+def command_from_dict(cmd_dict):
+    # Fields missing from older scripts take their defaults
+    fields = {key: value for key, value in cmd_dict.items() if key in Command.__dataclass_fields__}
+    fields["type"] = CommandType(cmd_dict["type"])
+    if fields.get("region") is not None:
+        fields["region"] = tuple(fields["region"])
+    return Command(**fields)
+
+def read_script(script_name):
+    # Commands of a saved script, for CALL
+    with open(os.path.join("scripts", f"{script_name}.json"), "r") as f:
+        return [command_from_dict(cmd_dict) for cmd_dict in json.load(f)["commands"]]
 
 class PyAutoGUIEditor(ctk.CTk):
     def __init__(self):
@@ -52,6 +93,10 @@ class PyAutoGUIEditor(ctk.CTk):
         self.markers = []
         self.marker_counter = 1
         self.running = False
+        self.image_matcher = TemplateMatcher()  # remembers where images were last seen between runs
+        self.library = ScriptLibrary("scripts")
+        self.current_script = None  # name of the script last saved or loaded
+        self.marker_generation = 0  # bumped on every load so stale marker batches stop
         
         # Create main container
         self.main_container = ctk.CTkFrame(self)
@@ -142,6 +187,16 @@ class PyAutoGUIEditor(ctk.CTk):
         )
         self.add_click_btn.pack(fill="x", padx=5, pady=5)
         
+        # Add Image Click button
+        self.add_image_click_btn = ctk.CTkButton(
+            self.right_panel,
+            text="🖼️ Add Image Click",
+            command=self.add_image_click,
+            fg_color="#4B8BBE",  # Python blue
+            hover_color="#306998"  # Darker Python blue
+        )
+        self.add_image_click_btn.pack(fill="x", padx=5, pady=5)
+        
         # Add Type Text button
         self.add_type_btn = ctk.CTkButton(
             self.right_panel,
@@ -172,6 +227,16 @@ class PyAutoGUIEditor(ctk.CTk):
         )
         self.add_delay_btn.pack(fill="x", padx=5, pady=5)
         
+        # Add Wait / Loop / If / Call button
+        self.add_control_btn = ctk.CTkButton(
+            self.right_panel,
+            text="🧩 Add Wait / Loop / If / Call",
+            command=self.add_control_command,
+            fg_color="#4682B4",  # Steel blue
+            hover_color="#3672A4"  # Darker steel blue
+        )
+        self.add_control_btn.pack(fill="x", padx=5, pady=5)
+        
         # Add Run button
         self.run_btn = ctk.CTkButton(
             self.right_panel,
@@ -182,6 +247,16 @@ class PyAutoGUIEditor(ctk.CTk):
         )
         self.run_btn.pack(fill="x", padx=5, pady=5)
         
+        # Add Dry Run button
+        self.dry_run_btn = ctk.CTkButton(
+            self.right_panel,
+            text="🧪 Dry Run",
+            command=self.dry_run_commands,
+            fg_color="#6B8E23",  # Olive drab
+            hover_color="#5B7E13"  # Darker olive drab
+        )
+        self.dry_run_btn.pack(fill="x", padx=5, pady=5)
+        
         # Add Save button
         self.save_btn = ctk.CTkButton(
             self.right_panel,
@@ -233,6 +308,30 @@ class PyAutoGUIEditor(ctk.CTk):
         # Update status
         self.status_bar.configure(text=f"Created marker at ({x}, {y}). Drag to adjust position.")
 
+    def add_image_click(self):
+        # Capture the area under the mouse; the click finds it again by image when it runs
+        x, y = pyautogui.position()
+        path = os.path.join(ANCHOR_DIR, f"anchor_{time.strftime('%Y%m%d_%H%M%S')}_{len(self.commands) + 1}.png")
+        try:
+            offset_x, offset_y = capture_reference(path, (x, y))
+        except Exception as e:
+            self.status_bar.configure(text=f"Error capturing image: {str(e)}")
+            return
+        
+        cmd = Command(
+            type=CommandType.CLICK,
+            x=x,
+            y=y,
+            offset_x=offset_x,
+            offset_y=offset_y,
+            image=path
+        )
+        self.commands.append(cmd)
+        self.create_screen_marker(x, y, len(self.commands) - 1)
+        self.update_command_list()
+        
+        self.status_bar.configure(text=f"Created image click at ({x}, {y}), reference saved to {path}")
+
     def create_screen_marker(self, x, y, index):
         # Create a new window for the marker
         marker = ctk.CTkToplevel(self)
@@ -499,6 +598,126 @@ class PyAutoGUIEditor(ctk.CTk):
         dialog.focus_force()
         dialog.grab_set()
 
+    def add_control_command(self, index=None):
+        # Add a control-flow command, or edit the one at index
+        cmd = self.commands[index] if index is not None else Command(type=CommandType.WAIT_UNTIL, condition="pixel")
+        
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Edit Control Command" if index is not None else "Add Control Command")
+        dialog.geometry("380x560")
+        dialog.transient(self)
+        
+        def row(label, widget_factory):
+            frame = ctk.CTkFrame(dialog)
+            frame.pack(fill="x", padx=10, pady=3)
+            ctk.CTkLabel(frame, text=label, width=110, anchor="w").pack(side="left", padx=5)
+            widget = widget_factory(frame)
+            widget.pack(side="left", fill="x", expand=True, padx=5)
+            return widget
+        
+        def entry(frame, value):
+            widget = ctk.CTkEntry(frame)
+            if value is not None:
+                widget.insert(0, str(value))
+            return widget
+        
+        type_var = tk.StringVar(value=cmd.type.name)
+        row("Command:", lambda f: ctk.CTkOptionMenu(
+            f, variable=type_var, values=["WAIT_UNTIL", "LOOP", "IF", "ELSE", "END", "CALL"]))
+        condition_var = tk.StringVar(value=cmd.condition or "pixel")
+        row("Condition:", lambda f: ctk.CTkOptionMenu(f, variable=condition_var, values=list(WAIT_CONDITIONS)))
+        x_entry = row("X:", lambda f: entry(f, cmd.x))
+        y_entry = row("Y:", lambda f: entry(f, cmd.y))
+        color_entry = row("Colour (#rrggbb):", lambda f: entry(f, cmd.color))
+        tolerance_entry = row("Tolerance:", lambda f: entry(f, cmd.tolerance))
+        region_entry = row("Region (l, t, w, h):", lambda f: entry(f, ", ".join(map(str, cmd.region)) if cmd.region else None))
+        image_entry = row("Image:", lambda f: entry(f, cmd.image))
+        negate_var = tk.BooleanVar(value=cmd.negate)
+        row("", lambda f: ctk.CTkCheckBox(f, text="Condition must NOT hold", variable=negate_var))
+        timeout_entry = row("Timeout (s):", lambda f: entry(f, cmd.seconds if cmd.seconds is not None else WAIT_TIMEOUT))
+        count_entry = row("Loop count:", lambda f: entry(f, cmd.count))
+        script_entry = row("Script to call:", lambda f: entry(f, cmd.script))
+        
+        def set_entry(widget, value):
+            widget.delete(0, tk.END)
+            widget.insert(0, value)
+        
+        def use_mouse():
+            # Read the position (and pixel colour, or a reference image) under the mouse after a countdown
+            def capture(remaining):
+                if remaining:
+                    self.status_bar.configure(text=f"Capturing under the mouse in {remaining}...")
+                    dialog.after(1000, lambda: capture(remaining - 1))
+                    return
+                x, y = pyautogui.position()
+                set_entry(x_entry, x)
+                set_entry(y_entry, y)
+                set_entry(color_entry, "#{:02x}{:02x}{:02x}".format(*pyautogui.pixel(x, y)[:3]))
+                set_entry(region_entry, f"{max(0, x - 100)}, {max(0, y - 50)}, 200, 100")
+                if condition_var.get() == "image":
+                    path = os.path.join(ANCHOR_DIR, f"anchor_{time.strftime('%Y%m%d_%H%M%S')}_{len(self.commands) + 1}.png")
+                    try:
+                        capture_reference(path, (x, y))
+                        set_entry(image_entry, path)
+                    except Exception as e:
+                        self.status_bar.configure(text=f"Error capturing image: {str(e)}")
+                        return
+                self.status_bar.configure(text=f"Captured ({x}, {y})")
+            capture(3)
+        
+        ctk.CTkButton(dialog, text="📍 Capture Under Mouse (3s)", command=use_mouse).pack(pady=5)
+        
+        def optional_int(widget):
+            text = widget.get().strip()
+            return int(text) if text else None
+        
+        def apply():
+            try:
+                kind = CommandType[type_var.get()]
+                new_cmd = Command(type=kind)
+                if kind in (CommandType.WAIT_UNTIL, CommandType.IF):
+                    new_cmd.condition = condition_var.get()
+                    new_cmd.x, new_cmd.y = optional_int(x_entry), optional_int(y_entry)
+                    new_cmd.color = color_entry.get().strip() or None
+                    if new_cmd.color:
+                        parse_color(new_cmd.color)
+                    new_cmd.tolerance = optional_int(tolerance_entry) or 0
+                    region_text = region_entry.get().strip()
+                    new_cmd.region = tuple(int(value) for value in region_text.split(",")) if region_text else None
+                    new_cmd.image = image_entry.get().strip() or None
+                    new_cmd.negate = negate_var.get()
+                    if kind == CommandType.WAIT_UNTIL:
+                        new_cmd.seconds = float(timeout_entry.get())
+                elif kind == CommandType.LOOP:
+                    new_cmd.count = optional_int(count_entry)
+                    if not new_cmd.count or new_cmd.count < 1:
+                        raise ValueError("loop count must be at least 1")
+                elif kind == CommandType.CALL:
+                    new_cmd.script = script_entry.get().strip()
+                    if not new_cmd.script:
+                        raise ValueError("enter the name of a saved script")
+            except (KeyError, ValueError) as e:
+                self.status_bar.configure(text=f"Invalid command: {str(e)}")
+                return
+            
+            if index is not None:
+                self.commands[index] = new_cmd
+            else:
+                self.commands.append(new_cmd)
+            self.update_command_list()
+            self.status_bar.configure(text=f"{describe_command(new_cmd)}")
+            dialog.destroy()
+        
+        # Add apply button
+        ctk.CTkButton(dialog, text="Apply", command=apply).pack(pady=10)
+        
+        # Ensure window is visible before grabbing focus
+        dialog.update()
+        dialog.deiconify()
+        dialog.lift()
+        dialog.focus_force()
+        dialog.grab_set()
+
     def remove_command_at_index(self, index):
         if 0 <= index < len(self.commands):
             if self.commands[index].type == CommandType.CLICK:
@@ -540,7 +759,10 @@ class PyAutoGUIEditor(ctk.CTk):
                 offset_text = ""
                 if cmd.offset_x != 0 or cmd.offset_y != 0:
                     offset_text = f" [offset: {cmd.offset_x}, {cmd.offset_y}]"
-                cmd_text.insert("1.0", f"{i}. Click at ({cmd.x}, {cmd.y}){offset_text}")
+                if cmd.image:
+                    cmd_text.insert("1.0", f"{i}. Click image {os.path.basename(cmd.image)}{offset_text}")
+                else:
+                    cmd_text.insert("1.0", f"{i}. Click at ({cmd.x}, {cmd.y}){offset_text}")
                 
                 # Add offset button for click commands
                 offset_btn = ctk.CTkButton(
@@ -559,6 +781,8 @@ class PyAutoGUIEditor(ctk.CTk):
                 cmd_text.insert("1.0", f"{i}. Hotkey: {cmd.keys}")
             elif cmd.type == CommandType.DELAY:
                 cmd_text.insert("1.0", f"{i}. Delay: {cmd.seconds} seconds")
+            else:
+                cmd_text.insert("1.0", f"{i}. {describe_command(cmd)}")
             
             # Make text box read-only
             cmd_text.configure(state="disabled")
@@ -677,6 +901,9 @@ class PyAutoGUIEditor(ctk.CTk):
 
     def edit_command(self, index):
         cmd = self.commands[index]
+        if cmd.type not in (CommandType.CLICK, CommandType.TYPE, CommandType.HOTKEY, CommandType.DELAY):
+            self.add_control_command(index)
+            return
         
         # Create a dialog for editing
         dialog = ctk.CTkToplevel(self)
@@ -799,47 +1026,87 @@ class PyAutoGUIEditor(ctk.CTk):
         progress_window.focus_force()
         progress_window.grab_set()
         
+        # Compile up front: bad commands are reported before any input is sent
+        try:
+            program = compile_commands(self.commands, driver=pyautogui, matcher=self.image_matcher,
+                                       load_script=read_script)
+        except ValueError as e:
+            progress_window.destroy()
+            self.running = False
+            self.run_btn.configure(state="normal")
+            self.status_bar.configure(text=f"Error: {str(e)}")
+            return
+        
+        script_name = self.current_script
+        
+        def show_progress(i, count):
+            # Use after() to safely update UI from thread
+            self.after(0, lambda: progress_label.configure(text=f"Running step {i+1}/{count}"))
+        
         def run_commands_thread():
+            report = None
             try:
-                for i, cmd in enumerate(self.commands):
-                    if not self.running:
-                        break
-                    # Use after() to safely update UI from thread
-                    self.after(0, lambda: progress_label.configure(
-                        text=f"Running command {i+1}/{len(self.commands)}"
-                    ))
-                    if cmd.type == CommandType.CLICK:
-                        # Apply offsets when clicking
-                        x = cmd.x + cmd.offset_x
-                        y = cmd.y + cmd.offset_y
-                        pyautogui.click(x, y)
-                    elif cmd.type == CommandType.TYPE:
-                        pyautogui.typewrite(cmd.text)
-                    elif cmd.type == CommandType.HOTKEY:
-                        pyautogui.hotkey(*cmd.keys.split("+"))
-                    elif cmd.type == CommandType.DELAY:
-                        time.sleep(cmd.seconds)
+                report = program.run(should_continue=lambda: self.running, on_step=show_progress)
                 self.after(0, progress_window.destroy)
+                if report.completed and script_name:
+                    # The index belongs to the Tk thread
+                    self.after(0, lambda: self.library.record_run(script_name, report.total))
             except Exception as e:
                 self.after(0, lambda: self.status_bar.configure(text=f"Error: {str(e)}"))
             finally:
                 self.running = False
                 self.after(0, lambda: self.run_btn.configure(state="normal"))
-                self.after(0, lambda: self.status_bar.configure(text="Ready"))
+                if report is not None:
+                    self.after(0, lambda: self.status_bar.configure(
+                        text=report.error and f"Error: {report.error}" or report.summary()
+                    ))
         
         threading.Thread(target=run_commands_thread, daemon=True).start()
 
+    def dry_run_commands(self):
+        # Run the script against a still of the screen without sending any input, and save what it would do
+        if self.running:
+            self.status_bar.configure(text="Already running commands")
+            return
+        
+        driver = RecordingDriver(screen=pyautogui.screenshot())
+        try:
+            program = compile_commands(self.commands, driver=driver, load_script=read_script)
+        except ValueError as e:
+            self.status_bar.configure(text=f"Error: {str(e)}")
+            return
+        report = program.run()
+        
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        trace_path = os.path.join(TRACE_DIR, f"{self.current_script or 'unsaved'}.jsonl")
+        driver.trace.save(trace_path)
+        if report.error:
+            self.status_bar.configure(text=f"Dry run error: {report.error}")
+        else:
+            self.status_bar.configure(text=f"Dry run: {len(driver.trace.inputs())} actions in "
+                                           f"{report.total:.3f}s simulated, trace saved to {trace_path}")
+
     def save_commands(self):
         # Create a dialog for naming the script
         dialog = ctk.CTkToplevel(self)
         dialog.title("Save Script")
-        dialog.geometry("300x150")
+        dialog.geometry("300x220")
         dialog.transient(self)
         
         # Add script name input
         ctk.CTkLabel(dialog, text="Enter script name:").pack(pady=10)
         name_entry = ctk.CTkEntry(dialog, width=200)
         name_entry.pack(pady=5)
+        if self.current_script:
+            name_entry.insert(0, self.current_script)
+        
+        # Add tags input
+        ctk.CTkLabel(dialog, text="Tags (comma separated):").pack(pady=5)
+        tags_entry = ctk.CTkEntry(dialog, width=200)
+        tags_entry.pack(pady=5)
+        info = self.library.get(self.current_script) if self.current_script else None
+        if info and info.tags:
+            tags_entry.insert(0, ", ".join(info.tags))
         
         def apply_save():
             script_name = name_entry.get().strip()
@@ -855,19 +1122,7 @@ class PyAutoGUIEditor(ctk.CTk):
             file_path = os.path.join("scripts", f"{script_name}.json")
             
             # Convert commands to serializable format
-            serializable_commands = []
-            for cmd in self.commands:
-                cmd_dict = {
-                    "type": cmd.type.value,
-                    "x": cmd.x,
-                    "y": cmd.y,
-                    "text": cmd.text,
-                    "keys": cmd.keys,
-                    "seconds": cmd.seconds,
-                    "offset_x": cmd.offset_x,
-                    "offset_y": cmd.offset_y
-                }
-                serializable_commands.append(cmd_dict)
+            serializable_commands = [command_to_dict(cmd) for cmd in self.commands]
             
             # Save marker positions
             marker_positions = []
@@ -880,12 +1135,14 @@ class PyAutoGUIEditor(ctk.CTk):
             # Save everything to file
             data = {
                 "commands": serializable_commands,
-                "marker_positions": marker_positions
+                "marker_positions": marker_positions,
+                "tags": [tag.strip() for tag in tags_entry.get().split(",") if tag.strip()]
             }
             
             with open(file_path, "w") as f:
                 json.dump(data, f, indent=4)
             
+            self.current_script = script_name
             self.status_bar.configure(text=f"Script '{script_name}' saved!")
             dialog.destroy()
         
@@ -903,7 +1160,7 @@ class PyAutoGUIEditor(ctk.CTk):
         # Create a dialog for selecting a script
         dialog = ctk.CTkToplevel(self)
         dialog.title("Load Script")
-        dialog.geometry("400x300")
+        dialog.geometry("500x400")
         dialog.transient(self)
         
         # Create a frame for the list
@@ -914,13 +1171,14 @@ class PyAutoGUIEditor(ctk.CTk):
         scroll_frame = ctk.CTkScrollableFrame(list_frame)
         scroll_frame.pack(fill="both", expand=True)
         
-        # Get list of saved scripts
-        if not os.path.exists("scripts"):
-            os.makedirs("scripts")
+        # Bring the index up to date; only new or changed files are read
+        self.library.scan()
         
-        script_files = [f for f in os.listdir("scripts") if f.endswith(".json")]
+        # Add search box above the list
+        search_entry = ctk.CTkEntry(list_frame, placeholder_text="Search names, tags, typed text and hotkeys")
+        search_entry.pack(fill="x", pady=(0, 5), before=scroll_frame)
         
-        if not script_files:
+        if not self.library.search(limit=1):
             ctk.CTkLabel(scroll_frame, text="No saved scripts found").pack(pady=10)
         else:
             # Create a frame for the listbox
@@ -942,10 +1200,21 @@ class PyAutoGUIEditor(ctk.CTk):
             )
             script_listbox.pack(fill="both", expand=True)
             
-            # Add scripts to listbox
-            for script_file in script_files:
-                script_name = os.path.splitext(script_file)[0]
-                script_listbox.insert(tk.END, script_name)
+            # Scripts currently listed, in listbox order
+            shown = []
+            
+            def show_scripts(event=None):
+                shown[:] = self.library.search(search_entry.get())
+                script_listbox.delete(0, tk.END)
+                for info in shown:
+                    details = [f"{info.steps} steps"] + info.tags
+                    if info.last_run_seconds is not None:
+                        details.append(f"last run {info.last_run_seconds:.1f}s")
+                    prefix = "⚠ " if info.error else ""
+                    script_listbox.insert(tk.END, f"{prefix}{info.name}  ({', '.join(details)})")
+            
+            search_entry.bind("<KeyRelease>", show_scripts)
+            show_scripts()
             
             # Create a frame for buttons
             button_frame = ctk.CTkFrame(dialog)
@@ -957,7 +1226,7 @@ class PyAutoGUIEditor(ctk.CTk):
                 try:
                     selection = script_listbox.curselection()
                     if selection:
-                        script_name = script_listbox.get(selection[0])
+                        script_name = shown[selection[0]].name
                         script_file = f"{script_name}.json"
                         self.load_script(script_file, dialog)
                     else:
@@ -965,6 +1234,8 @@ class PyAutoGUIEditor(ctk.CTk):
                 except:
                     self.status_bar.configure(text="Please select a script to load")
             
+            script_listbox.bind("<Double-Button-1>", lambda event: load_selected())
+            
             load_btn = ctk.CTkButton(
                 button_frame,
                 text="Load",
@@ -979,7 +1250,7 @@ class PyAutoGUIEditor(ctk.CTk):
                 try:
                     selection = script_listbox.curselection()
                     if selection:
-                        script_name = script_listbox.get(selection[0])
+                        script_name = shown[selection[0]].name
                         script_file = f"{script_name}.json"
                         file_path = os.path.join("scripts", script_file)
                         
@@ -1065,9 +1336,16 @@ class PyAutoGUIEditor(ctk.CTk):
         dialog.grab_set()
     
     def load_script(self, script_file, dialog):
+        # Refuse scripts the index found to be broken before clearing anything
+        script_name = os.path.splitext(script_file)[0]
+        info = self.library.get(script_name)
+        if info and info.error:
+            self.status_bar.configure(text=f"Can't load '{script_name}': {info.error}")
+            return
+        
         # Clear existing commands and markers
         self.commands.clear()
-        for marker in self.markers:
+        for marker in set(self.markers) | set(self.screen_markers):
             marker.destroy()
         self.markers.clear()
         self.screen_markers.clear()  # Clear screen_markers list as well
@@ -1079,25 +1357,12 @@ class PyAutoGUIEditor(ctk.CTk):
         
         # Restore commands
         for cmd_dict in data["commands"]:
-            cmd = Command(
-                type=CommandType(cmd_dict["type"]),
-                x=cmd_dict["x"],
-                y=cmd_dict["y"],
-                text=cmd_dict["text"],
-                keys=cmd_dict["keys"],
-                seconds=cmd_dict["seconds"]
-            )
-            cmd.offset_x = cmd_dict["offset_x"]
-            cmd.offset_y = cmd_dict["offset_y"]
-            self.commands.append(cmd)
+            self.commands.append(command_from_dict(cmd_dict))
         
-        # Create new markers for each click command
-        for i, cmd in enumerate(self.commands):
-            if cmd.type == CommandType.CLICK:
-                # Create a new marker window at the saved position
-                marker = self.create_screen_marker(cmd.x - 20, cmd.y - 20, i)  # Adjust for marker center
-                self.markers.append(marker)
-                self.screen_markers.append(marker)
+        # Create markers for click commands a batch at a time, so a long script doesn't freeze the window
+        self.marker_generation += 1
+        clicks = [(i, cmd) for i, cmd in enumerate(self.commands) if cmd.type == CommandType.CLICK]
+        self.create_markers_batched(clicks, self.marker_generation)
         
         # Update command list
         self.update_command_list()
@@ -1106,13 +1371,23 @@ class PyAutoGUIEditor(ctk.CTk):
         dialog.destroy()
         
         # Show success message
-        script_name = os.path.splitext(script_file)[0]
+        self.current_script = script_name
         self.status_bar.configure(text=f"Script '{script_name}' loaded!")
         
         # Force show all markers and update button state
         self.show_all_markers()
         self.show_markers_btn.configure(text="👁️ Hide All Markers")
 
+    def create_markers_batched(self, clicks, generation, start=0):
+        # A newer load has replaced these commands
+        if generation != self.marker_generation:
+            return
+        for i, cmd in clicks[start:start + MARKER_BATCH]:
+            # create_screen_marker centres the marker on the position and registers it
+            self.markers.append(self.create_screen_marker(cmd.x, cmd.y, i))
+        if start + MARKER_BATCH < len(clicks):
+            self.after(1, lambda: self.create_markers_batched(clicks, generation, start + MARKER_BATCH))
+
 if __name__ == "__main__":
     app = PyAutoGUIEditor()
     app.mainloop() 
\ No newline at end of file
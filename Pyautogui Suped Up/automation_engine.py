@@ -0,0 +1,610 @@
+"""
+Automation Engine Module
+Compiles Command lists into deadline-scheduled steps with per-step timing.
+
+compile_commands() turns a list of Command objects into a Program once:
+every command type is looked up in a dispatch table that resolves it to a
+driver call with its arguments bound, consecutive TYPE commands are merged
+into a single write, and DELAY commands become time on the schedule rather
+than steps. Program.run() starts each step at its planned offset from the
+start of the run, measured on the monotonic clock, so sleeps don't add up
+and a delay absorbs however long the step before it took. Driver calls
+skip pyautogui's per-call PAUSE; pacing comes from the schedule alone.
+A CLICK with an `image` is located on screen when it runs (image_anchor),
+so it keeps working after the target window moves.
+
+Control flow is written inline: WAIT_UNTIL blocks until a pixel, region or
+image condition holds, LOOP ... END repeats, IF ... [ELSE ...] END branches
+and CALL runs another script. Conditions grab only the pixel or region they
+look at and are polled with an interval that starts short and backs off;
+steps after a wait, loop, branch or call are scheduled from when it ended.
+
+Time is read from the driver's `clock` (anything with monotonic() and
+sleep(), the time module by default), so a program run against the
+recording driver in input_drivers takes simulated time and returns at once.
+"""
+
+import os
+import time
+import json
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds left before a deadline below which the runner spins instead of sleeping
+SPIN_THRESHOLD = 0.002
+# Longest single sleep while waiting, so a cancel is noticed promptly
+MAX_SLEEP_SLICE = 0.05
+# WAIT_UNTIL polling: first interval, growth per miss and ceiling (seconds)
+POLL_MIN = 0.01
+POLL_BACKOFF = 1.5
+POLL_MAX = 0.1
+# WAIT_UNTIL timeout for commands that don't set seconds
+WAIT_TIMEOUT = 10.0
+# A region counts as settled once it has looked the same for this long
+STABLE_SECONDS = 0.3
+# Conditions a WAIT_UNTIL can use; IF only takes the ones that can be checked at once
+WAIT_CONDITIONS = ('pixel', 'image', 'region_changed', 'region_stable')
+IF_CONDITIONS = ('pixel', 'image')
+
+
+@dataclass
+class Step:
+    """One driver call of a compiled program"""
+    kind: str
+    label: str
+    func: Callable
+    args: Tuple = ()
+    kwargs: Dict = field(default_factory=dict)
+    offset: float = 0.0  # planned start, seconds after the start of its block
+    commands: Tuple[int, ...] = ()  # positions of the source commands
+
+
+@dataclass
+class Wait:
+    """Blocks until a condition holds, polling it with back-off"""
+    label: str
+    condition: Callable[[], Callable[[], bool]]  # returns a fresh check for each wait
+    timeout: float
+    offset: float = 0.0
+    commands: Tuple[int, ...] = ()
+    kind = "WAIT_UNTIL"
+
+
+@dataclass
+class Loop:
+    label: str
+    body: 'Program'
+    count: int
+    offset: float = 0.0
+    commands: Tuple[int, ...] = ()
+    kind = "LOOP"
+
+
+@dataclass
+class Branch:
+    label: str
+    condition: Callable[[], Callable[[], bool]]
+    then: 'Program'
+    orelse: 'Program'
+    offset: float = 0.0
+    commands: Tuple[int, ...] = ()
+    kind = "IF"
+
+
+@dataclass
+class Call:
+    label: str
+    body: 'Program'
+    offset: float = 0.0
+    commands: Tuple[int, ...] = ()
+    kind = "CALL"
+
+
+@dataclass
+class StepTiming:
+    index: int
+    kind: str
+    label: str
+    planned: float  # seconds after the start of the run
+    started: float
+    duration: float
+
+    @property
+    def late(self) -> float:
+        return max(0.0, self.started - self.planned)
+
+
+@dataclass
+class RunReport:
+    """Timing of every executed step of a run"""
+    steps: List[StepTiming]
+    total: float
+    planned: float
+    completed: bool
+    error: Optional[str] = None
+
+    def summary(self) -> str:
+        if not self.steps:
+            return "No steps run"
+        slowest = max(self.steps, key=lambda step: step.duration)
+        state = "completed" if self.completed else ("failed" if self.error else "stopped")
+        return (f"{len(self.steps)} steps {state} in {self.total:.3f}s (planned {self.planned:.3f}s), "
+                f"max late {max(step.late for step in self.steps) * 1000:.1f}ms, "
+                f"slowest step {slowest.index + 1} ({slowest.kind}) {slowest.duration * 1000:.1f}ms")
+
+    def table(self) -> str:
+        """Fixed-width per-step timing table"""
+        rows = [f"{'step':>5} {'kind':10} {'planned':>9} {'started':>9} {'late':>8} {'took':>8}  label"]
+        for step in self.steps:
+            rows.append(f"{step.index + 1:>5} {step.kind:10} {step.planned:>9.3f} {step.started:>9.3f} "
+                        f"{step.late * 1000:>6.1f}ms {step.duration * 1000:>6.1f}ms  {step.label}")
+        return "\n".join(rows)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'total': self.total,
+            'planned': self.planned,
+            'completed': self.completed,
+            'error': self.error,
+            'steps': [{'index': step.index, 'kind': step.kind, 'label': step.label, 'planned': step.planned,
+                       'started': step.started, 'duration': step.duration, 'late': step.late}
+                      for step in self.steps],
+        }, indent=2)
+
+
+class Program:
+    """A compiled command list, runnable any number of times"""
+
+    def __init__(self, steps: List, duration: float, clock=time):
+        self.steps = steps
+        self.duration = duration  # planned time after the last wait, loop, branch or call (delays and settles)
+        self.clock = clock  # monotonic() and sleep() the run is scheduled on
+
+    def __len__(self):
+        return len(self.steps)
+
+    @property
+    def planned(self) -> float:
+        """Fixed scheduled time of a run (delays and settles); waits add to it"""
+        total = self.duration
+        for node in self.steps:
+            if isinstance(node, Loop):
+                total += node.offset + node.count * node.body.planned
+            elif isinstance(node, Branch):
+                total += node.offset + max(node.then.planned, node.orelse.planned)
+            elif isinstance(node, Call):
+                total += node.offset + node.body.planned
+            elif isinstance(node, Wait):
+                total += node.offset
+        return total
+
+    def run(self, should_continue: Callable[[], bool] = lambda: True,
+            on_step: Optional[Callable[[int, int], None]] = None,
+            record: Optional[Callable[[str, float], None]] = None, clock=None) -> RunReport:
+        """
+        Run every step at its deadline. should_continue is polled before each
+        step and while waiting; on_step(index, count) is called as each
+        top-level step starts; record(name, seconds) receives each step's
+        duration. clock overrides the program's clock.
+        """
+        runner = _Runner(should_continue, record, clock or self.clock)
+        error = None
+        try:
+            completed = runner.block(self, on_step)
+        except _StepFailed as e:
+            completed = False
+            error = str(e)
+        return RunReport(runner.timings, runner.clock.monotonic() - runner.started, self.planned, completed, error)
+
+
+class _StepFailed(Exception):
+    pass
+
+
+class _Runner:
+    """State of one run of a Program"""
+
+    def __init__(self, should_continue: Callable[[], bool], record: Optional[Callable[[str, float], None]], clock):
+        self.should_continue = should_continue
+        self.record = record
+        self.clock = clock
+        self.timings: List[StepTiming] = []
+        self.started = clock.monotonic()
+
+    def block(self, program: Program, on_step=None) -> bool:
+        """Run a program's steps on their deadlines; False if cancelled"""
+        base = self.clock.monotonic()
+        count = len(program.steps)
+        for index, node in enumerate(program.steps):
+            if not _wait_until(base + node.offset, self.should_continue, self.clock):
+                return False
+            if on_step is not None:
+                on_step(index, count)
+            if isinstance(node, Step):
+                self.call(node, base, node.func, *node.args, **node.kwargs)
+                continue
+            if isinstance(node, Wait):
+                finished = self.wait(node, base)
+            elif isinstance(node, Branch):
+                holds = self.call(node, base, lambda: node.condition()())
+                finished = self.block(node.then if holds else node.orelse)
+            elif isinstance(node, Loop):
+                finished = all(self.block(node.body) for _ in range(node.count))
+            else:
+                finished = self.block(node.body)
+            if not finished:
+                return False
+            # Later steps are scheduled from when this one ended
+            base = self.clock.monotonic()
+        # A trailing delay is part of the script (e.g. waiting for an order to go through)
+        return _wait_until(base + program.duration, self.should_continue, self.clock)
+
+    def call(self, node, base: float, func: Callable, *args, **kwargs):
+        begin = self.clock.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.timed(node, base, begin)
+            raise _StepFailed(f"Step {len(self.timings)} ({node.label}): {e}") from e
+        self.timed(node, base, begin)
+        return result
+
+    def wait(self, wait: Wait, base: float) -> bool:
+        begin = self.clock.monotonic()
+        deadline = begin + wait.timeout
+        interval = POLL_MIN
+        try:
+            check = wait.condition()
+            while True:
+                polled = self.clock.monotonic()
+                if check():
+                    break
+                now = self.clock.monotonic()
+                if now >= deadline:
+                    raise TimeoutError(f"not met within {wait.timeout:g}s")
+                # Expensive checks (an image search) are polled less often than cheap ones
+                pause = min(POLL_MAX, max(interval, 2 * (now - polled)))
+                interval = min(POLL_MAX, interval * POLL_BACKOFF)
+                if not _wait_until(min(now + pause, deadline), self.should_continue, self.clock):
+                    self.timed(wait, base, begin)
+                    return False
+        except Exception as e:
+            self.timed(wait, base, begin)
+            raise _StepFailed(f"Step {len(self.timings)} ({wait.label}): {e}") from e
+        self.timed(wait, base, begin)
+        return True
+
+    def timed(self, node, base: float, begin: float):
+        end = self.clock.monotonic()
+        self.timings.append(StepTiming(len(self.timings), node.kind, node.label, base + node.offset - self.started,
+                                       begin - self.started, end - begin))
+        if self.record is not None:
+            self.record(f"automation.{node.kind.lower()}", end - begin)
+
+
+def _wait_until(deadline: float, should_continue: Callable[[], bool], clock=time) -> bool:
+    """Sleep until a monotonic deadline, spinning for the last moment; False if cancelled"""
+    # A simulated clock sets spin_threshold to 0: its sleeps are exact
+    spin = getattr(clock, 'spin_threshold', SPIN_THRESHOLD)
+    while True:
+        if not should_continue():
+            return False
+        remaining = deadline - clock.monotonic()
+        if remaining <= 0:
+            return True
+        if remaining > spin:
+            clock.sleep(min(remaining - spin / 2, MAX_SLEEP_SLICE))
+
+
+def _click(command, driver) -> Step:
+    x, y = command.x + command.offset_x, command.y + command.offset_y
+    return Step("CLICK", f"Click ({x}, {y})", driver.click, (x, y), {'_pause': False})
+
+
+def _image_click(command, driver, matcher) -> Step:
+    offset = f" {command.offset_x:+d},{command.offset_y:+d}" if command.offset_x or command.offset_y else ""
+    return Step("CLICK", f"Click {os.path.basename(command.image)}{offset}", _click_image,
+                (driver, matcher, command.image, command.offset_x, command.offset_y,
+                 getattr(command, 'confidence', None)))
+
+
+def _click_image(driver, matcher, image, offset_x, offset_y, threshold):
+    match = matcher.locate(image, threshold)
+    if match is None:
+        raise LookupError(f"{os.path.basename(image)} not found on screen")
+    x, y = match.center
+    driver.click(x + offset_x, y + offset_y, _pause=False)
+
+
+def _type(command, driver, type_interval: float = 0.0) -> Step:
+    return Step("TYPE", f"Type {command.text!r}", driver.write, (command.text,),
+                {'interval': type_interval, '_pause': False})
+
+
+def _hotkey(command, driver) -> Step:
+    keys = [key.strip() for key in command.keys.split('+')]
+    return Step("HOTKEY", f"Hotkey {command.keys}", driver.hotkey, tuple(keys), {'_pause': False})
+
+
+# Command type name -> step compiler; DELAY is handled by the scheduler, control flow by _Compiler
+COMPILERS: Dict[str, Callable] = {
+    'CLICK': _click,
+    'TYPE': _type,
+    'HOTKEY': _hotkey,
+}
+
+
+def parse_color(color: str) -> Tuple[int, int, int]:
+    """'#rrggbb' (or 'r,g,b') -> (r, g, b)"""
+    text = color.strip()
+    if text.startswith('#') and len(text) == 7:
+        return tuple(int(text[i:i + 2], 16) for i in (1, 3, 5))
+    parts = [int(part) for part in text.split(',')]
+    if len(parts) != 3 or not all(0 <= part <= 255 for part in parts):
+        raise ValueError(f"bad colour {color!r}")
+    return tuple(parts)
+
+
+def _pixel_check(driver, x: int, y: int, color: Tuple[int, int, int], tolerance: int):
+    def check():
+        image = driver.screenshot(region=(x, y, 1, 1))
+        pixel = image.getpixel((0, 0)) if hasattr(image, 'getpixel') else image[0][0]
+        rgb = tuple(pixel)[:3] if hasattr(pixel, '__len__') else (pixel,) * 3
+        return all(abs(int(value) - target) <= tolerance for value, target in zip(rgb, color))
+    return lambda: check
+
+
+def _region_changed(driver, region):
+    def start():
+        baseline = driver.screenshot(region=region).tobytes()
+        return lambda: driver.screenshot(region=region).tobytes() != baseline
+    return start
+
+
+def _region_stable(driver, region, stable_for: float = STABLE_SECONDS, clock=time):
+    def start():
+        state = {'pixels': None, 'since': 0.0}
+
+        def check():
+            pixels = driver.screenshot(region=region).tobytes()
+            now = clock.monotonic()
+            if pixels != state['pixels']:
+                state['pixels'], state['since'] = pixels, now
+                return False
+            return now - state['since'] >= stable_for
+        return check
+    return start
+
+
+def _image_visible(matcher, image: str, threshold: Optional[float], region):
+    check = lambda: matcher.locate(image, threshold, region=region) is not None
+    return lambda: check
+
+
+def _negated(condition):
+    def start():
+        check = condition()
+        return lambda: not check()
+    return start
+
+
+def _describe_condition(command) -> str:
+    kind = command.condition
+    if kind == 'image' and getattr(command, 'region', None):
+        text = f"{os.path.basename(command.image)} is visible in {tuple(command.region)}"
+    elif kind == 'pixel':
+        text = f"pixel ({command.x}, {command.y}) is {command.color}"
+    elif kind == 'image':
+        text = f"{os.path.basename(command.image)} is visible"
+    elif kind == 'region_changed':
+        text = f"region {tuple(command.region)} changes"
+    else:
+        text = f"region {tuple(command.region)} settles"
+    return f"not ({text})" if getattr(command, 'negate', False) else text
+
+
+def describe_command(command) -> str:
+    """One-line description of a control-flow command, for command lists"""
+    kind = command.type.name
+    if kind == 'WAIT_UNTIL':
+        timeout = WAIT_TIMEOUT if command.seconds is None else command.seconds
+        return f"Wait until {_describe_condition(command)} (up to {timeout:g}s)"
+    if kind == 'LOOP':
+        return f"Loop {command.count} times"
+    if kind == 'IF':
+        return f"If {_describe_condition(command)}"
+    if kind == 'CALL':
+        return f"Call {command.script}"
+    return kind.capitalize()
+
+
+class _Compiler:
+    """Compiles a flat command list, with its ELSE/END markers, into nested Programs"""
+
+    def __init__(self, driver, settle: float, type_interval: float, matcher, load_script):
+        self.driver = driver
+        self.settle = settle
+        self.type_interval = type_interval
+        self.matcher = matcher
+        self.load_script = load_script
+        self.calling: List[str] = []  # scripts being compiled, to refuse recursive CALLs
+
+    def image_matcher(self):
+        if self.matcher is None:
+            from image_anchor import TemplateMatcher
+            driver = self.driver
+            self.matcher = TemplateMatcher(grab=lambda region=None: driver.screenshot(region=region))
+        return self.matcher
+
+    def reference(self, image: str, at: str):
+        try:
+            # Builds the cached pyramids now rather than during the run
+            self.image_matcher().reference(image)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"{at}: can't use image {image}: {e}")
+
+    def block(self, commands: Sequence, start: int, where: str,
+              closers: Tuple[str, ...] = ()) -> Tuple[Program, int, Optional[str]]:
+        """Compile from start up to one of closers; returns (program, position reached, closer found)"""
+        steps: List = []
+        offset = 0.0
+        merge_type = False  # the previous command was a TYPE with nothing scheduled since
+        position = start
+        while position < len(commands):
+            command = commands[position]
+            kind = command.type.name
+            at = f"{where}Command {position + 1}"
+            if kind in ('ELSE', 'END'):
+                if kind not in closers:
+                    raise ValueError(f"{at}: {kind} without a matching {'IF' if kind == 'ELSE' else 'LOOP or IF'}")
+                return Program(steps, offset), position, kind
+            if kind not in COMPILERS and kind != 'DELAY':
+                node, position = self.control(commands, position, at, where)
+                node.offset = offset
+                steps.append(node)
+                offset = 0.0
+                merge_type = False
+                continue
+            position += 1
+
+            if kind == 'DELAY':
+                if command.seconds is None or command.seconds < 0:
+                    raise ValueError(f"{at}: DELAY needs a non-negative number of seconds")
+                offset += command.seconds
+                merge_type = False
+                continue
+            image = getattr(command, 'image', None) if kind == 'CLICK' else None
+            if image:
+                self.reference(image, at)
+            elif kind == 'CLICK' and (command.x is None or command.y is None):
+                raise ValueError(f"{at}: CLICK needs x and y")
+            if kind == 'TYPE' and not command.text:
+                continue
+            if kind == 'HOTKEY' and not command.keys:
+                raise ValueError(f"{at}: HOTKEY needs keys")
+
+            if kind == 'TYPE' and merge_type:
+                # Consecutive TYPEs become one write call
+                previous = steps[-1]
+                text = previous.args[0] + command.text
+                previous.args = (text,)
+                previous.label = f"Type {text!r}"
+                previous.commands += (position - 1,)
+                offset += len(command.text) * self.type_interval
+                continue
+
+            if kind == 'TYPE':
+                step = _type(command, self.driver, self.type_interval)
+                duration = len(command.text) * self.type_interval
+            elif image:
+                step = _image_click(command, self.driver, self.image_matcher())
+                duration = 0.0
+            else:
+                step = COMPILERS[kind](command, self.driver)
+                duration = 0.0
+            step.offset = offset
+            step.commands = (position - 1,)
+            steps.append(step)
+            offset += duration + self.settle
+            merge_type = kind == 'TYPE'
+        return Program(steps, offset), position, None
+
+    def control(self, commands: Sequence, position: int, at: str, where: str):
+        """Compile the control command at position; returns the node and the position after it"""
+        command = commands[position]
+        kind = command.type.name
+        if kind == 'WAIT_UNTIL':
+            timeout = WAIT_TIMEOUT if command.seconds is None else command.seconds
+            if timeout <= 0:
+                raise ValueError(f"{at}: WAIT_UNTIL needs a positive timeout")
+            condition = self.condition(command, at, WAIT_CONDITIONS)
+            return Wait(f"Wait until {_describe_condition(command)}", condition, timeout,
+                        commands=(position,)), position + 1
+        if kind == 'LOOP':
+            count = getattr(command, 'count', None)
+            if not count or count < 1:
+                raise ValueError(f"{at}: LOOP needs a repeat count of at least 1")
+            body, end, closer = self.block(commands, position + 1, where, ('END',))
+            if closer is None:
+                raise ValueError(f"{at}: LOOP has no END")
+            return Loop(f"Loop x{count}", body, count, commands=(position,)), end + 1
+        if kind == 'IF':
+            condition = self.condition(command, at, IF_CONDITIONS)
+            then, end, closer = self.block(commands, position + 1, where, ('ELSE', 'END'))
+            orelse = Program([], 0.0)
+            if closer == 'ELSE':
+                orelse, end, closer = self.block(commands, end + 1, where, ('END',))
+            if closer is None:
+                raise ValueError(f"{at}: IF has no END")
+            return Branch(f"If {_describe_condition(command)}", condition, then, orelse,
+                          commands=(position,)), end + 1
+        if kind == 'CALL':
+            name = getattr(command, 'script', None)
+            if not name:
+                raise ValueError(f"{at}: CALL needs a script name")
+            if self.load_script is None:
+                raise ValueError(f"{at}: CALL isn't supported here")
+            if name in self.calling:
+                raise ValueError(f"{at}: CALL {name} would call itself")
+            try:
+                called = self.load_script(name)
+            except (OSError, ValueError, KeyError) as e:
+                raise ValueError(f"{at}: can't load script {name}: {e}")
+            self.calling.append(name)
+            try:
+                body, _, _ = self.block(list(called), 0, f"{name}: ")
+            finally:
+                self.calling.pop()
+            return Call(f"Call {name}", body, commands=(position,)), position + 1
+        raise ValueError(f"{at}: unsupported command type {kind}")
+
+    def condition(self, command, at: str, allowed: Tuple[str, ...]):
+        kind = getattr(command, 'condition', None)
+        if kind not in allowed:
+            raise ValueError(f"{at}: {command.type.name} needs a condition ({', '.join(allowed)})")
+        region = getattr(command, 'region', None)
+        if region is not None:
+            region = tuple(int(value) for value in region)
+            if len(region) != 4 or region[2] <= 0 or region[3] <= 0:
+                raise ValueError(f"{at}: region must be left, top, width, height")
+        if kind == 'pixel':
+            if command.x is None or command.y is None or not getattr(command, 'color', None):
+                raise ValueError(f"{at}: pixel condition needs x, y and a colour")
+            try:
+                color = parse_color(command.color)
+            except ValueError as e:
+                raise ValueError(f"{at}: {e}")
+            condition = _pixel_check(self.driver, command.x, command.y, color,
+                                     getattr(command, 'tolerance', 0) or 0)
+        elif kind == 'image':
+            if not getattr(command, 'image', None):
+                raise ValueError(f"{at}: image condition needs an image")
+            self.reference(command.image, at)
+            condition = _image_visible(self.image_matcher(), command.image,
+                                       getattr(command, 'confidence', None), region)
+        else:
+            if region is None:
+                raise ValueError(f"{at}: {kind} condition needs a region")
+            condition = (_region_changed(self.driver, region) if kind == 'region_changed' else
+                         _region_stable(self.driver, region, clock=getattr(self.driver, 'clock', time)))
+        return _negated(condition) if getattr(command, 'negate', False) else condition
+
+
+def compile_commands(commands: Sequence, driver=None, settle: float = 0.0,
+                     type_interval: float = 0.0, matcher=None,
+                     load_script: Optional[Callable[[str], Sequence]] = None) -> Program:
+    """
+    Compile commands into a Program. `settle` is a minimum gap after every
+    step; `type_interval` is the pause between typed characters; `matcher`
+    (an image_anchor.TemplateMatcher, created on demand) locates image
+    clicks and image conditions; `load_script(name)` returns the commands a
+    CALL runs. Raises ValueError for commands that can't run, before
+    anything is executed.
+    """
+    if driver is None:
+        import pyautogui as driver
+
+    compiler = _Compiler(driver, settle, type_interval, matcher, load_script)
+    program, _, _ = compiler.block(list(commands), 0, "")
+    program.clock = getattr(driver, 'clock', time)
+    return program
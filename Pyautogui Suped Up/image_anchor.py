@@ -0,0 +1,365 @@
+"""
+Image Anchor Module
+Locates reference images on screen so CLICK commands can follow a moving window.
+
+A CLICK command with an `image` is resolved when it runs: TemplateMatcher
+grabs the screen, finds the reference image by normalized cross-correlation
+and the click lands on its centre plus the command's offset. Each reference
+is converted to grayscale once and cached as a pyramid at a few scales (for
+display scaling and zoom). A search first grabs only a region around where
+the image was last found and falls back to the whole screen when that
+misses; whole-screen searches scan a downsampled copy and refine the best
+candidates at full resolution. The screen source is any callable taking a
+region, so a saved screenshot works as well as a live display:
+
+    python image_anchor.py reference.png screenshot.png
+"""
+
+import os
+import sys
+import time
+import argparse
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+Region = Tuple[int, int, int, int]  # left, top, width, height
+
+# Minimum normalized correlation (-1..1) accepted as a match
+DEFAULT_THRESHOLD = 0.85
+# Sizes of the reference tried, relative to how it was captured
+DEFAULT_SCALES = (1.0, 0.9, 1.1, 0.8, 1.25)
+# Pixels added on every side of the last hit for the first, local search
+ROI_MARGIN = 120
+# The coarsest pyramid level keeps at least this many pixels on the template's short side
+MIN_TEMPLATE_SIDE = 8
+MAX_LEVELS = 3
+# Coarse-level peaks refined at full resolution
+CANDIDATES = 3
+# Size of the region captured around the mouse for a new reference
+CAPTURE_SIZE = (120, 40)
+
+
+def to_gray(image) -> np.ndarray:
+    """Grayscale float32 array from an image path, a PIL image or an array"""
+    if isinstance(image, (str, os.PathLike)):
+        with Image.open(image) as img:
+            return np.asarray(img.convert('L'), dtype=np.float32)
+    if isinstance(image, Image.Image):
+        return np.asarray(image.convert('L'), dtype=np.float32)
+    array = np.asarray(image)
+    if array.ndim == 3:
+        # Same luma weights as PIL's 'L' conversion
+        array = array[..., 0] * 0.299 + array[..., 1] * 0.587 + array[..., 2] * 0.114
+    return array.astype(np.float32, copy=False)
+
+
+def downsample(gray: np.ndarray) -> np.ndarray:
+    """Halve an image by averaging 2x2 blocks"""
+    height, width = gray.shape[0] // 2 * 2, gray.shape[1] // 2 * 2
+    g = gray[:height, :width]
+    return (g[0::2, 0::2] + g[1::2, 0::2] + g[0::2, 1::2] + g[1::2, 1::2]) * 0.25
+
+
+def _resize(gray: np.ndarray, scale: float) -> np.ndarray:
+    if scale == 1.0:
+        return gray
+    size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+    return np.asarray(Image.fromarray(gray).resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+def _window_sums(values: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Sum of every height x width window (top-left anchored), from an integral image"""
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1))
+    np.cumsum(values, axis=0, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table[height:, width:] - table[:-height, width:] - table[height:, :-width] + table[:-height, :-width]
+
+
+def match_template(image: np.ndarray, template: np.ndarray) -> np.ndarray:
+    """
+    Normalized cross-correlation of template at every position where it
+    fits inside image, indexed by top-left corner. Flat windows score 0.
+    """
+    rows, cols = image.shape
+    height, width = template.shape
+    if height > rows or width > cols:
+        return np.empty((0, 0))
+    t = template.astype(np.float64) - template.mean()
+    t_norm = np.sqrt((t * t).sum())
+    if t_norm == 0:
+        return np.zeros((rows - height + 1, cols - width + 1))
+    img = image.astype(np.float64)
+    # Circular correlation over the image's own size: no wrap-around at valid positions
+    spectrum = np.fft.rfft2(img) * np.conj(np.fft.rfft2(t, s=img.shape))
+    corr = np.fft.irfft2(spectrum, s=img.shape)[:rows - height + 1, :cols - width + 1]
+    count = height * width
+    sums = _window_sums(img, height, width)
+    variance = np.maximum(_window_sums(img * img, height, width) - sums * sums / count, 0.0)
+    denominator = np.sqrt(variance) * t_norm
+    scores = np.zeros_like(corr)
+    np.divide(corr, denominator, out=scores, where=variance > 1e-6 * count)
+    return np.clip(scores, -1.0, 1.0)
+
+
+def _peaks(scores: np.ndarray, count: int, radius: int) -> List[Tuple[int, int]]:
+    """Positions of the highest scores, at least radius apart"""
+    scores = scores.copy()
+    peaks = []
+    for _ in range(count):
+        y, x = np.unravel_index(np.argmax(scores), scores.shape)
+        if peaks and scores[y, x] == -np.inf:
+            break
+        peaks.append((int(y), int(x)))
+        scores[max(0, y - radius):y + radius + 1, max(0, x - radius):x + radius + 1] = -np.inf
+    return peaks
+
+
+class ReferenceImage:
+    """Grayscale pyramids of one reference image at each search scale"""
+
+    def __init__(self, path: str, scales: Sequence[float] = DEFAULT_SCALES):
+        self.path = path
+        gray = to_gray(path)
+        if gray.size == 0 or float(gray.std()) == 0.0:
+            raise ValueError(f"Reference image {path} has no detail to match")
+        self.width, self.height = gray.shape[1], gray.shape[0]
+        self.pyramids: Dict[float, List[np.ndarray]] = {}
+        for scale in scales:
+            level = _resize(gray, scale)
+            pyramid = [level]
+            while len(pyramid) <= MAX_LEVELS and min(pyramid[-1].shape) // 2 >= MIN_TEMPLATE_SIDE:
+                pyramid.append(downsample(pyramid[-1]))
+            self.pyramids[scale] = pyramid
+
+
+@dataclass
+class Match:
+    left: int
+    top: int
+    width: int
+    height: int
+    score: float
+    scale: float
+    searched: str  # 'region' (around the last hit) or 'screen'
+    seconds: float
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        return self.left + self.width // 2, self.top + self.height // 2
+
+    @property
+    def box(self) -> Region:
+        return self.left, self.top, self.width, self.height
+
+
+def _search(reference: ReferenceImage, screen: np.ndarray, scales: Sequence[float],
+            stop_at: float = np.inf) -> Optional[Tuple[float, int, int, int, int, float]]:
+    """Best (score, left, top, width, height, scale) of the reference in a grayscale screen"""
+    screen_levels = [screen]
+    best = None
+    for scale in scales:
+        pyramid = reference.pyramids[scale]
+        template = pyramid[0]
+        height, width = template.shape
+        if height > screen.shape[0] or width > screen.shape[1]:
+            continue
+        # Coarsest level at which the template still fits the (downsampled) screen
+        level = len(pyramid) - 1
+        while level > 0 and any(t > s >> level for t, s in zip(pyramid[level].shape, screen.shape)):
+            level -= 1
+        while len(screen_levels) <= level:
+            screen_levels.append(downsample(screen_levels[-1]))
+
+        if level == 0:
+            scores = match_template(screen, template)
+            y, x = np.unravel_index(np.argmax(scores), scores.shape)
+            found = (float(scores[y, x]), int(x), int(y))
+        else:
+            coarse = match_template(screen_levels[level], pyramid[level])
+            factor = 1 << level
+            found = None
+            for y, x in _peaks(coarse, CANDIDATES, max(1, min(pyramid[level].shape) // 2)):
+                # Refine in a full-resolution window around the coarse hit
+                top, left = max(0, y * factor - 2 * factor), max(0, x * factor - 2 * factor)
+                bottom = min(screen.shape[0], y * factor + 2 * factor + height)
+                right = min(screen.shape[1], x * factor + 2 * factor + width)
+                fine = match_template(screen[top:bottom, left:right], template)
+                if fine.size == 0:
+                    continue
+                fy, fx = np.unravel_index(np.argmax(fine), fine.shape)
+                if found is None or fine[fy, fx] > found[0]:
+                    found = (float(fine[fy, fx]), left + int(fx), top + int(fy))
+            if found is None:
+                continue
+        if best is None or found[0] > best[0]:
+            best = (found[0], found[1], found[2], width, height, scale)
+            if best[0] >= stop_at:
+                break
+    return best
+
+
+class TemplateMatcher:
+    """Finds reference images on a screen source, remembering where each was last seen"""
+
+    def __init__(self, grab: Optional[Callable] = None, threshold: float = DEFAULT_THRESHOLD,
+                 scales: Sequence[float] = DEFAULT_SCALES, margin: int = ROI_MARGIN):
+        """
+        grab(region) returns the screen, or the (left, top, width, height)
+        part of it, as a PIL image or array; it defaults to pyautogui.
+        """
+        if grab is None:
+            import pyautogui
+            grab = lambda region=None: pyautogui.screenshot(region=region)
+        self.grab = grab
+        self.threshold = threshold
+        self.scales = tuple(scales)
+        self.margin = margin
+        self.screen_size: Optional[Tuple[int, int]] = None
+        self._references: Dict[str, Tuple[float, ReferenceImage]] = {}
+        self._last: Dict[str, Tuple[Region, float]] = {}  # path -> (box, scale) of the last hit
+        self.stats = {'region_hits': 0, 'screen_searches': 0, 'misses': 0}
+
+    def reference(self, path: str) -> ReferenceImage:
+        """Cached pyramids for an image file, rebuilt when the file changes"""
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        cached = self._references.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, ReferenceImage(path, self.scales))
+            self._references[path] = cached
+            self._last.pop(path, None)
+        return cached[1]
+
+    def locate(self, path: str, threshold: Optional[float] = None,
+               region: Optional[Region] = None) -> Optional[Match]:
+        """
+        Where the image is on screen now, or None if nothing scores above the
+        threshold. With a region, only that part of the screen is grabbed and
+        searched.
+        """
+        started = time.perf_counter()
+        threshold = self.threshold if threshold is None else threshold
+        reference = self.reference(path)
+        key = os.path.abspath(path)
+
+        if region is not None:
+            found = _search(reference, to_gray(self.grab(region)), self.scales, stop_at=threshold)
+            if found is not None and found[0] >= threshold:
+                self.stats['region_hits'] += 1
+                return self._hit(key, found, region[0], region[1], 'region', started)
+            self.stats['misses'] += 1
+            return None
+
+        last = self._last.get(key)
+        if last is not None and self.screen_size is not None:
+            region = self._around(last[0])
+            scales = (last[1],) + tuple(scale for scale in self.scales if scale != last[1])
+            found = _search(reference, to_gray(self.grab(region)), scales, stop_at=threshold)
+            if found is not None and found[0] >= threshold:
+                self.stats['region_hits'] += 1
+                return self._hit(key, found, region[0], region[1], 'region', started)
+
+        self.stats['screen_searches'] += 1
+        screen = to_gray(self.grab(None))
+        self.screen_size = (screen.shape[1], screen.shape[0])
+        found = _search(reference, screen, self.scales)
+        if found is not None and found[0] >= threshold:
+            return self._hit(key, found, 0, 0, 'screen', started)
+        self.stats['misses'] += 1
+        self._last.pop(key, None)
+        return None
+
+    def forget(self, path: Optional[str] = None):
+        """Drop remembered positions (of one image, or all) so the next search scans the screen"""
+        if path is None:
+            self._last.clear()
+        else:
+            self._last.pop(os.path.abspath(path), None)
+
+    def _around(self, box: Region) -> Region:
+        left, top, width, height = box
+        screen_width, screen_height = self.screen_size
+        x0, y0 = max(0, left - self.margin), max(0, top - self.margin)
+        x1 = min(screen_width, left + width + self.margin)
+        y1 = min(screen_height, top + height + self.margin)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def _hit(self, key, found, origin_x, origin_y, searched, started) -> Match:
+        score, left, top, width, height, scale = found
+        match = Match(origin_x + left, origin_y + top, width, height, score, scale, searched,
+                      time.perf_counter() - started)
+        self._last[key] = (match.box, scale)
+        return match
+
+
+def screenshot_source(image) -> Callable:
+    """Screen source backed by a saved screenshot (path, PIL image or array), for use without a display"""
+    gray = to_gray(image)
+
+    def grab(region: Optional[Region] = None):
+        if region is None:
+            return gray
+        left, top, width, height = region
+        return gray[top:top + height, left:left + width]
+
+    return grab
+
+
+def capture_reference(path: str, point: Tuple[int, int], size: Tuple[int, int] = CAPTURE_SIZE,
+                      grab: Optional[Callable] = None,
+                      screen_size: Optional[Tuple[int, int]] = None) -> Tuple[int, int]:
+    """
+    Save the region of the screen centred on point as a reference image.
+    Returns the point's offset from the centre of the saved image, which is
+    non-zero only where the region was clipped by the screen edge. The screen
+    size is read from pyautogui, or from a full grab when grab is given.
+    """
+    if grab is None:
+        import pyautogui
+        grab = lambda region=None: pyautogui.screenshot(region=region)
+        if screen_size is None:
+            screen_size = tuple(pyautogui.size())
+    if screen_size is None:
+        shape = np.asarray(grab(None)).shape
+        screen_size = (shape[1], shape[0])
+    screen_width, screen_height = screen_size
+    # Kept inside the screen on every side: moved in from the edge, not padded
+    width, height = min(size[0], screen_width), min(size[1], screen_height)
+    left = min(max(0, point[0] - width // 2), screen_width - width)
+    top = min(max(0, point[1] - height // 2), screen_height - height)
+    image = grab((left, top, width, height))
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(np.asarray(image).astype(np.uint8))
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    image.save(path)
+    return point[0] - (left + image.width // 2), point[1] - (top + image.height // 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find a reference image in a saved screenshot")
+    parser.add_argument('reference', help="reference image (e.g. a captured button)")
+    parser.add_argument('screenshot', help="screenshot to search")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="search this many times to time the cached region-first path")
+    args = parser.parse_args(argv)
+
+    matcher = TemplateMatcher(grab=screenshot_source(args.screenshot), threshold=args.threshold)
+    match = None
+    for _ in range(max(1, args.repeat)):
+        match = matcher.locate(args.reference)
+        if match is None:
+            print("Not found")
+            return 1
+        print(f"{match.searched:6} center={match.center} box={match.box} score={match.score:.3f} "
+              f"scale={match.scale} took {match.seconds * 1000:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
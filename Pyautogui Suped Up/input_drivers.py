@@ -0,0 +1,355 @@
+"""
+Input Drivers Module
+Interchangeable backends that automation programs send mouse and keyboard input through.
+
+A driver is anything with pyautogui's click(x, y), write(text, interval),
+hotkey(*keys), screenshot(region), position(), size() and pixel(x, y); the
+pyautogui module itself is one. XTestDriver talks to an X server directly
+through the XTest extension (python-xlib), and RecordingDriver sends
+nothing: it appends every action to a Trace with a simulated duration and
+advances a VirtualClock instead of sleeping, so automation_engine runs a
+program against it instantly and deterministically, with no display.
+
+Traces are saved as JSON lines, one event per line, and can be replayed
+through a real driver or diffed against another run:
+
+    python input_drivers.py show trace.jsonl
+    python input_drivers.py diff expected.jsonl actual.jsonl --tolerance 0.01
+    python input_drivers.py replay trace.jsonl --driver xtest
+"""
+
+import sys
+import json
+import time
+import difflib
+import argparse
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+Region = Tuple[int, int, int, int]  # left, top, width, height
+
+DRIVERS = ('pyautogui', 'xtest', 'dry-run')
+DEFAULT_SCREEN_SIZE = (1920, 1080)
+# Simulated seconds per action of the recording driver
+DEFAULT_COSTS = {
+    'click': 0.015,
+    'key': 0.008,  # per key pressed, and per character typed unless the interval is longer
+    'screenshot': 0.004,  # per grab, plus screenshot_pixel per pixel grabbed
+    'screenshot_pixel': 1e-8,
+}
+# Actions that only look at the screen; replay skips them
+OBSERVATIONS = ('screenshot',)
+
+
+class VirtualClock:
+    """A monotonic clock that only moves when slept on"""
+
+    spin_threshold = 0.0  # sleeps are exact, nothing to spin for
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self.now += seconds
+
+
+@dataclass
+class TraceEvent:
+    time: float  # seconds after the driver was created
+    action: str
+    args: List = field(default_factory=list)
+    duration: float = 0.0
+
+    def describe(self) -> str:
+        """The action without its timing, as compared by diff_traces"""
+        return " ".join([self.action] + [json.dumps(arg) for arg in self.args])
+
+    def __str__(self) -> str:
+        return f"{self.time:9.3f}s  {self.describe()}  ({self.duration * 1000:.1f}ms)"
+
+
+@dataclass
+class Trace:
+    events: List[TraceEvent] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def total(self) -> float:
+        """Seconds from the start of the trace to the end of its last action"""
+        return max((event.time + event.duration for event in self.events), default=0.0)
+
+    def inputs(self) -> List[TraceEvent]:
+        return [event for event in self.events if event.action not in OBSERVATIONS]
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            for event in self.events:
+                f.write(json.dumps({'time': event.time, 'action': event.action, 'args': event.args,
+                                    'duration': event.duration}) + "\n")
+
+    @classmethod
+    def load(cls, path: str) -> 'Trace':
+        with open(path, "r") as f:
+            return cls([TraceEvent(**json.loads(line)) for line in f if line.strip()])
+
+
+def diff_traces(expected: Trace, actual: Trace, tolerance: float = 0.0,
+                ignore: Sequence[str] = ()) -> List[str]:
+    """
+    Differences between two traces: a unified diff of their actions if those
+    differ, otherwise every action that started more than `tolerance`
+    seconds off its expected time. Actions named in `ignore` are left out.
+    Empty when the traces match.
+    """
+    expected_events = [event for event in expected.events if event.action not in ignore]
+    actual_events = [event for event in actual.events if event.action not in ignore]
+    expected_lines = [event.describe() for event in expected_events]
+    actual_lines = [event.describe() for event in actual_events]
+    if expected_lines != actual_lines:
+        return list(difflib.unified_diff(expected_lines, actual_lines, "expected", "actual", lineterm=""))
+    differences = []
+    for position, (want, got) in enumerate(zip(expected_events, actual_events)):
+        if abs(got.time - want.time) > tolerance:
+            differences.append(f"event {position + 1} ({got.describe()}) at {got.time:.3f}s, "
+                               f"expected {want.time:.3f}s ({(got.time - want.time) * 1000:+.1f}ms)")
+    return differences
+
+
+def replay(trace: Trace, driver, speed: float = 1.0, clock=time,
+           should_continue: Callable[[], bool] = lambda: True) -> int:
+    """
+    Send a trace's input actions through a driver at their recorded times
+    (divided by speed); screenshots aren't repeated. Returns how many actions
+    were sent, fewer if should_continue() turned False.
+    """
+    started = clock.monotonic()
+    sent = 0
+    for event in trace.inputs():
+        deadline = started + event.time / speed
+        while True:
+            if not should_continue():
+                return sent
+            remaining = deadline - clock.monotonic()
+            if remaining <= 0:
+                break
+            clock.sleep(min(remaining, 0.05))
+        if event.action == 'write':
+            # Typed at the recorded speed
+            driver.write(event.args[0], interval=event.duration / speed / max(1, len(event.args[0])))
+        else:
+            getattr(driver, event.action)(*event.args)
+        sent += 1
+    return sent
+
+
+class RecordingDriver:
+    """
+    Records actions instead of sending them. `screen` is what screenshots
+    see: None for a blank screen, an image, or a callable taking the
+    simulated seconds elapsed and returning an image (for pages that change).
+    """
+
+    def __init__(self, screen=None, size: Tuple[int, int] = DEFAULT_SCREEN_SIZE, clock=None,
+                 costs: Optional[Dict[str, float]] = None):
+        self.clock = clock or VirtualClock()
+        self.costs = dict(DEFAULT_COSTS, **(costs or {}))
+        self.screen = screen
+        self._size = tuple(screen.size) if hasattr(screen, 'size') and not callable(screen) else tuple(size)
+        self.pointer = (0, 0)
+        self.trace = Trace()
+        self.started = self.clock.monotonic()
+
+    def _record(self, action: str, args: Sequence, duration: float):
+        self.trace.events.append(TraceEvent(round(self.clock.monotonic() - self.started, 6), action,
+                                            list(args), round(duration, 6)))
+        self.clock.sleep(duration)
+
+    def elapsed(self) -> float:
+        return self.clock.monotonic() - self.started
+
+    def click(self, x: int, y: int, **_options):
+        self.pointer = (int(x), int(y))
+        self._record('click', self.pointer, self.costs['click'])
+
+    def write(self, text: str, interval: float = 0.0, **_options):
+        self._record('write', [text], len(text) * max(interval, self.costs['key']))
+
+    def hotkey(self, *keys: str, **_options):
+        self._record('hotkey', keys, len(keys) * self.costs['key'])
+
+    def screenshot(self, region: Optional[Region] = None, **_options):
+        from PIL import Image
+
+        if callable(self.screen):
+            image = self.screen(self.elapsed())
+        else:
+            image = self.screen if self.screen is not None else Image.new('RGB', self._size)
+        left, top, width, height = region if region is not None else (0, 0) + tuple(image.size)
+        pixels = width * height
+        self._record('screenshot', [left, top, width, height],
+                     self.costs['screenshot'] + pixels * self.costs['screenshot_pixel'])
+        return image.crop((left, top, left + width, top + height)).convert('RGB')
+
+    def pixel(self, x: int, y: int) -> Tuple[int, int, int]:
+        return self.screenshot(region=(x, y, 1, 1)).getpixel((0, 0))
+
+    def position(self) -> Tuple[int, int]:
+        return self.pointer
+
+    def size(self) -> Tuple[int, int]:
+        return self._size
+
+
+# pyautogui key names -> X keysym names, where they differ
+XTEST_KEYS = {
+    'ctrl': 'Control_L', 'ctrlleft': 'Control_L', 'ctrlright': 'Control_R',
+    'shift': 'Shift_L', 'shiftleft': 'Shift_L', 'shiftright': 'Shift_R',
+    'alt': 'Alt_L', 'altleft': 'Alt_L', 'altright': 'Alt_R',
+    'win': 'Super_L', 'winleft': 'Super_L', 'command': 'Super_L', 'super': 'Super_L',
+    'enter': 'Return', 'return': 'Return', '\n': 'Return', 'tab': 'Tab', '\t': 'Tab',
+    'esc': 'Escape', 'escape': 'Escape', 'space': 'space', ' ': 'space',
+    'backspace': 'BackSpace', 'delete': 'Delete', 'del': 'Delete', 'insert': 'Insert',
+    'up': 'Up', 'down': 'Down', 'left': 'Left', 'right': 'Right',
+    'home': 'Home', 'end': 'End', 'pageup': 'Prior', 'pagedown': 'Next',
+}
+
+
+class XTestDriver:
+    """Input through the X server's XTest extension, without pyautogui (needs python-xlib)"""
+
+    def __init__(self, display_name: Optional[str] = None):
+        try:
+            from Xlib import X, XK, display
+            from Xlib.ext import xtest
+        except ImportError:
+            raise ImportError("XTestDriver needs python-xlib (pip install python-xlib)")
+        self.X, self.XK, self.xtest = X, XK, xtest
+        self.display = display.Display(display_name)
+        if not self.display.has_extension('XTEST'):
+            raise RuntimeError("the X server doesn't support the XTEST extension")
+        self.root = self.display.screen().root
+
+    def _keycode(self, keysym: int, name: str) -> int:
+        keycode = self.display.keysym_to_keycode(keysym)
+        if not keycode:
+            raise ValueError(f"no key for {name!r} on this keyboard layout")
+        return keycode
+
+    def _key(self, name: str) -> Tuple[int, bool]:
+        """(keycode, needs shift) of a pyautogui key name or a character"""
+        if len(name) == 1 and name not in XTEST_KEYS:
+            # Latin-1 keysyms are their code points; other characters are offset into the Unicode range
+            keysym = ord(name) if ord(name) < 0x100 else 0x01000000 | ord(name)
+        else:
+            keysym_name = XTEST_KEYS.get(name.lower(), name)
+            if keysym_name[0] in 'fF' and keysym_name[1:].isdigit():
+                keysym_name = keysym_name.upper()  # f5 -> F5
+            keysym = self.XK.string_to_keysym(keysym_name)
+            if not keysym:
+                raise ValueError(f"unknown key {name!r}")
+        keycode = self._keycode(keysym, name)
+        return keycode, self.display.keycode_to_keysym(keycode, 0) != keysym
+
+    def _fake(self, event_type: int, detail: int, x: int = 0, y: int = 0):
+        self.xtest.fake_input(self.display, event_type, detail, x=x, y=y)
+
+    def click(self, x: int, y: int, **_options):
+        self._fake(self.X.MotionNotify, 0, int(x), int(y))
+        self._fake(self.X.ButtonPress, 1)
+        self._fake(self.X.ButtonRelease, 1)
+        self.display.sync()
+
+    def write(self, text: str, interval: float = 0.0, **_options):
+        shift = self._keycode(self.XK.string_to_keysym('Shift_L'), 'shift')
+        for char in text:
+            keycode, shifted = self._key(char)
+            if shifted:
+                self._fake(self.X.KeyPress, shift)
+            self._fake(self.X.KeyPress, keycode)
+            self._fake(self.X.KeyRelease, keycode)
+            if shifted:
+                self._fake(self.X.KeyRelease, shift)
+            self.display.sync()
+            if interval:
+                time.sleep(interval)
+
+    def hotkey(self, *keys: str, **_options):
+        keycodes = [self._key(key)[0] for key in keys]
+        for keycode in keycodes:
+            self._fake(self.X.KeyPress, keycode)
+        for keycode in reversed(keycodes):
+            self._fake(self.X.KeyRelease, keycode)
+        self.display.sync()
+
+    def screenshot(self, region: Optional[Region] = None, **_options):
+        from PIL import Image
+
+        left, top, width, height = region if region is not None else (0, 0) + self.size()
+        raw = self.root.get_image(left, top, width, height, self.X.ZPixmap, 0xffffffff)
+        return Image.frombytes('RGB', (width, height), raw.data, 'raw', 'BGRX')
+
+    def pixel(self, x: int, y: int) -> Tuple[int, int, int]:
+        return self.screenshot(region=(x, y, 1, 1)).getpixel((0, 0))
+
+    def position(self) -> Tuple[int, int]:
+        pointer = self.root.query_pointer()
+        return pointer.root_x, pointer.root_y
+
+    def size(self) -> Tuple[int, int]:
+        screen = self.display.screen()
+        return screen.width_in_pixels, screen.height_in_pixels
+
+
+def get_driver(name: str = 'pyautogui', **options):
+    """A driver by name: 'pyautogui', 'xtest' or 'dry-run' (a RecordingDriver)"""
+    if name == 'pyautogui':
+        import pyautogui
+        return pyautogui
+    if name == 'xtest':
+        return XTestDriver(**options)
+    if name == 'dry-run':
+        return RecordingDriver(**options)
+    raise ValueError(f"unknown input driver {name!r}, expected one of {', '.join(DRIVERS)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show, compare or replay recorded automation traces")
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help="print a trace")
+    show.add_argument('trace')
+    diff = commands.add_parser('diff', help="compare two traces; exits 1 if they differ")
+    diff.add_argument('expected')
+    diff.add_argument('actual')
+    diff.add_argument('--tolerance', type=float, default=0.0, help="seconds an action may start early or late")
+    diff.add_argument('--ignore-screenshots', action='store_true', help="compare input actions only")
+    play = commands.add_parser('replay', help="send a trace's input to the screen")
+    play.add_argument('trace')
+    play.add_argument('--driver', choices=('pyautogui', 'xtest'), default='pyautogui')
+    play.add_argument('--speed', type=float, default=1.0, help="replay this many times faster")
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        trace = Trace.load(args.trace)
+        for event in trace.events:
+            print(event)
+        print(f"{len(trace)} actions, {trace.total:.3f}s")
+        return 0
+    if args.command == 'diff':
+        differences = diff_traces(Trace.load(args.expected), Trace.load(args.actual), args.tolerance,
+                                  OBSERVATIONS if args.ignore_screenshots else ())
+        for line in differences:
+            print(line)
+        return 1 if differences else 0
+    sent = replay(Trace.load(args.trace), get_driver(args.driver), speed=args.speed)
+    print(f"Replayed {sent} actions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Script Library Module
+SQLite index of the saved scripts in scripts/ for instant listing and search.
+
+ScriptLibrary keeps one row per script file (name, tags, step count, content
+hash, last-run duration) plus a full-text index over its name, tags, typed
+text and hotkeys. scan() only stats the directory and re-reads files whose
+modification time or size changed, so opening a library of thousands of
+scripts costs one directory listing rather than thousands of JSON parses.
+Files that aren't valid scripts are indexed with the reason, not skipped.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+INDEX_FILE = ".library.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scripts (
+    id INTEGER PRIMARY KEY,  -- also the rowid of the script's full-text row
+    name TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    steps INTEGER NOT NULL DEFAULT 0,
+    clicks INTEGER NOT NULL DEFAULT 0,
+    tags TEXT NOT NULL DEFAULT '',
+    error TEXT,
+    last_run_seconds REAL,
+    last_run_at REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS scripts_fts USING fts5(name, tags, text, keys);
+"""
+
+
+@dataclass
+class ScriptInfo:
+    name: str
+    steps: int
+    clicks: int
+    tags: List[str]
+    hash: str
+    error: Optional[str] = None
+    last_run_seconds: Optional[float] = None
+    last_run_at: Optional[float] = None
+
+    @property
+    def file_name(self) -> str:
+        return f"{self.name}.json"
+
+
+def summarize(raw: bytes) -> Tuple[Dict, Optional[str]]:
+    """Index fields of a script file's contents, and why it can't be loaded if it can't"""
+    fields = {'steps': 0, 'clicks': 0, 'tags': '', 'text': '', 'keys': ''}
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        return fields, f"Invalid JSON: {e}"
+    if not isinstance(data, dict) or not isinstance(data.get("commands"), list):
+        return fields, "No command list"
+    commands = data["commands"]
+    for position, cmd in enumerate(commands):
+        if not isinstance(cmd, dict) or not isinstance(cmd.get("type"), int):
+            return fields, f"Command {position + 1} has no type"
+    tags = data.get("tags") or []
+    if isinstance(tags, str):
+        tags = [tags]
+    fields.update(
+        steps=len(commands),
+        clicks=sum(1 for cmd in commands if cmd.get("x") is not None or cmd.get("image")),
+        tags=", ".join(str(tag).strip() for tag in tags if str(tag).strip()),
+        text="\n".join(cmd["text"] for cmd in commands if isinstance(cmd.get("text"), str)),
+        keys=" ".join(cmd["keys"] for cmd in commands if isinstance(cmd.get("keys"), str)),
+    )
+    return fields, None
+
+
+def fts_query(query: str) -> str:
+    """Prefix match on every word of a search, safe to pass to MATCH"""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+class ScriptLibrary:
+    """Index of a scripts directory; use it from one thread (the Tk thread)"""
+
+    def __init__(self, directory: str = "scripts", index_path: Optional[str] = None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(index_path or os.path.join(directory, INDEX_FILE))
+        self.conn.executescript(SCHEMA)
+
+    def scan(self) -> Dict[str, int]:
+        """Bring the index up to date with the directory; returns what changed"""
+        known = {name: (mtime_ns, size) for name, mtime_ns, size in
+                 self.conn.execute("SELECT name, mtime_ns, size FROM scripts")}
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        seen = set()
+        with self.conn:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".json") or not entry.is_file():
+                        continue
+                    name = entry.name[:-5]
+                    seen.add(name)
+                    stat = entry.stat()
+                    if known.get(name) == (stat.st_mtime_ns, stat.st_size):
+                        counts['unchanged'] += 1
+                        continue
+                    self._index(name, entry.path, stat)
+                    counts['updated' if name in known else 'added'] += 1
+            for name in known.keys() - seen:
+                self._remove(name)
+                counts['removed'] += 1
+        return counts
+
+    def _index(self, name: str, path: str, stat):
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        row = self.conn.execute("SELECT hash FROM scripts WHERE name = ?", (name,)).fetchone()
+        if row is not None and row[0] == digest:
+            # Touched but not changed
+            self.conn.execute("UPDATE scripts SET mtime_ns = ?, size = ? WHERE name = ?",
+                              (stat.st_mtime_ns, stat.st_size, name))
+            return
+        fields, error = summarize(raw)
+        # Keep the run history of a script that was edited in place
+        self.conn.execute(
+            "INSERT INTO scripts (name, mtime_ns, size, hash, steps, clicks, tags, error) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET "
+            "mtime_ns = excluded.mtime_ns, size = excluded.size, hash = excluded.hash, steps = excluded.steps, "
+            "clicks = excluded.clicks, tags = excluded.tags, error = excluded.error",
+            (name, stat.st_mtime_ns, stat.st_size, digest, fields['steps'], fields['clicks'], fields['tags'], error))
+        rowid = self.conn.execute("SELECT id FROM scripts WHERE name = ?", (name,)).fetchone()[0]
+        self.conn.execute("DELETE FROM scripts_fts WHERE rowid = ?", (rowid,))
+        self.conn.execute("INSERT INTO scripts_fts (rowid, name, tags, text, keys) VALUES (?, ?, ?, ?, ?)",
+                          (rowid, name, fields['tags'], fields['text'], fields['keys']))
+
+    def _remove(self, name: str):
+        self.conn.execute("DELETE FROM scripts_fts WHERE rowid = (SELECT id FROM scripts WHERE name = ?)", (name,))
+        self.conn.execute("DELETE FROM scripts WHERE name = ?", (name,))
+
+    def search(self, query: str = "", limit: Optional[int] = None) -> List[ScriptInfo]:
+        """Scripts matching every word of query (by prefix, in name, tags, text or hotkeys), by name"""
+        columns = "s.name, s.steps, s.clicks, s.tags, s.hash, s.error, s.last_run_seconds, s.last_run_at"
+        match = fts_query(query)
+        if match:
+            sql = (f"SELECT {columns} FROM scripts_fts JOIN scripts s ON s.id = scripts_fts.rowid "
+                   f"WHERE scripts_fts MATCH ? ORDER BY s.name COLLATE NOCASE")
+            params = [match]
+        else:
+            sql = f"SELECT {columns} FROM scripts s ORDER BY s.name COLLATE NOCASE"
+            params = []
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._info(row) for row in self.conn.execute(sql, params)]
+
+    def get(self, name: str) -> Optional[ScriptInfo]:
+        row = self.conn.execute(
+            "SELECT name, steps, clicks, tags, hash, error, last_run_seconds, last_run_at "
+            "FROM scripts WHERE name = ?", (name,)).fetchone()
+        return self._info(row) if row else None
+
+    def record_run(self, name: str, seconds: float):
+        with self.conn:
+            self.conn.execute("UPDATE scripts SET last_run_seconds = ?, last_run_at = ? WHERE name = ?",
+                              (seconds, time.time(), name))
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _info(row) -> ScriptInfo:
+        name, steps, clicks, tags, digest, error, last_run_seconds, last_run_at = row
+        return ScriptInfo(name, steps, clicks, [tag for tag in tags.split(", ") if tag], digest, error,
+                          last_run_seconds, last_run_at)
@@ -0,0 +1,232 @@
+"""
+Auto Trader Module
+Watchlist-wide automated trading with per-symbol strategies and a shared risk budget.
+
+Every symbol carries its own strategy assignment and state. Each cycle the
+app fetches one batch of quotes for the whole watchlist and evaluates the
+signal strategies (SWING, MEAN_REVERSION, BREAKOUT) concurrently off the Tk
+thread. decide() then turns prices and signals into orders, with the
+strongest signals first while the shared budget lasts.
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from trading_strategies import STRATEGY_SCORERS, RiskManager, Signal, TradingStrategies
+from instrumentation import timed
+
+logger = logging.getLogger(__name__)
+
+STATE_STRATEGIES = ["DAILY_BUY", "PROFIT_TAKE"]
+AUTO_STRATEGIES = STATE_STRATEGIES + list(STRATEGY_SCORERS)
+
+
+@dataclass
+class SymbolState:
+    """Strategy assignment and trading state of one watchlist symbol"""
+    symbol: str
+    strategy: str
+    enabled: bool = True
+    last_price: float = 0.0
+    last_signal: Optional[Signal] = None
+    last_buy_date: Optional[date] = None
+    last_action: str = ""
+
+
+@dataclass
+class Order:
+    """An order decided by the auto trader, placed by the app"""
+    symbol: str
+    side: str  # 'BUY' or 'SELL'
+    quantity: int
+    price: float
+    strategy: str
+    reason: str
+    strength: float = 1.0
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+    pnl: float = 0.0
+
+
+@dataclass
+class RiskBudget:
+    """Limits shared by every symbol the auto trader manages"""
+    max_position_size: float = 1000.0  # $ per position
+    max_total_exposure: float = 5000.0  # $ across all open positions
+    daily_loss_limit: float = 500.0
+    stop_loss_percent: float = 5.0
+    take_profit_percent: float = 5.0
+    shares_per_day: int = 1
+    daily_buy_enabled: bool = True
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "RiskBudget":
+        return cls(
+            max_position_size=float(config.get('max_position_size', 1000)),
+            max_total_exposure=float(config.get('max_total_exposure', 5000)),
+            daily_loss_limit=float(config.get('daily_loss_limit', 500)),
+            stop_loss_percent=float(config.get('stop_loss_percent', 5.0)),
+            take_profit_percent=float(config.get('take_profit_percent', 5.0)),
+            shares_per_day=int(config.get('shares_per_day', 1)),
+            daily_buy_enabled=bool(config.get('daily_buy_enabled', True))
+        )
+
+
+class AutoTrader:
+    """Decides orders for every watchlist symbol from batched prices and signals"""
+
+    def __init__(self, strategies: TradingStrategies, symbols: Iterable[str], default_strategy: str = "DAILY_BUY",
+                 assignments: Optional[Dict[str, str]] = None, budget: Optional[RiskBudget] = None):
+        self.strategies = strategies
+        self.default_strategy = default_strategy
+        self.budget = budget or RiskBudget()
+        self.states: Dict[str, SymbolState] = {}
+        self.set_watchlist(symbols, assignments)
+
+    def set_watchlist(self, symbols: Iterable[str], assignments: Optional[Dict[str, str]] = None):
+        assignments = assignments or {}
+        states = {}
+        for symbol in symbols:
+            state = self.states.get(symbol) or SymbolState(symbol, self.default_strategy)
+            if symbol in assignments:
+                state.strategy = assignments[symbol]
+            states[symbol] = state
+        self.states = states
+
+    def strategy_names(self) -> List[str]:
+        """Built-in strategies followed by any loaded rule strategies"""
+        rules = self.strategies.rules
+        return AUTO_STRATEGIES + ([] if rules is None else [name for name in rules.names if name not in AUTO_STRATEGIES])
+
+    def is_signal_strategy(self, strategy: str) -> bool:
+        return strategy in STRATEGY_SCORERS or self.strategies.has_rule_strategy(strategy)
+
+    def assign(self, symbol: str, strategy: str):
+        if strategy not in self.strategy_names():
+            raise ValueError(f"Unknown auto-trading strategy: {strategy}")
+        if symbol not in self.states:
+            self.states[symbol] = SymbolState(symbol, strategy)
+        self.states[symbol].strategy = strategy
+
+    def assignments(self) -> Dict[str, str]:
+        return {symbol: state.strategy for symbol, state in self.states.items()}
+
+    def signal_symbols(self) -> List[str]:
+        """Enabled symbols whose strategy needs indicator-based evaluation"""
+        return [symbol for symbol, state in self.states.items()
+                if state.enabled and self.is_signal_strategy(state.strategy)]
+
+    @timed("strategy.signal")
+    def evaluate_signal(self, symbol: str) -> Signal:
+        """Run the symbol's signal strategy (blocking; call off the Tk thread)"""
+        strategy = self.states[symbol].strategy
+        if self.strategies.has_rule_strategy(strategy):
+            return self.strategies.rule_strategy(symbol, strategy)
+        # Incremental indicators: only bars that closed since the last cycle are processed
+        return self.strategies.streaming_signal(symbol, strategy)
+
+    @timed("strategy.decide")
+    def decide(self, prices: Dict[str, float], signals: Dict[str, Signal],
+               open_positions: Dict[str, Dict], daily_pnl: float) -> List[Order]:
+        """Orders for this cycle; exits first, then entries ranked by signal strength"""
+        today = datetime.now().date()
+        exits, entries = [], []
+
+        for symbol, state in self.states.items():
+            price = prices.get(symbol, 0)
+            if price <= 0:
+                continue
+            state.last_price = price
+            if symbol in signals:
+                state.last_signal = signals[symbol]
+            if not state.enabled:
+                continue
+
+            position = open_positions.get(symbol)
+            if position is not None:
+                order = self._exit(state, price, position)
+                if order is not None:
+                    exits.append(order)
+            else:
+                order = self._entry(state, price, today)
+                if order is not None:
+                    entries.append(order)
+
+        # New positions only while the day's losses are within the limit
+        if RiskManager.check_daily_loss_limit(daily_pnl, self.budget.daily_loss_limit):
+            if entries:
+                logger.warning(f"Daily loss limit reached ({daily_pnl:.2f}); skipping {len(entries)} entries")
+            return exits
+
+        closing = {order.symbol for order in exits}
+        exposure = sum(position['quantity'] * prices.get(symbol, position['buy_price'])
+                       for symbol, position in open_positions.items() if symbol not in closing)
+        orders = list(exits)
+        for order in sorted(entries, key=lambda o: o.strength, reverse=True):
+            allowed, order.quantity = self._fit_budget(order, exposure)
+            if not allowed:
+                continue
+            exposure += order.quantity * order.price
+            orders.append(order)
+        return orders
+
+    def record_fill(self, symbol: str, side: str, quantity: int, price: float):
+        """Update per-symbol state once one of the symbol's orders has filled"""
+        state = self.states.get(symbol)
+        if state is None:
+            return
+        state.last_action = f"{side} {quantity} @ {price:.2f}"
+        if side == "BUY":
+            state.last_buy_date = datetime.now().date()
+
+    def _entry(self, state: SymbolState, price: float, today: date) -> Optional[Order]:
+        budget = self.budget
+        if state.strategy == "DAILY_BUY":
+            if not budget.daily_buy_enabled or state.last_buy_date == today:
+                return None
+            return Order(state.symbol, "BUY", budget.shares_per_day, price, state.strategy,
+                         f"Daily buy of {state.symbol}",
+                         take_profit=price * (1 + budget.take_profit_percent / 100))
+
+        signal = state.last_signal
+        if self.is_signal_strategy(state.strategy) and signal is not None and signal.action == "BUY":
+            # Levels on the wrong side of the price would close the position at once
+            stop_loss = signal.stop_loss if signal.stop_loss is not None and signal.stop_loss < price else None
+            take_profit = signal.take_profit if signal.take_profit is not None and signal.take_profit > price else None
+            quantity = int(budget.max_position_size / price)
+            return Order(state.symbol, "BUY", quantity, price, state.strategy, signal.reason,
+                         strength=signal.strength, stop_loss=stop_loss, take_profit=take_profit)
+        return None
+
+    def _exit(self, state: SymbolState, price: float, position: Dict) -> Optional[Order]:
+        buy_price = position['buy_price']
+        quantity = position['quantity']
+        pnl = (price - buy_price) * quantity
+        target = position.get('take_profit') or buy_price * (1 + self.budget.take_profit_percent / 100)
+
+        if state.strategy in ("DAILY_BUY", "PROFIT_TAKE"):
+            if price >= target:
+                return Order(state.symbol, "SELL", quantity, price, state.strategy,
+                             f"Target reached: {price:.2f} >= {target:.2f}", pnl=pnl)
+            return None
+
+        stop = position.get('stop_loss') or buy_price * (1 - self.budget.stop_loss_percent / 100)
+        signal = state.last_signal
+        if price <= stop:
+            reason = f"Stop loss: {price:.2f} <= {stop:.2f}"
+        elif price >= target:
+            reason = f"Target reached: {price:.2f} >= {target:.2f}"
+        elif signal is not None and signal.action == "SELL":
+            reason = signal.reason
+        else:
+            return None
+        return Order(state.symbol, "SELL", quantity, price, state.strategy, reason, pnl=pnl)
+
+    def _fit_budget(self, order: Order, exposure: float) -> Tuple[bool, int]:
+        """Shrink an entry to the per-position and total exposure limits"""
+        budget = self.budget
+        room = min(budget.max_position_size, budget.max_total_exposure - exposure)
+        quantity = min(order.quantity, int(room / order.price)) if room > 0 else 0
+        return quantity > 0, quantity
@@ -1,11 +1,63 @@
 """
 Automation Templates for Trading Platforms
 Pre-configured automation sequences for common trading platform interactions.
+
+Where a step has to wait for the platform (a search, a new order ticket),
+the templates wait for the area around the next click to stop changing
+instead of sleeping for the worst case, so an order goes through as soon
+as the page has drawn. After an action that loads a new page they first
+wait for that area to change, so they never click on the page before it.
+
+Every template can be dry-run against the recording input driver, with no
+display, on a simulated screen that redraws a while after each input, and
+checked against its saved traces in template_traces/ (one with a fast page
+and one with a page slower than the settle time):
+
+    python automation_templates.py            # simulated time of each template
+    python automation_templates.py --save     # record the expected traces
+    python automation_templates.py --check    # exit 1 if a template's actions changed
 """
 
-from typing import List, Dict
+import os
+import re
+import sys
+import time
+import argparse
+from typing import Callable, List, Dict, Tuple
 from dataclasses import dataclass
+from PIL import Image
 from main import Command, CommandType
+from automation_engine import RunReport, compile_commands
+from input_drivers import RecordingDriver, Trace, diff_traces
+
+# Longest a template waits for the platform's UI before the run fails
+UI_TIMEOUT = 5.0
+# Saved dry-run traces the templates are checked against
+TRACE_DIR = "template_traces"
+# Seconds the dry-run screen takes to load a page after a click or navigation key, per trace
+# variant; "slow" is longer than the settle time, so a wait that misses the new page clicks too early
+PAGE_REDRAWS = {"": 0.1, "slow": 0.8}
+NAVIGATION_KEYS = ("enter", "f5")
+
+def ui_region(x: int, y: int) -> Tuple[int, int, int, int]:
+    """The area around (x, y) a wait watches"""
+    return (max(0, x - 150), max(0, y - 60), 300, 120)
+
+def wait_for_ui(x: int, y: int, timeout: float = UI_TIMEOUT) -> Command:
+    """Wait until the area around (x, y) has stopped changing, i.e. the page has finished drawing there"""
+    return Command(type=CommandType.WAIT_UNTIL, condition='region_stable', region=ui_region(x, y),
+                   seconds=timeout)
+
+def wait_for_page(x: int, y: int, timeout: float = UI_TIMEOUT) -> List[Command]:
+    """
+    Wait after an action that loads a new page (a search, a ticket, a review
+    step): first for the area around (x, y) to change, then for it to settle.
+    The old page is already settled, so settling alone could click on it
+    before the new one draws; if nothing changes the run fails at the timeout.
+    """
+    return [Command(type=CommandType.WAIT_UNTIL, condition='region_changed', region=ui_region(x, y),
+                    seconds=timeout),
+            wait_for_ui(x, y, timeout)]
 
 @dataclass
 class AutomationTemplate:
@@ -31,15 +83,15 @@ class AutomationTemplates:
                 
                 # Type symbol
                 Command(type=CommandType.TYPE, text=symbol),
-                Command(type=CommandType.DELAY, seconds=1),
+                wait_for_ui(300, 400),
                 
                 # Press Enter to search
                 Command(type=CommandType.HOTKEY, keys="enter"),
-                Command(type=CommandType.DELAY, seconds=2),
+                *wait_for_page(300, 400),
                 
                 # Click Buy button
                 Command(type=CommandType.CLICK, x=300, y=400),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(400, 500),
                 
                 # Type quantity
                 Command(type=CommandType.TYPE, text=str(quantity)),
@@ -47,7 +99,7 @@ class AutomationTemplates:
                 
                 # Click Review Order
                 Command(type=CommandType.CLICK, x=400, y=500),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(450, 550),
                 
                 # Click Submit Order
                 Command(type=CommandType.CLICK, x=450, y=550),
@@ -68,15 +120,15 @@ class AutomationTemplates:
                 
                 # Type symbol
                 Command(type=CommandType.TYPE, text=symbol),
-                Command(type=CommandType.DELAY, seconds=1),
+                wait_for_ui(400, 400),
                 
                 # Press Enter to search
                 Command(type=CommandType.HOTKEY, keys="enter"),
-                Command(type=CommandType.DELAY, seconds=2),
+                *wait_for_page(400, 400),
                 
                 # Click Sell button
                 Command(type=CommandType.CLICK, x=400, y=400),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(400, 500),
                 
                 # Type quantity
                 Command(type=CommandType.TYPE, text=str(quantity)),
@@ -84,7 +136,7 @@ class AutomationTemplates:
                 
                 # Click Review Order
                 Command(type=CommandType.CLICK, x=400, y=500),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(450, 550),
                 
                 # Click Submit Order
                 Command(type=CommandType.CLICK, x=450, y=550),
@@ -101,7 +153,7 @@ class AutomationTemplates:
             commands=[
                 # Click Trade tab
                 Command(type=CommandType.CLICK, x=150, y=50),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(200, 150),
                 
                 # Click Symbol field
                 Command(type=CommandType.CLICK, x=200, y=150),
@@ -109,7 +161,7 @@ class AutomationTemplates:
                 
                 # Type symbol
                 Command(type=CommandType.TYPE, text=symbol),
-                Command(type=CommandType.DELAY, seconds=1),
+                wait_for_ui(300, 300),
                 
                 # Press Tab to move to quantity
                 Command(type=CommandType.HOTKEY, keys="tab"),
@@ -121,11 +173,11 @@ class AutomationTemplates:
                 
                 # Click Buy button
                 Command(type=CommandType.CLICK, x=300, y=300),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(350, 400),
                 
                 # Click Review Order
                 Command(type=CommandType.CLICK, x=350, y=400),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(400, 450),
                 
                 # Click Submit Order
                 Command(type=CommandType.CLICK, x=400, y=450),
@@ -142,7 +194,7 @@ class AutomationTemplates:
             commands=[
                 # Click Trading tab
                 Command(type=CommandType.CLICK, x=200, y=60),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(250, 200),
                 
                 # Click Symbol field
                 Command(type=CommandType.CLICK, x=250, y=200),
@@ -150,15 +202,15 @@ class AutomationTemplates:
                 
                 # Type symbol
                 Command(type=CommandType.TYPE, text=symbol),
-                Command(type=CommandType.DELAY, seconds=1),
+                wait_for_ui(300, 350),
                 
                 # Press Enter to search
                 Command(type=CommandType.HOTKEY, keys="enter"),
-                Command(type=CommandType.DELAY, seconds=2),
+                *wait_for_page(300, 350),
                 
                 # Click Buy button
                 Command(type=CommandType.CLICK, x=300, y=350),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(350, 400),
                 
                 # Click Quantity field
                 Command(type=CommandType.CLICK, x=350, y=400),
@@ -170,7 +222,7 @@ class AutomationTemplates:
                 
                 # Click Preview Order
                 Command(type=CommandType.CLICK, x=400, y=500),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(450, 550),
                 
                 # Click Place Order
                 Command(type=CommandType.CLICK, x=450, y=550),
@@ -191,15 +243,15 @@ class AutomationTemplates:
                 
                 # Type symbol
                 Command(type=CommandType.TYPE, text=symbol),
-                Command(type=CommandType.DELAY, seconds=1),
+                wait_for_ui(250, 300),
                 
                 # Press Enter to search
                 Command(type=CommandType.HOTKEY, keys="enter"),
-                Command(type=CommandType.DELAY, seconds=2),
+                *wait_for_page(250, 300),
                 
                 # Click Buy button
                 Command(type=CommandType.CLICK, x=250, y=300),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(300, 350),
                 
                 # Click Quantity field
                 Command(type=CommandType.CLICK, x=300, y=350),
@@ -211,7 +263,7 @@ class AutomationTemplates:
                 
                 # Click Review Order
                 Command(type=CommandType.CLICK, x=350, y=450),
-                Command(type=CommandType.DELAY, seconds=1),
+                *wait_for_page(400, 500),
                 
                 # Click Submit Order
                 Command(type=CommandType.CLICK, x=400, y=500),
@@ -228,11 +280,11 @@ class AutomationTemplates:
             commands=[
                 # Press F5 to refresh
                 Command(type=CommandType.HOTKEY, keys="f5"),
-                Command(type=CommandType.DELAY, seconds=2),
+                *wait_for_page(50, 50),
                 
                 # Or click refresh button (common location)
                 Command(type=CommandType.CLICK, x=50, y=50),
-                Command(type=CommandType.DELAY, seconds=2),
+                wait_for_ui(50, 50),
             ]
         )
     
@@ -333,4 +385,95 @@ def create_sell_order_sequence(symbol: str, quantity: int, platform: str = "Robi
                 return customized.commands
     
     # Fallback to generic template
-    return AutomationTemplates.generic_refresh_template().commands
\ No newline at end of file
+    return AutomationTemplates.generic_refresh_template().commands
+
+def trace_file_name(template: AutomationTemplate, variant: str = "") -> str:
+    """'E*TRADE Buy Order' -> 'etrade_buy_order.jsonl', or 'etrade_buy_order.slow.jsonl' for variant 'slow'"""
+    name = re.sub(r'[^a-z0-9]+', '_', template.name.lower().replace('*', '')).strip('_')
+    return f"{name}.{variant}.jsonl" if variant else f"{name}.jsonl"
+
+def navigations(trace: Trace) -> List[float]:
+    """Times of the inputs that make the platform load a page: clicks and navigation keys"""
+    return [event.time for event in trace.inputs()
+            if event.action == 'click' or (event.action == 'hotkey' and event.args[-1] in NAVIGATION_KEYS)]
+
+def redrawing_screen(driver: RecordingDriver, redraw: float) -> Callable[[float], Image.Image]:
+    """
+    Screen for a dry run that loads a new page `redraw` seconds after every
+    click or navigation key the driver records; like a browser, a newer
+    navigation cancels one still loading
+    """
+    pages: Dict[int, Image.Image] = {}
+
+    def screen(elapsed: float) -> Image.Image:
+        times = navigations(driver.trace)
+        page = sum(1 for started, following in zip(times, times[1:] + [float('inf')])
+                   if started + redraw <= min(elapsed, following))
+        if page not in pages:
+            pages[page] = Image.new('RGB', driver.size(), (page * 40 % 256, page * 90 % 256, 64))
+        return pages[page]
+    return screen
+
+def clicks_while_loading(trace: Trace, redraw: float) -> List[str]:
+    """Clicks sent before the page loaded by the previous click or navigation key had drawn"""
+    early = []
+    previous = None
+    for event in trace.inputs():
+        if event.action == 'click' and previous is not None and event.time < previous + redraw:
+            early.append(f"{event.describe()} at {event.time:.3f}s, page still loading until "
+                         f"{previous + redraw:.3f}s")
+        if event.action == 'click' or (event.action == 'hotkey' and event.args[-1] in NAVIGATION_KEYS):
+            previous = event.time
+    return early
+
+def dry_run_template(template: AutomationTemplate, redraw: float = PAGE_REDRAWS[""]) -> Tuple[RunReport, Trace]:
+    """Run a template against the recording driver, on a screen that redraws `redraw` seconds after each input"""
+    driver = RecordingDriver()
+    driver.screen = redrawing_screen(driver, redraw)
+    report = compile_commands(template.commands, driver=driver).run()
+    return report, driver.trace
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dry-run every automation template without a display")
+    parser.add_argument("--save", action="store_true", help="Save each template's trace as the expected one")
+    parser.add_argument("--check", action="store_true", help="Compare each template's trace with the saved one")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Seconds an action may start early or late in --check (default: %(default)s)")
+    parser.add_argument("--trace-dir", default=TRACE_DIR, help="Where traces are saved (default: %(default)s)")
+    args = parser.parse_args(argv)
+    
+    failures = 0
+    for templates in AutomationTemplates.get_all_templates().values():
+        for template in templates:
+            for variant, redraw in PAGE_REDRAWS.items():
+                started = time.perf_counter()
+                report, trace = dry_run_template(template, redraw)
+                took = time.perf_counter() - started
+                print(f"{template.name:26} {variant or 'fast':4} page {len(trace.inputs()):3} actions "
+                      f"{len(trace) - len(trace.inputs()):4} grabs "
+                      f"{report.total:7.3f}s simulated, dry run {took * 1000:.1f}ms")
+                if report.error:
+                    print(f"  {report.error}")
+                    failures += 1
+                    continue
+                early = clicks_while_loading(trace, redraw)
+                for line in early:
+                    print(f"  {line}")
+                failures += bool(early)
+                path = os.path.join(args.trace_dir, trace_file_name(template, variant))
+                if args.save:
+                    os.makedirs(args.trace_dir, exist_ok=True)
+                    trace.save(path)
+                elif args.check:
+                    if not os.path.exists(path):
+                        print(f"  no saved trace {path}")
+                        failures += 1
+                        continue
+                    differences = diff_traces(Trace.load(path), trace, args.tolerance)
+                    for line in differences:
+                        print(f"  {line}")
+                    failures += bool(differences)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+Backtesting Module
+Replays historical OHLCV bars through the strategy scoring logic and simulates fills.
+
+Indicators are updated incrementally with IndicatorEngine, so each bar costs
+O(1) regardless of how much history has already been replayed. Signals are
+scored with the same StrategyScoring rules the live strategies use and are
+filled at the next bar's open (no look-ahead), with slippage and commission.
+Open positions are closed intrabar when Signal.stop_loss or take_profit is hit.
+"""
+
+import math
+import time
+import logging
+from typing import Dict, List, Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from market_data import BarCache
+from streaming_indicators import IndicatorEngine
+from trading_strategies import STRATEGY_SCORERS, RiskManager, Signal, strategy_params
+
+logger = logging.getLogger(__name__)
+
+# Bars per year for annualizing the Sharpe ratio (252 sessions of 6.5 hours)
+BARS_PER_YEAR = {
+    '1m': 252 * 390,
+    '5m': 252 * 78,
+    '15m': 252 * 26,
+    '30m': 252 * 13,
+    '1h': 252 * 7,
+    '1d': 252,
+}
+
+# Strategy parameters that configure the indicators rather than the scoring
+INDICATOR_PARAMS = ('rsi_period', 'bb_period', 'bb_std', 'atr_period', 'range_window', 'volume_window')
+
+
+@dataclass
+class BacktestConfig:
+    """Account and execution assumptions for a backtest"""
+    initial_balance: float = 10000.0
+    risk_per_trade: float = 2.0  # percent of equity risked per trade
+    stop_loss_percent: float = 5.0  # fallback when a signal has no usable stop
+    slippage_bps: float = 5.0
+    commission_per_share: float = 0.005
+    min_commission: float = 1.0
+    max_position_value: Optional[float] = None
+    allow_short: bool = True
+    interval: str = "1h"
+
+
+@dataclass
+class BacktestTrade:
+    """A completed round trip"""
+    symbol: str
+    side: str  # 'LONG' or 'SHORT'
+    quantity: int
+    entry_time: datetime
+    entry_price: float
+    exit_time: datetime
+    exit_price: float
+    exit_reason: str  # STOP_LOSS, TAKE_PROFIT, SIGNAL, END
+    commission: float
+    pnl: float
+
+
+@dataclass
+class BacktestResult:
+    """Equity curve, trades and summary statistics of one backtest"""
+    symbol: str
+    strategy: str
+    equity_curve: pd.Series
+    trades: List[BacktestTrade]
+    total_return: float
+    sharpe: float
+    max_drawdown: float
+    win_rate: float
+    bars: int
+    elapsed: float
+    params: Dict = field(default_factory=dict)
+
+    def summary(self) -> Dict:
+        """Headline numbers, e.g. for logging or ranking"""
+        return {
+            'symbol': self.symbol,
+            'strategy': self.strategy,
+            'total_return': self.total_return,
+            'sharpe': self.sharpe,
+            'max_drawdown': self.max_drawdown,
+            'win_rate': self.win_rate,
+            'trades': len(self.trades),
+            'bars': self.bars,
+            'bars_per_second': self.bars / self.elapsed if self.elapsed > 0 else 0.0,
+        }
+
+
+class Backtester:
+    """Bar-by-bar strategy replay with simulated execution"""
+
+    def __init__(self, config: Optional[BacktestConfig] = None):
+        self.config = config or BacktestConfig()
+
+    def run(self, data: pd.DataFrame, strategy: str, symbol: str = "",
+            params: Optional[Dict] = None, warmup: int = 0) -> BacktestResult:
+        """
+        Backtest one strategy over an OHLCV DataFrame, optionally overriding
+        STRATEGY_PARAMS. The first `warmup` bars only prime the indicators:
+        nothing is traded on them and they are left out of the results.
+        """
+        if strategy not in STRATEGY_SCORERS:
+            raise ValueError(f"Strategy {strategy} cannot be backtested; "
+                             f"choose one of {', '.join(STRATEGY_SCORERS)}")
+
+        started = time.perf_counter()
+        scorer = STRATEGY_SCORERS[strategy]
+        params = strategy_params(strategy, params)
+        engine = self._create_engine(params)
+        config = self.config
+        slippage = config.slippage_bps / 10000
+
+        timestamps = list(data.index)
+        # Plain Python floats are much cheaper to do per-bar arithmetic on than numpy scalars
+        opens = data['Open'].to_numpy(dtype=float).tolist()
+        highs = data['High'].to_numpy(dtype=float).tolist()
+        lows = data['Low'].to_numpy(dtype=float).tolist()
+        closes = data['Close'].to_numpy(dtype=float).tolist()
+        volumes = data['Volume'].to_numpy(dtype=float).tolist()
+
+        cash = config.initial_balance
+        position = 0  # signed share count
+        entry_price = 0.0
+        entry_time = None
+        entry_commission = 0.0
+        stop_loss = None
+        take_profit = None
+        pending: Optional[Signal] = None
+        trades: List[BacktestTrade] = []
+        warmup = min(max(warmup, 0), len(closes))
+        equity = np.empty(len(closes) - warmup)
+
+        def close_position(price: float, when: datetime, reason: str):
+            nonlocal cash, position, entry_commission
+            fill = price * (1 - slippage) if position > 0 else price * (1 + slippage)
+            commission = self._commission(abs(position))
+            cash += position * fill - commission
+            pnl = (fill - entry_price) * position - entry_commission - commission
+            trades.append(BacktestTrade(
+                symbol=symbol,
+                side="LONG" if position > 0 else "SHORT",
+                quantity=abs(position),
+                entry_time=entry_time,
+                entry_price=entry_price,
+                exit_time=when,
+                exit_price=fill,
+                exit_reason=reason,
+                commission=entry_commission + commission,
+                pnl=pnl
+            ))
+            position = 0
+            entry_commission = 0.0
+
+        for i in range(warmup):
+            engine.update(opens[i], highs[i], lows[i], closes[i], volumes[i])
+
+        for i in range(warmup, len(closes)):
+            when = timestamps[i]
+            bar_open, bar_high, bar_low, bar_close = opens[i], highs[i], lows[i], closes[i]
+
+            # Act on the previous bar's signal at this bar's open
+            if pending is not None:
+                if position and ((position > 0 and pending.action == "SELL") or
+                                 (position < 0 and pending.action == "BUY")):
+                    close_position(bar_open, when, "SIGNAL")
+                elif not position:
+                    opened = self._open_position(pending, bar_open, cash, slippage)
+                    if opened is not None:
+                        position, entry_price, stop_loss, take_profit = opened
+                        entry_commission = self._commission(abs(position))
+                        cash -= position * entry_price + entry_commission
+                        entry_time = when
+                pending = None
+
+            # Protective exits inside the bar; the stop is assumed to trigger
+            # first when both levels are touched
+            if position > 0:
+                if stop_loss is not None and bar_low <= stop_loss:
+                    close_position(min(bar_open, stop_loss), when, "STOP_LOSS")
+                elif take_profit is not None and bar_high >= take_profit:
+                    close_position(max(bar_open, take_profit), when, "TAKE_PROFIT")
+            elif position < 0:
+                if stop_loss is not None and bar_high >= stop_loss:
+                    close_position(max(bar_open, stop_loss), when, "STOP_LOSS")
+                elif take_profit is not None and bar_low <= take_profit:
+                    close_position(min(bar_open, take_profit), when, "TAKE_PROFIT")
+
+            snapshot = engine.update(bar_open, bar_high, bar_low, bar_close, volumes[i])
+            signal = scorer(symbol, snapshot, when, params)
+            if signal.action != "HOLD":
+                pending = signal
+
+            equity[i - warmup] = cash + position * bar_close
+
+        if position and len(equity):
+            close_position(closes[-1], timestamps[-1], "END")
+            equity[-1] = cash
+
+        result = self._build_result(symbol, strategy, pd.Series(equity, index=data.index[warmup:]), trades,
+                                    time.perf_counter() - started)
+        result.params = params
+        return result
+
+    def run_cached(self, symbol: str, strategy: str, period: str = "2y", interval: Optional[str] = None,
+                   bar_cache: Optional[BarCache] = None, params: Optional[Dict] = None) -> BacktestResult:
+        """Backtest against bars served by a BarCache"""
+        interval = interval or self.config.interval
+        data = (bar_cache or BarCache()).get_bars(symbol, period=period, interval=interval)
+        return self.run(data, strategy, symbol, params)
+
+    def _create_engine(self, params: Dict) -> IndicatorEngine:
+        return IndicatorEngine(**{key: params[key] for key in INDICATOR_PARAMS if key in params})
+
+    def _open_position(self, signal: Signal, bar_open: float, equity: float, slippage: float):
+        """Size and fill a new position; returns (shares, fill, stop, target) or None"""
+        config = self.config
+        if signal.action == "SELL" and not config.allow_short:
+            return None
+
+        direction = 1 if signal.action == "BUY" else -1
+        fill = bar_open * (1 + slippage * direction)
+
+        # Levels on the wrong side of the fill can't act as stop/target
+        stop_loss = signal.stop_loss
+        if stop_loss is None or _is_nan(stop_loss) or (stop_loss - fill) * direction >= 0:
+            stop_loss = fill * (1 - direction * config.stop_loss_percent / 100)
+        take_profit = signal.take_profit
+        if take_profit is not None and (_is_nan(take_profit) or (take_profit - fill) * direction <= 0):
+            take_profit = None
+
+        quantity = RiskManager.calculate_position_size(equity, config.risk_per_trade, fill, stop_loss)
+        max_value = equity if config.max_position_value is None else min(equity, config.max_position_value)
+        quantity = min(quantity, int(max_value / fill))
+        if quantity <= 0:
+            return None
+        return direction * quantity, fill, stop_loss, take_profit
+
+    def _commission(self, shares: int) -> float:
+        return max(self.config.min_commission, shares * self.config.commission_per_share)
+
+    def _build_result(self, symbol: str, strategy: str, equity_curve: pd.Series,
+                      trades: List[BacktestTrade], elapsed: float) -> BacktestResult:
+        initial = self.config.initial_balance
+        values = equity_curve.to_numpy()
+        total_return = (values[-1] / initial - 1) if len(values) else 0.0
+
+        returns = np.diff(values) / values[:-1] if len(values) > 1 else np.array([])
+        std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+        bars_per_year = BARS_PER_YEAR.get(self.config.interval, 252)
+        sharpe = float(returns.mean() / std * math.sqrt(bars_per_year)) if std > 0 else 0.0
+
+        peaks = np.maximum.accumulate(values) if len(values) else values
+        max_drawdown = float(((peaks - values) / peaks).max()) if len(values) else 0.0
+
+        wins = sum(1 for trade in trades if trade.pnl > 0)
+        return BacktestResult(
+            symbol=symbol,
+            strategy=strategy,
+            equity_curve=equity_curve,
+            trades=trades,
+            total_return=float(total_return),
+            sharpe=sharpe,
+            max_drawdown=max_drawdown,
+            win_rate=wins / len(trades) if trades else 0.0,
+            bars=len(values),
+            elapsed=elapsed
+        )
+
+
+def _is_nan(value: float) -> bool:
+    return value != value
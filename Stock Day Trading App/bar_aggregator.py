@@ -0,0 +1,489 @@
+"""
+Bar Aggregator Module
+Multi-timeframe OHLCV bars maintained from one fine-grained feed per symbol.
+
+BarAggregator ingests a symbol's base-interval bars (1m by default) and
+keeps 1m/5m/15m/1h/1d bars up to date from them, each timeframe in a
+fixed-size, array-backed ring buffer of closed bars plus the bar still
+forming. Intraday buckets are aligned to the session open (09:30 exchange
+time, like yfinance's hourly bars) and daily bars to the exchange date.
+Quotes can be fed in as ticks; they move the forming bars between polls
+but never overwrite polled bars, which stay authoritative.
+
+AggregatedBarCache puts it behind the BarCache interface: a timeframe's
+history is downloaded once when a strategy first asks for it, and from
+then on every timeframe is kept current by polling the single base feed.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BAR_COLUMNS, BAR_DTYPE, NS_PER_DAY
+from instrumentation import instruments
+from market_data import DEFAULT_TTL, BarCache, Fetcher, period_days
+
+logger = logging.getLogger(__name__)
+
+NS_PER_MINUTE = 60 * 10 ** 9
+INTERVAL_NS = {
+    '1m': NS_PER_MINUTE,
+    '2m': 2 * NS_PER_MINUTE,
+    '5m': 5 * NS_PER_MINUTE,
+    '15m': 15 * NS_PER_MINUTE,
+    '30m': 30 * NS_PER_MINUTE,
+    '1h': 60 * NS_PER_MINUTE,
+    '1d': NS_PER_DAY,
+}
+DEFAULT_INTERVALS = ('1m', '5m', '15m', '1h', '1d')
+DEFAULT_CAPACITY = 2048  # bars per timeframe: ~5 sessions of 1m bars, 8 years of daily ones
+DEFAULT_TZ = "America/New_York"
+DEFAULT_ORIGIN = "09:30"  # intraday buckets start at the session open
+DEFAULT_BASE_PERIOD = "5d"
+
+Bar = Tuple[int, float, float, float, float, float]  # (UTC ns, open, high, low, close, volume)
+
+
+def to_bars(data: pd.DataFrame) -> np.ndarray:
+    """OHLCV DataFrame -> structured array with UTC nanosecond timestamps, sorted, NaN rows dropped"""
+    if data is None or data.empty:
+        return np.empty(0, dtype=BAR_DTYPE)
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    bars = np.empty(len(data), dtype=BAR_DTYPE)
+    bars['timestamp'] = index.as_unit('ns').asi8
+    for column in BAR_COLUMNS:
+        bars[column] = data[column].to_numpy(dtype=float) if column in data else 0.0
+    bars = bars[~np.isnan(bars['Close'])]
+    return bars[np.argsort(bars['timestamp'], kind='stable')]
+
+
+def to_frame(bars: np.ndarray, tz: Optional[str]) -> pd.DataFrame:
+    index = pd.DatetimeIndex(bars['timestamp'].astype('datetime64[ns]')).tz_localize('UTC')
+    if tz:
+        index = index.tz_convert(tz)
+    return pd.DataFrame({column: bars[column] for column in BAR_COLUMNS}, index=index)
+
+
+def local_ns(utc_ns: np.ndarray, tz: Optional[str]) -> np.ndarray:
+    """Wall-clock nanoseconds in `tz` for UTC nanosecond timestamps"""
+    if not tz:
+        return np.asarray(utc_ns, dtype=np.int64)
+    index = pd.DatetimeIndex(np.asarray(utc_ns, dtype=np.int64).astype('datetime64[ns]'))
+    return index.tz_localize('UTC').tz_convert(tz).tz_localize(None).as_unit('ns').asi8
+
+
+def resample(bars: np.ndarray, buckets: np.ndarray, local: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate consecutive bars sharing a bucket (local bucket start, non-decreasing).
+    Returns the aggregated bars, stamped with the bucket start in UTC, and their buckets.
+    """
+    if not len(bars):
+        return np.empty(0, dtype=BAR_DTYPE), np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(bars)] - 1
+    out = np.empty(len(starts), dtype=BAR_DTYPE)
+    out['timestamp'] = bars['timestamp'][starts] - (local[starts] - buckets[starts])
+    out['Open'] = bars['Open'][starts]
+    out['High'] = np.maximum.reduceat(bars['High'], starts)
+    out['Low'] = np.minimum.reduceat(bars['Low'], starts)
+    out['Close'] = bars['Close'][ends]
+    out['Volume'] = np.add.reduceat(bars['Volume'], starts)
+    return out, buckets[starts]
+
+
+def _merge(bar: Optional[Bar], newer: Bar, timestamp: Optional[int] = None) -> Bar:
+    """Fold a newer bar into an aggregate (or start one, stamped `timestamp`)"""
+    if bar is None:
+        return (newer[0] if timestamp is None else timestamp,) + tuple(newer[1:])
+    return (bar[0], bar[1], max(bar[2], newer[2]), min(bar[3], newer[3]), newer[4], bar[5] + newer[5])
+
+
+class RingBuffer:
+    """Fixed-capacity array of bars; appending past capacity drops the oldest"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.data = np.zeros(capacity, dtype=BAR_DTYPE)
+        self.capacity = capacity
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, bar: Bar):
+        index = (self.start + self.count) % self.capacity
+        self.data[index] = bar
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def extend(self, bars: np.ndarray):
+        bars = bars[-self.capacity:]
+        end = (self.start + self.count) % self.capacity
+        first = min(len(bars), self.capacity - end)
+        self.data[end:end + first] = bars[:first]
+        self.data[:len(bars) - first] = bars[first:]
+        overflow = max(0, self.count + len(bars) - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.count = min(self.count + len(bars), self.capacity)
+
+    def clear(self):
+        self.start = self.count = 0
+
+    def array(self) -> np.ndarray:
+        """Copy of the bars, oldest first"""
+        end = self.start + self.count
+        if end <= self.capacity:
+            return self.data[self.start:end].copy()
+        return np.concatenate([self.data[self.start:], self.data[:end - self.capacity]])
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+
+class Timeframe:
+    """Closed bars of one interval in a ring buffer, plus the bar currently forming"""
+
+    def __init__(self, interval: str, capacity: int, origin_ns: int):
+        self.interval = interval
+        self.width = INTERVAL_NS[interval]
+        # Daily bars start at midnight; intraday ones on the grid through the session open
+        self.origin = 0 if self.width >= NS_PER_DAY else origin_ns % self.width
+        self.closed = RingBuffer(capacity)
+        self.bucket: Optional[int] = None  # local start of the forming bar
+        self.partial: Optional[Bar] = None  # committed base bars of the forming bar
+        self.forming: Optional[Bar] = None  # partial plus the latest base bar
+
+    def bucket_of(self, local):
+        return (local - self.origin) // self.width * self.width + self.origin
+
+    def commit(self, bar: Bar, stamp: int):
+        """The latest base bar is final (a newer one has arrived)"""
+        self.partial = _merge(self.partial, bar, stamp)
+
+    def advance(self, bar: Bar, local: int):
+        """Show the latest base bar, closing the forming bar if it starts a new bucket"""
+        bucket = self.bucket_of(local)
+        if self.bucket is not None and bucket != self.bucket:
+            if self.partial is not None:
+                self.closed.append(self.partial)
+            self.partial = None
+        self.bucket = bucket
+        self.forming = _merge(self.partial, bar, bar[0] - (local - bucket))
+
+    def rebuild(self, history: np.ndarray, base: np.ndarray, base_local: np.ndarray, tz: Optional[str]):
+        """Reset from downloaded history of this interval followed by the base feed (latest bar last)"""
+        self.closed.clear()
+        self.bucket = self.partial = self.forming = None
+        if not len(base):
+            self.closed.extend(history)
+            return
+
+        buckets = self.bucket_of(base_local)
+        first = buckets[0]
+        if len(history):
+            history_buckets = self.bucket_of(local_ns(history['timestamp'], tz))
+            # A downloaded bar for the feed's first bucket is complete, where the feed may have
+            # started partway through it, so history wins unless that bucket is still forming
+            covered = first if first < buckets[-1] and (history_buckets == first).any() else first - 1
+            self.closed.extend(history[history_buckets <= covered])
+            keep = buckets > covered
+            base, base_local, buckets = base[keep], base_local[keep], buckets[keep]
+
+        groups, group_buckets = resample(base[:-1], buckets[:-1], base_local[:-1])
+        if len(groups) and group_buckets[-1] == buckets[-1]:
+            self.partial = tuple(groups[-1].tolist())
+            groups = groups[:-1]
+        self.closed.extend(groups)
+        self.advance(tuple(base[-1].tolist()), int(base_local[-1]))
+
+    def array(self) -> np.ndarray:
+        bars = self.closed.array()
+        if self.forming is not None:
+            bars = np.append(bars, np.array([self.forming], dtype=BAR_DTYPE))
+        return bars
+
+
+class SymbolBars:
+    """Every tracked timeframe of one symbol and the latest bar of its feed"""
+
+    def __init__(self, tz: Optional[str]):
+        self.tz = tz
+        self.frames: Dict[str, Timeframe] = {}
+        self.latest: Optional[Bar] = None  # newest base bar
+        self.latest_local = 0
+        self.tick: Optional[Bar] = None  # provisional base bar built from quotes
+
+
+class BarAggregator:
+    """Rolling multi-timeframe bars per symbol, fed from one base interval"""
+
+    def __init__(self, base_interval: str = '1m', intervals: Iterable[str] = DEFAULT_INTERVALS,
+                 capacity: int = DEFAULT_CAPACITY, tz: Optional[str] = DEFAULT_TZ, origin: str = DEFAULT_ORIGIN):
+        self.base_interval = base_interval
+        self.intervals = list(dict.fromkeys([base_interval] + list(intervals)))
+        unknown = [interval for interval in self.intervals if interval not in INTERVAL_NS]
+        if unknown:
+            raise ValueError(f"Can't aggregate intervals: {', '.join(unknown)}")
+        if any(INTERVAL_NS[interval] % INTERVAL_NS[base_interval] for interval in self.intervals):
+            raise ValueError(f"Every interval must be a multiple of {base_interval}")
+        self.capacity = capacity
+        self.tz = tz
+        self.origin_ns = pd.Timedelta(f"{origin}:00").value if origin else 0
+        self.symbols: Dict[str, SymbolBars] = {}
+        self.stale_bars = 0
+        self._lock = threading.Lock()
+
+    def has(self, symbol: str, interval: Optional[str] = None) -> bool:
+        state = self.symbols.get(symbol)
+        if state is None or state.latest is None:
+            return False
+        return interval is None or interval in state.frames
+
+    def latest_timestamp(self, symbol: str) -> Optional[pd.Timestamp]:
+        state = self.symbols.get(symbol)
+        if state is None or state.latest is None:
+            return None
+        return pd.Timestamp(state.latest[0], tz='UTC')
+
+    def ingest(self, symbol: str, data: pd.DataFrame) -> int:
+        """
+        Add base-interval bars. A bar with the latest timestamp replaces it (the
+        source's last bar is usually still forming); older bars are ignored.
+        Returns the number of bars applied.
+        """
+        bars = to_bars(data)
+        tz = str(data.index.tz) if getattr(data.index, 'tz', None) is not None else None
+        with self._lock:
+            state = self.symbols.get(symbol)
+            if state is None:
+                state = self.symbols[symbol] = SymbolBars(tz or self.tz)
+                state.frames[self.base_interval] = self._timeframe(self.base_interval)
+            if not len(bars):
+                return 0
+            local = local_ns(bars['timestamp'], state.tz)
+
+            if state.latest is None:
+                # First load: build the base timeframe in one vectorized pass
+                state.frames[self.base_interval].rebuild(np.empty(0, dtype=BAR_DTYPE), bars, local, state.tz)
+                state.latest = tuple(bars[-1].tolist())
+                state.latest_local = int(local[-1])
+                return len(bars)
+
+            applied = 0
+            for bar, bar_local in zip(bars.tolist(), local.tolist()):
+                if bar[0] < state.latest[0]:
+                    self.stale_bars += 1
+                    continue
+                self._apply(state, tuple(bar), bar_local)
+                applied += 1
+            if state.tick is not None and state.tick[0] < state.latest[0]:
+                state.tick = None
+            return applied
+
+    def ingest_tick(self, symbol: str, price: float, volume: float = 0.0, timestamp: Optional[int] = None):
+        """
+        Move the forming bars with a quote (UTC ns, default now). Ticks build a
+        provisional base bar shown on top of the polled ones until the feed catches up.
+        """
+        with self._lock:
+            state = self.symbols.get(symbol)
+            if state is None or state.latest is None or not price:
+                return
+            timestamp = time.time_ns() if timestamp is None else timestamp
+            width = INTERVAL_NS[self.base_interval]
+            start = timestamp - timestamp % width
+            if start < state.latest[0]:
+                return
+            tick = (start, price, price, price, price, volume)
+            state.tick = _merge(state.tick, tick) if state.tick is not None and state.tick[0] == start else tick
+
+    def track(self, symbol: str, interval: str, history: Optional[pd.DataFrame] = None):
+        """Start (or restart) maintaining a timeframe, backfilled from its own downloaded history"""
+        history_bars = to_bars(history) if history is not None else np.empty(0, dtype=BAR_DTYPE)
+        with self._lock:
+            state = self.symbols.get(symbol)
+            if state is None:
+                raise KeyError(f"No {self.base_interval} bars ingested for {symbol}")
+            base = state.frames[self.base_interval].array()
+            frame = state.frames.get(interval) or self._timeframe(interval)
+            frame.rebuild(history_bars, base, local_ns(base['timestamp'], state.tz), state.tz)
+            state.frames[interval] = frame
+
+    def bars(self, symbol: str, interval: str) -> np.ndarray:
+        """Closed bars plus the forming one (including any newer ticks), oldest first"""
+        with self._lock:
+            state = self.symbols[symbol]
+            frame = state.frames[interval]
+            bars = frame.array()
+            tick = state.tick
+            if tick is None or not len(bars):
+                return bars
+            tick_local = state.latest_local + (tick[0] - state.latest[0])
+            bucket = frame.bucket_of(tick_local)
+            if bucket == frame.bucket:
+                last = bars[-1]
+                bars[-1] = (last['timestamp'], last['Open'], max(last['High'], tick[2]), min(last['Low'], tick[3]),
+                            tick[4], last['Volume'] + tick[5])
+                return bars
+            tick_bar = (tick[0] - (tick_local - bucket),) + tuple(tick[1:])
+            return np.append(bars, np.array([tick_bar], dtype=BAR_DTYPE))
+
+    def frame(self, symbol: str, interval: str, period: Optional[str] = None) -> pd.DataFrame:
+        """Bars as an OHLCV DataFrame in the symbol's time zone, optionally the last `period` only"""
+        bars = self.bars(symbol, interval)
+        if period is not None and len(bars):
+            cutoff = bars['timestamp'][-1] - pd.Timedelta(days=period_days(period)).value
+            bars = bars[np.searchsorted(bars['timestamp'], cutoff, side='left'):]
+        return to_frame(bars, self.symbols[symbol].tz)
+
+    def drop(self, symbol: Optional[str] = None):
+        with self._lock:
+            if symbol is None:
+                self.symbols.clear()
+            else:
+                self.symbols.pop(symbol, None)
+
+    def memory(self) -> int:
+        """Bytes held by ring buffers (fixed per tracked timeframe)"""
+        return sum(frame.closed.nbytes for state in self.symbols.values() for frame in state.frames.values())
+
+    def _timeframe(self, interval: str) -> Timeframe:
+        return Timeframe(interval, self.capacity, self.origin_ns)
+
+    @staticmethod
+    def _apply(state: SymbolBars, bar: Bar, local: int):
+        if bar[0] > state.latest[0]:
+            for frame in state.frames.values():
+                frame.commit(state.latest, state.latest[0] - (state.latest_local - frame.bucket))
+        # Same timestamp: a newer copy of the forming base bar replaces it
+        for frame in state.frames.values():
+            frame.advance(bar, local)
+        state.latest = bar
+        state.latest_local = local
+
+
+class AggregatedBarCache:
+    """
+    BarCache drop-in that serves every aggregated interval from one base feed
+    per symbol. Intervals it can't build (e.g. 1wk), and symbols the base
+    feed has no bars for, go to a plain BarCache.
+    """
+
+    def __init__(self, fetcher: Fetcher, aggregator: Optional[BarAggregator] = None,
+                 base_period: str = DEFAULT_BASE_PERIOD, ttl: Optional[float] = None,
+                 fallback: Optional[BarCache] = None):
+        self.fetcher = fetcher
+        self.aggregator = aggregator or BarAggregator()
+        self.base_interval = self.aggregator.base_interval
+        self.base_period = base_period
+        self.ttl = DEFAULT_TTL.get(self.base_interval, 30) if ttl is None else ttl
+        self.fallback = fallback or BarCache(fetcher=fetcher)
+        self._polled: Dict[str, float] = {}  # symbol -> monotonic time of the last base fetch
+        self._periods: Dict[Tuple[str, str], str] = {}  # history period each timeframe was backfilled with
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'base_fetches': 0, 'history_fetches': 0, 'fallbacks': 0, 'fetch_errors': 0}
+
+    def get_bars(self, symbol: str, period: str = "5d", interval: str = "1d") -> pd.DataFrame:
+        """Bars covering at least `period`; after the first call only the base feed is polled"""
+        if interval not in self.aggregator.intervals:
+            return self._fall_back(symbol, period, interval)
+        with self._symbol_lock(symbol):
+            if not self._poll(symbol):
+                return self._fall_back(symbol, period, interval)
+            key = (symbol, interval)
+            seeded = self._periods.get(key, self.base_period if interval == self.base_interval else None)
+            if seeded is None or period_days(period) > period_days(seeded):
+                self._backfill(symbol, interval, period)
+            else:
+                self._record('hits')
+            return self.aggregator.frame(symbol, interval, period)
+
+    def ingest_quotes(self, prices: Dict[str, float], timestamp: Optional[int] = None):
+        """Feed a batch of quotes to the forming bars of the symbols being aggregated"""
+        for symbol, price in prices.items():
+            self.aggregator.ingest_tick(symbol, price, timestamp=timestamp)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        with self._lock:
+            if symbol is None:
+                self._polled.clear()
+                self._periods.clear()
+            else:
+                self._polled.pop(symbol, None)
+                for key in [k for k in self._periods if k[0] == symbol]:
+                    del self._periods[key]
+        self.aggregator.drop(symbol)
+        self.fallback.invalidate(symbol)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['symbols'] = len(self.aggregator.symbols)
+        stats['stale_bars'] = self.aggregator.stale_bars
+        stats['ring_bytes'] = self.aggregator.memory()
+        stats['fallback'] = self.fallback.stats()
+        return stats
+
+    def _poll(self, symbol: str) -> bool:
+        """Bring the symbol's base feed up to date; False when there is no feed for it"""
+        now = time.monotonic()
+        if not self.aggregator.has(symbol):
+            data = self._fetch(symbol, self.base_interval, period=self.base_period)
+            if data is None or data.empty:
+                return False
+            self.aggregator.ingest(symbol, data)
+            self._polled[symbol] = now
+            self._record('base_fetches')
+            return self.aggregator.has(symbol)
+
+        if now - self._polled.get(symbol, 0.0) >= self.ttl:
+            newer = self._fetch(symbol, self.base_interval, start=self.aggregator.latest_timestamp(symbol))
+            if newer is not None and not newer.empty:
+                self.aggregator.ingest(symbol, newer)
+            self._polled[symbol] = now
+            self._record('base_fetches')
+        return True
+
+    def _backfill(self, symbol: str, interval: str, period: str):
+        # The base interval's own history only extends the feed backwards
+        history = self._fetch(symbol, interval, period=period)
+        self.aggregator.track(symbol, interval, history)
+        with self._lock:
+            self._stats['history_fetches'] += 1
+            self._periods[(symbol, interval)] = period
+
+    def _fetch(self, symbol: str, interval: str, **kwargs) -> Optional[pd.DataFrame]:
+        started = time.perf_counter()
+        try:
+            data = self.fetcher(symbol, interval, **kwargs)
+        except Exception as e:
+            # Keep serving what we have; the next call will retry
+            logger.warning(f"Fetch failed for {symbol} {interval}: {e}")
+            self._record('fetch_errors')
+            return None
+        instruments.record("data_fetch.bars", time.perf_counter() - started)
+        return data
+
+    def _fall_back(self, symbol: str, period: str, interval: str) -> pd.DataFrame:
+        self._record('fallbacks')
+        return self.fallback.get_bars(symbol, period=period, interval=interval)
+
+    def _symbol_lock(self, symbol: str) -> threading.Lock:
+        with self._lock:
+            if symbol not in self._locks:
+                self._locks[symbol] = threading.Lock()
+            return self._locks[symbol]
+
+    def _record(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
@@ -0,0 +1,343 @@
+"""
+Bar Store Module
+Local columnar OHLCV store and a replay feed for running the app offline.
+
+Bars live under <root>/<SYMBOL>/<interval>/<YYYY-MM-DD>.npy, one partition per
+UTC day, as structured NumPy arrays that are memory-mapped when read. With
+pyarrow installed, partitions can be written as Parquet instead. CSV dumps
+(e.g. from DataFrame.to_csv() of yfinance history) are imported with
+load_csv(), or from the command line:
+
+    python bar_store.py AAPL.csv MSFT.csv --interval 1m
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from market_data import period_days
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet partitions are optional
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = "bar_store"
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+BAR_DTYPE = np.dtype([('timestamp', '<i8')] + [(column, '<f8') for column in BAR_COLUMNS])
+META_FILE = "_meta.json"
+NS_PER_DAY = 86400 * 10 ** 9
+
+TimeLike = Union[str, pd.Timestamp, None]
+
+
+class BarStore:
+    """On-disk OHLCV bars partitioned by symbol, interval and date"""
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, file_format: str = "npy"):
+        if file_format not in ("npy", "parquet"):
+            raise ValueError(f"Unknown bar store format: {file_format}")
+        if file_format == "parquet" and pa is None:
+            raise ValueError("The parquet format requires pyarrow")
+        self.root = root
+        self.file_format = file_format
+
+    def write(self, symbol: str, interval: str, data: pd.DataFrame) -> int:
+        """Merge bars into the store; rows with an existing timestamp are replaced"""
+        if data.empty:
+            return 0
+
+        index = pd.DatetimeIndex(data.index)
+        directory = self._directory(symbol, interval)
+        os.makedirs(directory, exist_ok=True)
+        if index.tz is not None:
+            self._write_meta(directory, {'tz': str(index.tz)})
+            index = index.tz_convert('UTC').tz_localize(None)
+
+        bars = np.empty(len(data), dtype=BAR_DTYPE)
+        bars['timestamp'] = index.as_unit('ns').asi8
+        for column in BAR_COLUMNS:
+            bars[column] = data[column].to_numpy(dtype=float) if column in data else 0.0
+
+        bars = _dedupe(bars)
+        days = bars['timestamp'] // NS_PER_DAY
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        for partition in np.split(bars, bounds):
+            path = self._partition_path(directory, _day(int(partition['timestamp'][0])))
+            if os.path.exists(path):
+                partition = _dedupe(np.concatenate([self._load(path), partition]))
+            self._save(path, partition)
+        return len(data)
+
+    def read(self, symbol: str, interval: str, start: TimeLike = None, end: TimeLike = None) -> pd.DataFrame:
+        """Bars in [start, end], loading only the partitions that overlap"""
+        return self._frame(self.read_array(symbol, interval, start, end), self.timezone(symbol, interval))
+
+    def read_array(self, symbol: str, interval: str, start: TimeLike = None, end: TimeLike = None) -> np.ndarray:
+        """Like read(), but returns the raw structured array (UTC nanosecond timestamps)"""
+        start_ns, end_ns = _to_ns(start), _to_ns(end)
+        first_day = _day(start_ns)
+        last_day = _day(end_ns)
+
+        directory = self._directory(symbol, interval)
+        arrays = [self._load(os.path.join(directory, name))
+                  for day, name in self._partitions(directory)
+                  if (first_day is None or day >= first_day) and (last_day is None or day <= last_day)]
+        if not arrays:
+            return np.empty(0, dtype=BAR_DTYPE)
+
+        bars = np.concatenate(arrays)
+        lo = 0 if start_ns is None else np.searchsorted(bars['timestamp'], start_ns, side='left')
+        hi = len(bars) if end_ns is None else np.searchsorted(bars['timestamp'], end_ns, side='right')
+        return bars[lo:hi]
+
+    def fetcher(self, symbol: str, interval: str, period: Optional[str] = None,
+                start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """BarCache fetcher serving stored bars; periods count back from the newest stored bar"""
+        if start is None and period is not None:
+            bars = self.read_array(symbol, interval)
+            if len(bars):
+                cutoff = bars['timestamp'][-1] - pd.Timedelta(days=period_days(period)).value
+                bars = bars[bars['timestamp'] >= cutoff]
+            return self._frame(bars, self.timezone(symbol, interval))
+        return self.read(symbol, interval, start=start)
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+
+    def intervals(self, symbol: str) -> List[str]:
+        directory = os.path.join(self.root, symbol)
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def timezone(self, symbol: str, interval: str) -> Optional[str]:
+        path = os.path.join(self._directory(symbol, interval), META_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f).get('tz')
+
+    def _directory(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol, interval)
+
+    def _partition_path(self, directory: str, day: str) -> str:
+        return os.path.join(directory, f"{day}.{self.file_format}")
+
+    def _partitions(self, directory: str) -> List[Tuple[str, str]]:
+        """(day, file name) pairs in date order"""
+        if not os.path.isdir(directory):
+            return []
+        partitions = []
+        for name in os.listdir(directory):
+            day, ext = os.path.splitext(name)
+            if ext in ('.npy', '.parquet'):
+                partitions.append((day, name))
+        return sorted(partitions)
+
+    def _load(self, path: str) -> np.ndarray:
+        if path.endswith('.parquet'):
+            table = pq.read_table(path, memory_map=True)
+            bars = np.empty(table.num_rows, dtype=BAR_DTYPE)
+            for name in BAR_DTYPE.names:
+                bars[name] = table.column(name).to_numpy()
+            return bars
+        return np.load(path, mmap_mode='r')
+
+    def _save(self, path: str, bars: np.ndarray):
+        # Write then rename, so a crash never leaves a half-written partition
+        temp_path = path + ".tmp"
+        if self.file_format == "parquet":
+            pq.write_table(pa.table({name: bars[name] for name in BAR_DTYPE.names}), temp_path)
+        else:
+            with open(temp_path, 'wb') as f:
+                np.save(f, bars)
+        os.replace(temp_path, path)
+
+    def _write_meta(self, directory: str, meta: Dict):
+        with open(os.path.join(directory, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+    @staticmethod
+    def _frame(bars: np.ndarray, tz: Optional[str]) -> pd.DataFrame:
+        index = pd.DatetimeIndex(bars['timestamp'].astype('datetime64[ns]'))
+        if tz:
+            index = index.tz_localize('UTC').tz_convert(tz)
+        return pd.DataFrame({column: bars[column] for column in BAR_COLUMNS}, index=index)
+
+
+def load_csv(store: BarStore, path: str, symbol: Optional[str] = None, interval: str = "1d",
+             tz: Optional[str] = None) -> int:
+    """
+    Import a CSV dump with a timestamp column (Datetime/Date/first column) and
+    OHLCV columns; the symbol defaults to the file name. Naive timestamps are
+    taken to be in `tz` when given.
+    """
+    symbol = symbol or os.path.splitext(os.path.basename(path))[0].upper()
+    data = pd.read_csv(path)
+    columns = {name.lower().replace(' ', '').replace('_', ''): name for name in data.columns}
+
+    time_column = next((columns[key] for key in ('datetime', 'date', 'timestamp', 'time') if key in columns),
+                       data.columns[0])
+    stamps = pd.to_datetime(data[time_column], utc=True) if _has_offsets(data[time_column]) \
+        else pd.to_datetime(data[time_column])
+    index = pd.DatetimeIndex(stamps)
+    if index.tz is None and tz:
+        index = index.tz_localize(tz)
+    elif index.tz is not None and tz:
+        index = index.tz_convert(tz)
+
+    bars = pd.DataFrame(index=index)
+    for column in BAR_COLUMNS:
+        source = columns.get(column.lower())
+        bars[column] = data[source].to_numpy(dtype=float) if source else 0.0
+    bars = bars.dropna(subset=['Close'])
+
+    rows = store.write(symbol, interval, bars)
+    logger.info(f"Imported {rows} {interval} bars for {symbol} from {path}")
+    return rows
+
+
+class ReplayFeed:
+    """
+    Replays stored bars as if they were live. The replay clock starts at
+    `start` and runs `speed` times faster than real time; with speed=0 it only
+    moves when step() is called, which makes runs fully deterministic.
+
+    Plug fetcher() into a BarCache and use get_price() for quotes; both only
+    see bars at or before the replay clock.
+    """
+
+    def __init__(self, store: BarStore, symbols: Iterable[str], interval: str = "1m",
+                 start: TimeLike = None, end: TimeLike = None, speed: float = 60.0):
+        self.store = store
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.speed = speed
+        self.end_ns = _to_ns(end)
+        self._series: Dict[Tuple[str, str], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+        stamps = [self._bars(symbol, interval)['timestamp'] for symbol in self.symbols]
+        self.timeline = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+        if self.end_ns is not None:
+            self.timeline = self.timeline[self.timeline <= self.end_ns]
+
+        start_ns = _to_ns(start)
+        self.position = 0 if start_ns is None else int(np.searchsorted(self.timeline, start_ns))
+        self._started_at = time.monotonic()
+        self._start_ns = int(self.timeline[self.position]) if self.position < len(self.timeline) else 0
+
+    def now_ns(self) -> int:
+        """Current replay time as UTC nanoseconds"""
+        if not len(self.timeline):
+            return 0
+        if self.speed:
+            elapsed = (time.monotonic() - self._started_at) * self.speed
+            return min(self._start_ns + int(elapsed * 1e9), int(self.timeline[-1]))
+        return int(self.timeline[min(self.position, len(self.timeline) - 1)])
+
+    def now(self) -> pd.Timestamp:
+        return pd.Timestamp(self.now_ns(), tz='UTC')
+
+    def step(self, bars: int = 1) -> pd.Timestamp:
+        """Advance a manually clocked (speed=0) replay by whole bars"""
+        self.position = min(self.position + bars, len(self.timeline) - 1)
+        return self.now()
+
+    @property
+    def finished(self) -> bool:
+        return not len(self.timeline) or self.now_ns() >= self.timeline[-1]
+
+    def fetcher(self, symbol: str, interval: str, period: Optional[str] = None,
+                start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """BarCache fetcher returning history up to the replay clock"""
+        bars = self._bars(symbol, interval)
+        now = self.now_ns()
+        hi = np.searchsorted(bars['timestamp'], now, side='right')
+        if start is not None:
+            lo = np.searchsorted(bars['timestamp'], _to_ns(start), side='left')
+        elif period is not None:
+            lo = np.searchsorted(bars['timestamp'], now - pd.Timedelta(days=period_days(period)).value,
+                                 side='left')
+        else:
+            lo = 0
+        return BarStore._frame(bars[lo:hi], self.store.timezone(symbol, interval))
+
+    def get_price(self, symbol: str) -> Optional[float]:
+        """Close of the latest bar at or before the replay clock"""
+        bars = self._bars(symbol, self.interval)
+        i = np.searchsorted(bars['timestamp'], self.now_ns(), side='right')
+        return float(bars['Close'][i - 1]) if i else None
+
+    def get_prices(self, symbols: Iterable[str]) -> Dict[str, float]:
+        prices = {}
+        for symbol in symbols:
+            price = self.get_price(symbol)
+            if price is not None:
+                prices[symbol] = price
+        return prices
+
+    def _bars(self, symbol: str, interval: str) -> np.ndarray:
+        key = (symbol, interval)
+        with self._lock:
+            if key not in self._series:
+                self._series[key] = self.store.read_array(symbol, interval, end=self.end_ns)
+            return self._series[key]
+
+
+def _dedupe(bars: np.ndarray) -> np.ndarray:
+    """Sort by timestamp, keeping the last copy of repeated timestamps"""
+    bars = bars[np.argsort(bars['timestamp'], kind='stable')]
+    keep = np.append(bars['timestamp'][1:] != bars['timestamp'][:-1], True)
+    return bars[keep]
+
+
+def _to_ns(value) -> Optional[int]:
+    """UTC nanoseconds for a timestamp-like value (naive values are taken as UTC)"""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    stamp = pd.Timestamp(value)
+    if stamp.tz is not None:
+        stamp = stamp.tz_convert('UTC').tz_localize(None)
+    return stamp.value
+
+
+def _day(ns: Optional[int]) -> Optional[str]:
+    return None if ns is None else pd.Timestamp(ns).strftime('%Y-%m-%d')
+
+
+def _has_offsets(column: pd.Series) -> bool:
+    sample = str(column.iloc[0]) if len(column) else ""
+    return sample.endswith('Z') or (len(sample) > 19 and sample[-6] in '+-')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import CSV bar dumps into the local bar store")
+    parser.add_argument('files', nargs='+', help="CSV files, one symbol per file (named after the symbol)")
+    parser.add_argument('--interval', default="1d")
+    parser.add_argument('--root', default=DEFAULT_STORE_DIR)
+    parser.add_argument('--tz', default=None, help="Timezone of naive timestamps, e.g. America/New_York")
+    parser.add_argument('--format', default="npy", choices=["npy", "parquet"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = BarStore(args.root, args.format)
+    for path in args.files:
+        load_csv(store, path, interval=args.interval, tz=args.tz)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Timings of the app's hot paths on synthetic or recorded OHLCV data, no network.
+
+Covers indicator computation (ta and streaming) at several bar counts,
+single-symbol vs batch strategy evaluation, risk calculations, JSON
+persistence and backtest throughput. Every run is saved as JSON under
+benchmark_results/, and a run can be compared against an earlier one to
+catch regressions:
+
+    python benchmark.py                              # 1k and 100k bars
+    python benchmark.py --sizes 1k,100k,10m --save baseline
+    python benchmark.py --baseline benchmark_results/baseline.json
+    python benchmark.py --only indicators --store bar_store --symbol AAPL
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from market_data import BarCache
+from data_providers import FakeProvider
+from streaming_indicators import IndicatorEngine
+from strategy_scanner import StrategyScanner
+from trading_strategies import RiskManager, TechnicalIndicators, TradingStrategies
+from risk_engine import PortfolioRiskEngine, ReturnsCache
+from trade_journal import FILL, JournalState, TradeJournal
+from backtester import BacktestConfig, Backtester
+from bar_store import BarStore
+
+DEFAULT_RESULTS_DIR = "benchmark_results"
+DEFAULT_SIZES = "1k,100k"
+SIZE_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    if text and text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def size_label(n: int) -> str:
+    for suffix, factor in sorted(SIZE_SUFFIXES.items(), key=lambda item: -item[1]):
+        if n >= factor and n % factor == 0:
+            return f"{n // factor}{suffix}"
+    return str(n)
+
+
+def synthetic_bars(n: int, seed: int = 0, freq: str = "1min", start: str = "2020-01-02 14:30",
+                   price: float = 100.0) -> pd.DataFrame:
+    """Deterministic random-walk OHLCV bars with consistent high/low"""
+    rng = np.random.default_rng(seed)
+    close = price * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_ = np.concatenate(([price], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0005, n)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.lognormal(10, 0.5, n).round()
+    index = pd.date_range(start, periods=n, freq=freq, tz="UTC")
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+
+class Fixtures:
+    """OHLCV fixtures, synthetic by default or recorded bars from the local bar store"""
+
+    def __init__(self, store: Optional[str] = None, symbol: Optional[str] = None, interval: str = "1m"):
+        self.recorded = None
+        if store:
+            self.recorded = BarStore(store).read(symbol, interval)
+            if self.recorded.empty:
+                raise ValueError(f"No {interval} bars for {symbol} in {store}")
+        self._cache: Dict[tuple, pd.DataFrame] = {}
+
+    def bars(self, n: int, seed: int = 0) -> Optional[pd.DataFrame]:
+        """n bars, or None when the recording is shorter than that"""
+        key = (n, seed)
+        if key not in self._cache:
+            if self.recorded is not None:
+                if len(self.recorded) < n:
+                    return None
+                self._cache[key] = self.recorded.iloc[-n:]
+            else:
+                self._cache[key] = synthetic_bars(n, seed)
+        return self._cache[key]
+
+    def panel(self, symbols: int, n: int) -> Dict[str, pd.DataFrame]:
+        """Field -> time x symbol frames, the panel layout StrategyScanner expects"""
+        frames = {f"SYM{i}": synthetic_bars(n, seed=i, freq="1h") for i in range(symbols)}
+        return {field: pd.DataFrame({symbol: data[field] for symbol, data in frames.items()})
+                for field in ('Open', 'High', 'Low', 'Close', 'Volume')}
+
+
+@dataclass
+class Benchmark:
+    """One timed operation; `items` units (bars, signals, events...) per call give the throughput"""
+    name: str
+    func: Callable[[], Any]
+    items: int = 1
+    unit: str = "calls"
+
+
+def run_benchmark(bench: Benchmark, repeat: int = 5, min_time: float = 0.5, max_time: float = 10.0) -> Dict:
+    """Time bench.func repeatedly; stops after `repeat` runs once `min_time` has passed, or at `max_time`"""
+    times = []
+    started = time.perf_counter()
+    while True:
+        t0 = time.perf_counter()
+        bench.func()
+        times.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        if elapsed >= max_time or (len(times) >= repeat and elapsed >= min_time):
+            break
+    median = statistics.median(times)
+    return {
+        'runs': len(times),
+        'min': min(times),
+        'median': median,
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'items': bench.items,
+        'unit': bench.unit,
+        'throughput': bench.items / median if median > 0 else float('inf'),
+    }
+
+
+@dataclass
+class Trade:
+    """Minimal executed trade for RiskManager.calculate_portfolio_risk"""
+    symbol: str
+    side: str
+    quantity: int
+    price: float
+    status: str = 'EXECUTED'
+
+
+def build_suite(fixtures: Fixtures, sizes: List[int], workdir: str, only: Optional[str] = None) -> List[Benchmark]:
+    """The benchmarks whose name contains `only` (all by default); fixtures are built only for those"""
+    suite: List[Benchmark] = []
+
+    def wanted(*names: str) -> bool:
+        return only is None or any(only in name for name in names)
+
+    # Indicators: the ta-based batch path and the O(1)-per-bar streaming engine
+    for n in sizes:
+        label = size_label(n)
+        ta_name, streaming_name, backtest_name = (f"indicators.ta.{label}", f"indicators.streaming.{label}",
+                                                  f"backtest.swing.{label}")
+        # Pure-Python per-bar paths; 10M bars would take minutes, so they stop at 1M
+        per_bar = n <= 1_000_000
+        if not wanted(ta_name, *((streaming_name, backtest_name) if per_bar else ())):
+            continue
+        data = fixtures.bars(n)
+        if data is None:
+            print(f"  skipping {label} bars: recording is shorter")
+            continue
+
+        def ta_indicators(data=data):
+            TechnicalIndicators.calculate_rsi(data)
+            TechnicalIndicators.calculate_macd(data)
+            TechnicalIndicators.calculate_bollinger_bands(data)
+            TechnicalIndicators.calculate_moving_averages(data, [20, 50, 200])
+            TechnicalIndicators.calculate_stochastic(data)
+            TechnicalIndicators.calculate_atr(data)
+        if wanted(ta_name):
+            suite.append(Benchmark(ta_name, ta_indicators, n, "bars"))
+
+        if per_bar and wanted(streaming_name):
+            suite.append(Benchmark(streaming_name,
+                                   lambda data=data: IndicatorEngine().update_from_dataframe(data), n, "bars"))
+        if per_bar and wanted(backtest_name):
+            backtester = Backtester(BacktestConfig(interval="1m"))
+            suite.append(Benchmark(backtest_name,
+                                   lambda data=data, bt=backtester: bt.run(data, "SWING", symbol="BENCH"),
+                                   n, "bars"))
+
+    # Strategy evaluation: one symbol at a time through the bar cache vs one vectorized scan
+    symbols, history = 50, 720
+    single_name, batch_name, snapshot_name = (f"strategy.single.{symbols}x3", f"strategy.batch.{symbols}x3",
+                                              "strategy.snapshot.x1000")
+    ticks_name, var_name = f"risk.engine_ticks.{symbols}x100", f"risk.var.{symbols}_positions"
+    if wanted(single_name, batch_name, snapshot_name, ticks_name, var_name):
+        panel = fixtures.panel(symbols, history)
+        bars = {symbol: pd.DataFrame({field: panel[field][symbol] for field in panel}) for symbol in panel['Close']}
+
+    if wanted(single_name, snapshot_name):
+        strategies = TradingStrategies(bar_cache=BarCache(fetcher=FakeProvider(bars=bars).get_bars))
+        for symbol in bars:
+            strategies.bar_cache.get_bars(symbol, period="30d", interval="1h")  # warm the cache
+
+    if wanted(single_name):
+        def single_symbol():
+            for symbol in bars:
+                strategies.swing_trading_strategy(symbol)
+                strategies.mean_reversion_strategy(symbol, timeframe="1h")
+                strategies.breakout_strategy(symbol)
+        suite.append(Benchmark(single_name, single_symbol, symbols * 3, "signals"))
+    if wanted(batch_name):
+        scanner = StrategyScanner()
+        suite.append(Benchmark(batch_name, lambda: scanner.scan_all(panel), symbols * 3, "signals"))
+
+    if wanted(snapshot_name):
+        engine = IndicatorEngine()
+        engine.update_from_dataframe(bars["SYM0"])
+        snapshot = engine.snapshot()
+        suite.append(Benchmark(snapshot_name,
+                               lambda: [strategies.evaluate_snapshot("SWING", "SYM0", snapshot) for _ in range(1000)],
+                               1000, "signals"))
+
+    # Risk
+    if wanted("risk.position_size.x10000"):
+        suite.append(Benchmark("risk.position_size.x10000",
+                               lambda: [RiskManager.calculate_position_size(10000, 2.0, 100.0, 95.0)
+                                        for _ in range(10000)],
+                               10000, "calls"))
+    rng = np.random.default_rng(1)
+    trade_prices = rng.uniform(90, 110, 1000)  # drawn either way, so the ticks below don't depend on --only
+    if wanted("risk.portfolio_replay.1k_trades"):
+        trades = [Trade(f"SYM{i % symbols}", "BUY" if i % 3 else "SELL", 10, float(price))
+                  for i, price in enumerate(trade_prices)]
+        prices = {f"SYM{i}": 100.0 for i in range(symbols)}
+        suite.append(Benchmark("risk.portfolio_replay.1k_trades",
+                               lambda: RiskManager.calculate_portfolio_risk(trades, prices), 1000, "trades"))
+
+    if wanted(ticks_name, var_name):
+        risk = PortfolioRiskEngine(returns=ReturnsCache(BarCache(fetcher=FakeProvider(bars=bars).get_bars)))
+        for symbol in bars:
+            risk.on_fill(symbol, "BUY", 10, 100.0)
+        risk.returns.refresh(list(bars))
+    if wanted(ticks_name):
+        ticks = [{symbol: float(p) for symbol, p in zip(bars, rng.uniform(95, 105, symbols))} for _ in range(100)]
+
+        def risk_ticks():
+            for tick in ticks:
+                risk.on_prices(tick)
+        suite.append(Benchmark(ticks_name, risk_ticks, symbols * 100, "quotes"))
+    if wanted(var_name):
+        suite.append(Benchmark(var_name, risk.value_at_risk, 1, "calls"))
+
+    # Persistence
+    if wanted("persistence.config_json.x100"):
+        config_path = os.path.join(workdir, "trading_config.json")
+        config = {'max_position_size': 1000, 'daily_loss_limit': 500, 'stop_loss_percent': 5.0,
+                  'take_profit_percent': 5.0, 'auto_trading': False,
+                  'symbol_strategies': {f"SYM{i}": "SWING" for i in range(symbols)}}
+
+        def config_round_trip():
+            for _ in range(100):
+                with open(config_path, 'w') as f:
+                    json.dump(config, f, indent=2)
+                with open(config_path, 'r') as f:
+                    json.load(f)
+        suite.append(Benchmark("persistence.config_json.x100", config_round_trip, 100, "round trips"))
+
+    events = 10000
+    append_name = f"persistence.journal_append.{size_label(events)}"
+    rebuild_name = f"persistence.journal_rebuild.{size_label(events)}"
+    fill = {'symbol': 'SYM0', 'side': 'BUY', 'quantity': 1, 'price': 100.0, 'timestamp': datetime(2024, 1, 2),
+            'strategy': 'SWING', 'status': 'EXECUTED', 'pnl': 0.0}
+    if wanted(append_name):
+        journal_runs = iter(range(10**9))
+
+        def journal_append():
+            journal = TradeJournal(os.path.join(workdir, f"journal_{next(journal_runs)}.jsonl"),
+                                   fsync="never", snapshot_every=10**9)
+            journal.open()
+            for _ in range(events):
+                journal.append(FILL, **fill)
+            journal.close()
+        suite.append(Benchmark(append_name, journal_append, events, "events"))
+
+    if wanted(rebuild_name):
+        rebuild_path = os.path.join(workdir, "rebuild.jsonl")
+        journal = TradeJournal(rebuild_path, fsync="never", snapshot_every=10**9)
+        journal.open()
+        for _ in range(events):
+            journal.append(FILL, **fill)
+        journal.close()
+
+        def journal_rebuild():
+            # The full replay TradeJournal.open() falls back to without a snapshot
+            state = JournalState()
+            for event in journal.events():
+                state.apply(event, journal.keep_trades)
+        suite.append(Benchmark(rebuild_name, journal_rebuild, events, "events"))
+    return suite
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Print median ratios against a baseline; returns the names that regressed beyond threshold"""
+    regressions = []
+    print(f"\n{'benchmark':45} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['median'], result['median']
+        ratio = after / before if before > 0 else float('inf')
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:45} {format_time(before):>12} {format_time(after):>12} {ratio:8.2f}{flag}")
+    return regressions
+
+
+def format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.2f} s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the trading app's hot paths without network access")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Bar counts for the indicator and backtest "
+                        "benchmarks, e.g. 1k,100k,10m (default: %(default)s)")
+    parser.add_argument("--only", help="Run only benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark (default: %(default)s)")
+    parser.add_argument("--max-time", type=float, default=10.0,
+                        help="Stop repeating a benchmark after this many seconds (default: %(default)s)")
+    parser.add_argument("--store", help="Use recorded bars from this bar store instead of synthetic data")
+    parser.add_argument("--symbol", help="Symbol to read from --store")
+    parser.add_argument("--interval", default="1m", help="Interval to read from --store (default: %(default)s)")
+    parser.add_argument("--results-dir", default=DEFAULT_RESULTS_DIR, help="Where results are written")
+    parser.add_argument("--save", metavar="NAME", help="Also save the results as <results-dir>/NAME.json")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Slowdown that counts as a regression (default: %(default)s = 10%%)")
+    args = parser.parse_args()
+
+    if args.store and not args.symbol:
+        parser.error("--store needs --symbol")
+
+    fixtures = Fixtures(args.store, args.symbol, args.interval)
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    results: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as workdir:
+        print("Building fixtures...")
+        suite = build_suite(fixtures, sizes, workdir, only=args.only)
+        for bench in suite:
+            result = run_benchmark(bench, repeat=args.repeat, max_time=args.max_time)
+            results[bench.name] = result
+            print(f"{bench.name:45} {format_time(result['median']):>12}  "
+                  f"{result['throughput']:>14,.0f} {bench.unit}/s  ({result['runs']} runs)")
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'fixtures': f"{args.store}:{args.symbol}:{args.interval}" if args.store else "synthetic",
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'results': results,
+    }
+    os.makedirs(args.results_dir, exist_ok=True)
+    paths = [os.path.join(args.results_dir, f"{datetime.now():%Y%m%d-%H%M%S}.json")]
+    if args.save:
+        paths.append(os.path.join(args.results_dir, f"{args.save}.json"))
+    for path in paths:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"\nResults written to {', '.join(paths)}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Data Providers Module
+Pluggable sources of quotes and bars, and a coalescing quote cache in front of them.
+
+A provider answers get_quotes(symbols) with one batched request, and its
+get_bars() doubles as a BarCache fetcher. QuoteCache serves repeated quote
+lookups from a short TTL cache, and concurrent callers that miss the cache
+share a single in-flight request per symbol.
+"""
+
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import yfinance as yf
+
+from bar_store import ReplayFeed
+from market_data import yfinance_fetcher
+
+logger = logging.getLogger(__name__)
+
+# Seconds a quote is served from cache before it is requested again
+DEFAULT_QUOTE_TTL = 2.0
+
+
+class MarketDataProvider(ABC):
+    """Source of latest prices and historical bars"""
+
+    @abstractmethod
+    def get_quotes(self, symbols: Iterable[str]) -> Dict[str, float]:
+        """Latest price per symbol; symbols without a price are left out"""
+
+    def get_quote(self, symbol: str) -> Optional[float]:
+        return self.get_quotes([symbol]).get(symbol)
+
+    @abstractmethod
+    def get_bars(self, symbol: str, interval: str, period: Optional[str] = None,
+                 start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """OHLCV history, with the BarCache fetcher signature"""
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from yfinance; quotes for all symbols come from one download call"""
+
+    def get_quotes(self, symbols: Iterable[str]) -> Dict[str, float]:
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        data = yf.download(symbols, period="1d", interval="1m", group_by='column',
+                           auto_adjust=True, progress=False)
+        if data.empty:
+            return {}
+
+        closes = data['Close']
+        if isinstance(closes, pd.Series):
+            closes = closes.to_frame(symbols[0])
+        latest = closes.ffill().iloc[-1]
+        return {symbol: float(price) for symbol, price in latest.items() if pd.notna(price)}
+
+    def get_bars(self, symbol: str, interval: str, period: Optional[str] = None,
+                 start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        return yfinance_fetcher(symbol, interval, period=period, start=start)
+
+
+class ReplayProvider(MarketDataProvider):
+    """Quotes and bars from a ReplayFeed over the local bar store"""
+
+    def __init__(self, feed: ReplayFeed):
+        self.feed = feed
+
+    def get_quotes(self, symbols: Iterable[str]) -> Dict[str, float]:
+        return self.feed.get_prices(symbols)
+
+    def get_bars(self, symbol: str, interval: str, period: Optional[str] = None,
+                 start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        return self.feed.fetcher(symbol, interval, period=period, start=start)
+
+
+class FakeProvider(MarketDataProvider):
+    """In-memory prices and bars for tests; records every request it receives"""
+
+    def __init__(self, prices: Optional[Dict[str, float]] = None,
+                 bars: Optional[Dict[str, pd.DataFrame]] = None, latency: float = 0.0):
+        self.prices = dict(prices or {})
+        self.bars = dict(bars or {})
+        self.latency = latency
+        self.requests: List[List[str]] = []
+        self._lock = threading.Lock()
+
+    def set_price(self, symbol: str, price: float):
+        self.prices[symbol] = price
+
+    def get_quotes(self, symbols: Iterable[str]) -> Dict[str, float]:
+        symbols = list(symbols)
+        with self._lock:
+            self.requests.append(symbols)
+        if self.latency:
+            time.sleep(self.latency)
+        return {symbol: self.prices[symbol] for symbol in symbols if symbol in self.prices}
+
+    def get_bars(self, symbol: str, interval: str, period: Optional[str] = None,
+                 start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        data = self.bars.get(symbol, pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume']))
+        return data[data.index >= start] if start is not None else data
+
+
+class QuoteCache(MarketDataProvider):
+    """Short-TTL quote cache with request coalescing in front of another provider"""
+
+    def __init__(self, provider: MarketDataProvider, ttl: float = DEFAULT_QUOTE_TTL):
+        self.provider = provider
+        self.ttl = ttl
+        self._quotes: Dict[str, tuple] = {}  # symbol -> (price, fetched_at)
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'requests': 0, 'errors': 0}
+
+    def get_quotes(self, symbols: Iterable[str]) -> Dict[str, float]:
+        quotes, waiting, owned = {}, {}, {}
+        with self._lock:
+            now = time.monotonic()
+            for symbol in dict.fromkeys(symbols):
+                cached = self._quotes.get(symbol)
+                if cached is not None and now - cached[1] < self.ttl:
+                    self._stats['hits'] += 1
+                    if cached[0] is not None:
+                        quotes[symbol] = cached[0]
+                elif symbol in self._inflight:
+                    # Someone else is already fetching this symbol; wait for their result
+                    self._stats['coalesced'] += 1
+                    waiting[symbol] = self._inflight[symbol]
+                else:
+                    self._stats['misses'] += 1
+                    owned[symbol] = self._inflight[symbol] = Future()
+
+        if owned:
+            self._fetch(owned)
+
+        for symbol, future in {**owned, **waiting}.items():
+            price = future.result()
+            if price is not None:
+                quotes[symbol] = price
+        return quotes
+
+    def get_bars(self, symbol: str, interval: str, period: Optional[str] = None,
+                 start: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        return self.provider.get_bars(symbol, interval, period=period, start=start)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        with self._lock:
+            if symbol is None:
+                self._quotes.clear()
+            else:
+                self._quotes.pop(symbol, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def _fetch(self, futures: Dict[str, Future]):
+        """One upstream request for every symbol this caller owns"""
+        try:
+            prices = self.provider.get_quotes(list(futures))
+        except Exception as e:
+            logger.warning(f"Quote request failed for {', '.join(futures)}: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+                for symbol in futures:
+                    self._inflight.pop(symbol, None)
+            for future in futures.values():
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats['requests'] += 1
+            now = time.monotonic()
+            for symbol in futures:
+                self._quotes[symbol] = (prices.get(symbol), now)
+                self._inflight.pop(symbol, None)
+        for symbol, future in futures.items():
+            future.set_result(prices.get(symbol))
@@ -0,0 +1,221 @@
+"""
+Instrumentation Module
+Hot-path timers and latency histograms, exportable as JSON or Prometheus text.
+
+Timers are context managers (`with instruments.timer("name"):`) or
+decorators (`@timed("name")`, sync or async). Durations go into
+log-linear histograms in the style of HdrHistogram: 64 linear
+sub-buckets per power of two, so recording is one index computation and
+an increment, and percentiles stay within about 1.6% of the true value at
+any scale. While instrumentation is disabled a timer is a shared no-op
+object and a decorated function costs one attribute check.
+"""
+
+import json
+import time
+import asyncio
+import threading
+import functools
+from typing import Callable, Dict, List, Optional
+
+SUB_BUCKET_BITS = 7  # values below 2**7 us are exact; above, 2**6 buckets per power of two
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF_SUB_BUCKETS = SUB_BUCKETS // 2
+MAX_TRACKABLE_US = 3600 * 10**6  # one hour; longer durations are clamped
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def _bucket(value: int) -> int:
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKETS + (shift - 1) * HALF_SUB_BUCKETS + (value >> shift) - HALF_SUB_BUCKETS
+
+
+def _bucket_upper(index: int) -> int:
+    """Highest value that falls in a bucket"""
+    if index < SUB_BUCKETS:
+        return index
+    shift, offset = divmod(index - SUB_BUCKETS, HALF_SUB_BUCKETS)
+    shift += 1
+    return ((offset + HALF_SUB_BUCKETS + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Durations in microseconds, bucketed log-linearly"""
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (_bucket(MAX_TRACKABLE_US) + 1)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        value = min(max(int(seconds * 1e6), 0), MAX_TRACKABLE_US)
+        index = _bucket(value)
+        with self._lock:
+            self.counts[index] += 1
+            if not self.count or value < self.min_us:
+                self.min_us = value
+            if value > self.max_us:
+                self.max_us = value
+            self.count += 1
+            self.total_us += value
+
+    def percentile(self, percent: float) -> float:
+        """Duration in seconds below which `percent` of the recorded values fall"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(self.count * percent / 100 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max_us) / 1e6
+        return self.max_us / 1e6
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.count = self.total_us = self.min_us = self.max_us = 0
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES) -> Dict:
+        """Count, sum, mean, min, max and percentiles, all in seconds"""
+        return {
+            'count': self.count,
+            'sum': self.total_us / 1e6,
+            'mean': self.total_us / self.count / 1e6 if self.count else 0.0,
+            'min': self.min_us / 1e6,
+            'max': self.max_us / 1e6,
+            'percentiles': {f"p{p:g}": self.percentile(p) for p in percentiles},
+        }
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: LatencyHistogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Instruments:
+    """Named latency histograms that can be switched on and off at runtime"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def timer(self, name: str):
+        """Context manager timing its block into the named histogram"""
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self.histogram(name))
+
+    def record(self, name: str, seconds: float):
+        if self.enabled:
+            self.histogram(name).record(seconds)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorator timing every call of a function or coroutine function"""
+        def decorator(func):
+            key = name or func.__qualname__
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    started = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.histogram(key).record(time.perf_counter() - started)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.histogram(key).record(time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        for histogram in list(self.histograms.values()):
+            histogram.reset()
+
+    def summary(self) -> Dict[str, Dict]:
+        return {name: self.histograms[name].summary() for name in sorted(self.histograms)}
+
+    def to_json(self) -> str:
+        return json.dumps({'enabled': self.enabled, 'timers': self.summary()}, indent=2)
+
+    def to_prometheus(self, metric: str = "trading_latency_seconds") -> str:
+        """Prometheus text exposition format, one summary family labelled by timer name"""
+        lines = [f"# HELP {metric} Hot-path latency of the trading app",
+                 f"# TYPE {metric} summary"]
+        for name, summary in self.summary().items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for key, value in summary['percentiles'].items():
+                lines.append(f'{metric}{{name="{label}",quantile="{float(key[1:]) / 100:g}"}} {value:.6f}')
+            lines.append(f'{metric}_sum{{name="{label}"}} {summary["sum"]:.6f}')
+            lines.append(f'{metric}_count{{name="{label}"}} {summary["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """Write JSON, or Prometheus text when the file ends in .prom or .txt"""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+    def report(self) -> str:
+        """Fixed-width table of the timers, for the diagnostics panel"""
+        rows = [f"{'timer':28} {'count':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+        for name, summary in self.summary().items():
+            p = summary['percentiles']
+            rows.append(f"{name:28} {summary['count']:>7} " + " ".join(
+                f"{_ms(value):>9}" for value in (p['p50'], p['p90'], p['p99'], summary['max'])))
+        return "\n".join(rows)
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f}ms" if seconds < 10 else f"{seconds:.1f}s"
+
+
+# Shared by every module; off until the app enables it (INSTRUMENTATION env var or Settings)
+instruments = Instruments()
+timed = instruments.timed
@@ -0,0 +1,80 @@
+"""
+Lazy Imports Module
+Deferred imports of the app's heavy dependencies, with per-module timings.
+
+lazy_import() returns a stand-in that imports the real module on first
+attribute access, so a dependency such as pyautogui costs nothing until the
+feature that needs it runs. import_modules() imports a list of modules up
+front, typically on a background thread while the window is already up.
+Every first import made through either is timed for import_report().
+"""
+
+import sys
+import time
+import logging
+import importlib
+import threading
+from types import ModuleType
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Module -> seconds its first import took, including dependencies it loaded first
+IMPORT_TIMES: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def timed_import(name: str) -> ModuleType:
+    """Import a module, recording the time if this is its first import"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    with _lock:
+        IMPORT_TIMES.setdefault(name, time.perf_counter() - started)
+    return module
+
+
+def import_modules(names: Iterable[str]) -> Dict[str, float]:
+    """Import modules in order (blocking); returns the time each one took"""
+    timings = {}
+    for name in names:
+        started = time.perf_counter()
+        timed_import(name)
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = timed_import(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def import_report(limit: Optional[int] = None) -> str:
+    """Slowest first imports, one line each, with the total"""
+    with _lock:
+        timings = sorted(IMPORT_TIMES.items(), key=lambda item: -item[1])
+    lines = [f"{name:36} {seconds * 1000:8.0f} ms" for name, seconds in timings[:limit]]
+    lines.append(f"{'total':36} {sum(seconds for _, seconds in timings) * 1000:8.0f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,280 @@
+"""
+Live Chart Module
+One persistent matplotlib figure for the Charts tab, redrawn incrementally.
+
+Bars are appended to per-symbol numpy buffers, and indicator overlays are
+filled bar by bar from a streaming IndicatorEngine, so an update only
+touches the new bars. The price and overlay lines are animated artists:
+while the axes limits hold, an update restores the cached background,
+redraws the lines and blits the axes. Only when new data leaves the
+limits is the whole figure redrawn. When the visible range has more bars
+than the axes are pixels wide, the price line is min/max decimated to
+two points per pixel column, so spikes stay visible and drawing cost
+depends on the chart's width rather than the bar count.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from streaming_indicators import IndicatorEngine
+
+logger = logging.getLogger(__name__)
+
+# History loaded for each chart timeframe
+CHART_PERIODS = {
+    '1m': '1d',
+    '5m': '5d',
+    '15m': '5d',
+    '1h': '1mo',
+    '1d': '1y',
+}
+
+# IndicatorEngine snapshot keys drawn over the price, with their line styles
+DEFAULT_OVERLAYS = {
+    'sma_20': {'color': '#FFA500', 'linewidth': 1.0, 'label': 'SMA 20'},
+    'sma_50': {'color': '#1E90FF', 'linewidth': 1.0, 'label': 'SMA 50'},
+    'bb_upper': {'color': '#888888', 'linewidth': 0.8, 'linestyle': '--', 'label': 'BB upper'},
+    'bb_lower': {'color': '#888888', 'linewidth': 0.8, 'linestyle': '--', 'label': 'BB lower'},
+}
+
+NS_PER_DAY = 86400 * 10**9
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Reduce to the min and max of each of `buckets` equal slices (no-op for short series)"""
+    n = len(y)
+    if buckets <= 0 or n <= 2 * buckets:
+        return x, y
+    starts = np.linspace(0, n, buckets, endpoint=False).astype(np.int64)
+    xs = np.repeat(x[starts], 2)
+    ys = np.empty(2 * buckets)
+    ys[0::2] = np.fmin.reduceat(y, starts)
+    ys[1::2] = np.fmax.reduceat(y, starts)
+    return xs, ys
+
+
+def stride_decimate(x: np.ndarray, y: np.ndarray, buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """First point of each bucket; enough for smooth series such as moving averages"""
+    n = len(y)
+    if buckets <= 0 or n <= 2 * buckets:
+        return x, y
+    starts = np.linspace(0, n, 2 * buckets, endpoint=False).astype(np.int64)
+    return x[starts], y[starts]
+
+
+@dataclass
+class ChartSeries:
+    """Growable close and overlay buffers of one symbol and timeframe"""
+    overlays: Sequence[str]
+    size: int = 0
+    x: np.ndarray = field(default_factory=lambda: np.empty(0))  # matplotlib date numbers
+    close: np.ndarray = field(default_factory=lambda: np.empty(0))
+    values: Dict[str, np.ndarray] = field(default_factory=dict)
+    last_ns: int = -1
+    tz: object = None
+    forming: Optional[Tuple[float, float, float, float, float]] = None  # newest bar, not yet fed to the engine
+    engine: IndicatorEngine = field(default_factory=IndicatorEngine)
+
+    def append(self, x: np.ndarray, close: np.ndarray):
+        needed = self.size + len(x)
+        if needed > len(self.x):
+            capacity = max(needed, 2 * len(self.x), 256)
+            self.x = self._grow(self.x, capacity)
+            self.close = self._grow(self.close, capacity)
+            for key in self.overlays:
+                self.values[key] = self._grow(self.values.get(key, np.empty(0)), capacity)
+        self.x[self.size:needed] = x
+        self.close[self.size:needed] = close
+        for key in self.overlays:
+            self.values[key][self.size:needed] = np.nan
+        self.size = needed
+
+    def trim(self, max_bars: int):
+        """Keep only the newest max_bars bars"""
+        drop = self.size - max_bars
+        if drop <= 0:
+            return
+        self.x[:max_bars] = self.x[drop:self.size]
+        self.close[:max_bars] = self.close[drop:self.size]
+        for key in self.overlays:
+            self.values[key][:max_bars] = self.values[key][drop:self.size]
+        self.size = max_bars
+
+    def _grow(self, array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.full(capacity, np.nan)
+        grown[:self.size] = array[:self.size]
+        return grown
+
+
+class LiveChart:
+    """Persistent price chart with indicator overlays, updated by appending bars"""
+
+    def __init__(self, master, overlays: Optional[Dict[str, Dict]] = None, max_bars: int = 50000,
+                 figsize: Tuple[float, float] = (10, 6)):
+        self.overlay_styles = DEFAULT_OVERLAYS if overlays is None else overlays
+        self.max_bars = max_bars
+        self.series: Dict[Tuple[str, str], ChartSeries] = {}
+        self.current: Optional[Tuple[str, str]] = None
+        self.stats = {'blits': 0, 'full_draws': 0}
+
+        self.figure = Figure(figsize=figsize)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_xlabel("Time")
+        self.ax.set_ylabel("Price ($)")
+        self.ax.grid(True)
+        self.price_line, = self.ax.plot([], [], color='#2E8B57', linewidth=1.2, label='Close', animated=True)
+        self.overlay_lines = {key: self.ax.plot([], [], animated=True, **style)[0]
+                              for key, style in self.overlay_styles.items()}
+        self.ax.legend(loc='upper left', fontsize='small')
+        self._tz = None
+        self._set_date_axis(None)
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self._background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def show(self, symbol: str, interval: str):
+        """Display a symbol and timeframe; its buffers are kept if it was shown before"""
+        key = (symbol, interval)
+        if key == self.current:
+            return
+        self.current = key
+        self.ax.set_title(f"{symbol} Price Chart ({interval})")
+        self.render(full=True)
+
+    def update(self, symbol: str, interval: str, data: pd.DataFrame):
+        """Merge the latest OHLCV bars; only bars newer than the buffer are processed"""
+        if data is None or data.empty:
+            return
+        key = (symbol, interval)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = ChartSeries(overlays=list(self.overlay_styles), tz=data.index.tz)
+
+        stamps = data.index.as_unit('ns').asi8
+        start = int(np.searchsorted(stamps, series.last_ns))
+        if start < len(stamps) and stamps[start] == series.last_ns:
+            # The newest buffered bar was still forming; take its latest values
+            series.close[series.size - 1] = float(data['Close'].iloc[start])
+            series.forming = self._bar(data, start)
+            start += 1
+        if start < len(stamps):
+            self._append(series, data.iloc[start:], stamps[start:])
+
+        if key == self.current:
+            self.render()
+
+    def tick(self, symbol: str, price: float):
+        """Move the forming bar's close to a fresh quote between bar updates"""
+        if self.current is None or self.current[0] != symbol or price <= 0:
+            return
+        series = self.series.get(self.current)
+        if series is None or series.size == 0:
+            return
+        series.close[series.size - 1] = price
+        self.render()
+
+    def render(self, full: bool = False):
+        """Blit the lines if the current limits still fit the data, else redraw the figure"""
+        series = self.series.get(self.current) if self.current else None
+        if series is None or series.size == 0:
+            for line in self._lines():
+                line.set_data([], [])
+            self._full_draw()
+            return
+
+        x, close = series.x[:series.size], series.close[:series.size]
+        xlim = self.ax.get_xlim()
+        if full or x[0] < xlim[0] or x[-1] > xlim[1]:
+            # Follow the data, with room for upcoming bars so the limits hold for a while
+            span = max(x[-1] - x[0], 1e-3)
+            xlim = (x[0], x[-1] + span * 0.05)
+            full = True
+
+        first, last = np.searchsorted(x, xlim[0]), np.searchsorted(x, xlim[1], side='right')
+        width = max(int(self.ax.bbox.width), 1)
+        xs, ys = minmax_decimate(x[first:last], close[first:last], width)
+        self.price_line.set_data(xs, ys)
+        low, high = np.nanmin(ys), np.nanmax(ys)
+        for key, line in self.overlay_lines.items():
+            ox, oy = stride_decimate(x[first:last], series.values[key][first:last], width)
+            line.set_data(ox, oy)
+
+        ylim = self.ax.get_ylim()
+        if full or low < ylim[0] or high > ylim[1]:
+            pad = max((high - low) * 0.05, abs(high) * 0.001, 1e-6)
+            if series.tz != self._tz:
+                self._set_date_axis(series.tz)
+            self.ax.set_xlim(*xlim)
+            self.ax.set_ylim(low - pad, high + pad)
+            self._full_draw()
+        else:
+            self._blit()
+
+    def _append(self, series: ChartSeries, bars: pd.DataFrame, stamps: np.ndarray):
+        engine = series.engine
+        start = series.size
+        series.append(stamps / NS_PER_DAY, bars['Close'].to_numpy(dtype=np.float64))
+
+        # Every bar but the newest is complete; feed completed bars to the engine
+        if series.forming is not None and start > 0:
+            self._record(series, start - 1, engine.update(*series.forming))
+        rows = list(zip(bars['Open'].to_numpy(dtype=np.float64), bars['High'].to_numpy(dtype=np.float64),
+                        bars['Low'].to_numpy(dtype=np.float64), bars['Close'].to_numpy(dtype=np.float64),
+                        bars['Volume'].to_numpy(dtype=np.float64)))
+        for offset, row in enumerate(rows[:-1]):
+            self._record(series, start + offset, engine.update(*row))
+        series.forming = rows[-1]
+        series.last_ns = int(stamps[-1])
+
+        if series.size > self.max_bars:
+            series.trim(self.max_bars // 2 or 1)
+
+    def _record(self, series: ChartSeries, index: int, snapshot: Dict[str, float]):
+        for key in series.overlays:
+            series.values[key][index] = snapshot.get(key, np.nan)
+
+    def _bar(self, data: pd.DataFrame, row: int) -> Tuple[float, float, float, float, float]:
+        bar = data.iloc[row]
+        return (float(bar['Open']), float(bar['High']), float(bar['Low']), float(bar['Close']),
+                float(bar['Volume']))
+
+    def _set_date_axis(self, tz):
+        # Ticks in the exchange's timezone rather than UTC
+        self._tz = tz
+        locator = mdates.AutoDateLocator(tz=tz)
+        self.ax.xaxis.set_major_locator(locator)
+        self.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator, tz=tz))
+
+    def _lines(self):
+        return [self.price_line, *self.overlay_lines.values()]
+
+    def _full_draw(self):
+        self.stats['full_draws'] += 1
+        self.canvas.draw()
+
+    def _blit(self):
+        if self._background is None:
+            self._full_draw()
+            return
+        self.stats['blits'] += 1
+        self.canvas.restore_region(self._background)
+        self._draw_lines()
+        self.canvas.blit(self.ax.bbox)
+
+    def _draw_lines(self):
+        for line in self._lines():
+            self.ax.draw_artist(line)
+
+    def _on_draw(self, event):
+        # Also runs after a window resize, so the cached background always matches the canvas
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_lines()
@@ -6,30 +6,60 @@ Combines screen automation with real-time trading analysis and automated strateg
 
 import customtkinter as ctk
 from tkinter import messagebox, simpledialog, ttk
-import pyautogui
 import json
 import time
 import keyboard
-import mouse
-import threading
 import os
 import sys
 from typing import Dict, List, Optional, Tuple, Union
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from enum import Enum, auto
 import tkinter as tk
 from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
-import yfinance as yf
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import ta
 from dotenv import load_dotenv
 
+# The automation engine, image matching and input drivers are shared with the
+# screen automation app and imported from its directory
+AUTOMATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Pyautogui Suped Up")
+sys.path.append(os.path.normpath(AUTOMATION_DIR))
+
+from lazy_imports import IMPORT_TIMES, import_modules, import_report, lazy_import
+from trading_service import TradingService, UIQueue
+from trade_journal import DAILY_BUY, FILL, ORDER, POSITION, TradeJournal
+from order_manager import OrderManager
+from table_models import PagedTable, TreeTable
+from instrumentation import instruments, timed
+from automation_engine import compile_commands, describe_command
+from input_drivers import RecordingDriver, get_driver
+
+# Heavy modules load on first use, or in the background after the window is up
+pyautogui = lazy_import("pyautogui")
+market_data = lazy_import("market_data")
+bar_store = lazy_import("bar_store")
+bar_aggregator = lazy_import("bar_aggregator")
+data_providers = lazy_import("data_providers")
+trading_strategies = lazy_import("trading_strategies")
+auto_trader = lazy_import("auto_trader")
+risk_engine = lazy_import("risk_engine")
+live_chart = lazy_import("live_chart")
+strategy_dsl = lazy_import("strategy_dsl")
+image_anchor = lazy_import("image_anchor")
+
+# Imported in this order on the service thread at startup; third-party
+# packages first so the import-time breakdown shows their own cost
+TRADING_MODULES = ["numpy", "pandas", "yfinance", "ta", "market_data", "bar_store", "bar_aggregator",
+                   "data_providers", "trading_strategies", "strategy_dsl", "auto_trader", "risk_engine"]
+CHART_MODULES = ["matplotlib", "matplotlib.backends.backend_tkagg", "live_chart"]
+
 # Load environment variables
 load_dotenv()
 
+# Hot-path timers; can also be switched on from the Settings tab
+instruments.enabled = os.getenv('INSTRUMENTATION', 'false').lower() in ('1', 'true', 'yes')
+
+# Show the window first and load the trading engine behind it; false loads everything before the window opens
+FAST_STARTUP = os.getenv('FAST_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+
 # Set appearance mode and default color theme
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
@@ -38,13 +68,21 @@ ctk.set_default_color_theme("blue")
 COMMANDS_FILE = "commands.json"
 WINDOW_STATE_FILE = "window_state.json"
 TRADING_CONFIG_FILE = "trading_config.json"
-TRADE_LOG_FILE = "trade_log.json"
+TRADE_LOG_FILE = "trade_journal.jsonl"
+DIAGNOSTICS_FILE = "diagnostics"  # .json and .prom are appended on export
+ANCHOR_DIR = "anchors"  # reference images captured for image clicks
 
 class CommandType(Enum):
     CLICK = auto()
     TYPE = auto()
     HOTKEY = auto()
     DELAY = auto()
+    WAIT_UNTIL = auto()
+    LOOP = auto()
+    IF = auto()
+    ELSE = auto()
+    END = auto()
+    CALL = auto()
 
 class TradingStrategy(Enum):
     SCALPING = auto()
@@ -63,6 +101,35 @@ class Command:
     text: Optional[str] = None
     keys: Optional[str] = None
     seconds: Optional[float] = None
+    image: Optional[str] = None  # reference image a CLICK is located by at run time
+    confidence: Optional[float] = None  # match threshold for image, default IMAGE_MATCH_THRESHOLD
+    condition: Optional[str] = None  # WAIT_UNTIL/IF: 'pixel', 'image', 'region_changed' or 'region_stable'
+    region: Optional[Tuple[int, int, int, int]] = None  # left, top, width, height a condition looks at
+    color: Optional[str] = None  # '#rrggbb' of a pixel condition
+    tolerance: int = 0  # per-channel colour tolerance of a pixel condition
+    negate: bool = False  # wait for / branch on the condition not holding
+    count: Optional[int] = None  # LOOP repetitions
+    script: Optional[str] = None  # CALL: commands file to run
+
+def command_to_data(command: Command) -> Dict:
+    """JSON-ready dict of a command, with its type by name"""
+    data = asdict(command)
+    data['type'] = command.type.name
+    return data
+
+def command_from_data(data: Dict) -> Command:
+    """Command from a saved dict; fields missing from older files take their defaults"""
+    fields = {key: value for key, value in data.items() if key in Command.__dataclass_fields__}
+    fields['type'] = CommandType[data['type']]
+    if fields.get('region') is not None:
+        fields['region'] = tuple(fields['region'])
+    return Command(**fields)
+
+def read_commands_file(name: str) -> List[Command]:
+    """Commands saved by Save Commands; a CALL names the file with or without .json"""
+    path = name if name.endswith('.json') else f"{name}.json"
+    with open(path, 'r') as f:
+        return [command_from_data(data) for data in json.load(f)]
 
 @dataclass
 class Trade:
@@ -75,6 +142,11 @@ class Trade:
     status: str = 'PENDING'  # PENDING, EXECUTED, CANCELLED, CLOSED
     pnl: float = 0.0
 
+def trade_from_journal(event: Dict) -> Trade:
+    """Trade from a journaled FILL event (or a recent trade kept in the journal's state)"""
+    fields = {key: value for key, value in event.items() if key in Trade.__dataclass_fields__}
+    return Trade(**{**fields, 'timestamp': datetime.fromisoformat(fields['timestamp'])})
+
 class StockDayTradingApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -90,25 +162,35 @@ class StockDayTradingApp(ctk.CTk):
         self.markers = []
         self.marker_counter = 1
         self.running = False
+        self.image_matcher = None  # created with the first image click, keeps where images were last seen
+        self.input_driver = None  # driver of the latest automation run (AUTOMATION_DRIVER)
         self.trading_active = False
         self.current_strategy = None
         self.trades = []
+        self.journal = None  # opened once the window is up; the trade history pages its fills
         self.watchlist = ['AAPL', 'GOOGL', 'MSFT', 'TSLA', 'AMZN']
         self.current_symbol = 'AAPL'
         
-        # Daily buy tracking
+        # Trading state; the data, strategy, risk and order objects are created by
+        # start_trading_backend once their modules have loaded
+        self.backend_ready = False
+        self.live_chart = None
         self.daily_buys = {}  # Track daily purchases by date
         self.open_positions = {}  # Track open positions with buy prices
+        self.archived_pnl = 0.0  # Realized P&L of journaled trades no longer kept in memory
+        self.started_at = time.perf_counter()
         
         # Trading configuration
         self.trading_config = {
             'max_position_size': 1000,
+            'max_total_exposure': 5000,
             'daily_loss_limit': 500,
             'stop_loss_percent': 5.0,
             'take_profit_percent': 5.0,
             'auto_trading': False,
             'daily_buy_enabled': True,
-            'shares_per_day': 1
+            'shares_per_day': 1,
+            'symbol_strategies': {}
         }
         
         # Create main container
@@ -138,15 +220,130 @@ class StockDayTradingApp(ctk.CTk):
         # Load saved data
         self.load_commands()
         self.load_trading_config()
+        self.update_trade_history()
+        self.status_bar.configure(text="Loading trading engine...")
         
         # Bind window close event
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+        # Background work reports back through this queue; only the Tk thread
+        # touches widgets and trading state
+        self.ui_queue = UIQueue(self)
+        self.ui_queue.start()
+        
         # Bind emergency stop
         keyboard.add_hotkey('ctrl+shift+x', self.emergency_stop)
         
-        # Start market data thread
-        self.start_market_data_thread()
+        # Start market data service; its jobs are scheduled once the trading engine is up
+        self.service = TradingService()
+        self.service.start()
+        if FAST_STARTUP:
+            self.load_in_background(TRADING_MODULES, self.start_trading_backend)
+        else:
+            import_modules(TRADING_MODULES + CHART_MODULES)
+            self.start_trading_backend()
+        
+    def load_in_background(self, modules, callback):
+        """Import modules on the service's executor, then run callback(error) on the Tk thread"""
+        future = self.service.submit(import_modules, modules)
+        future.add_done_callback(lambda done: self.ui_queue.post(callback, done.exception()))
+        
+    def start_trading_backend(self, error=None):
+        """Create the market data, strategy, risk and order objects (Tk thread)"""
+        if error is not None:
+            print(f"Failed to load the trading engine: {error}")
+            self.status_bar.configure(text=f"Trading engine failed to load: {error}")
+            return
+            
+        # Market data comes from yfinance, or with MARKET_DATA_SOURCE=replay from
+        # the local bar store, replayed at REPLAY_SPEED for offline runs
+        self.replay_feed = None
+        if os.getenv('MARKET_DATA_SOURCE', 'yfinance').lower() == 'replay':
+            self.replay_feed = bar_store.ReplayFeed(
+                bar_store.BarStore(os.getenv('BAR_STORE_DIR', bar_store.DEFAULT_STORE_DIR)),
+                self.watchlist,
+                interval=os.getenv('REPLAY_INTERVAL', '1m'),
+                start=os.getenv('REPLAY_START') or None,
+                speed=float(os.getenv('REPLAY_SPEED', '60'))
+            )
+            self.data_provider = data_providers.ReplayProvider(self.replay_feed)
+            # Replayed bars are local, so the cache can ask for new ones on every call
+            self.bar_cache = market_data.BarCache(fetcher=self.data_provider.get_bars,
+                                                  ttl={interval: 0 for interval in market_data.DEFAULT_TTL})
+        else:
+            self.data_provider = data_providers.YFinanceProvider()
+            # Shared bar cache so charts and strategies reuse downloaded history
+            self.bar_cache = market_data.BarCache(fetcher=self.data_provider.get_bars)
+        
+        # With BAR_AGGREGATION, every timeframe is built from one 1m feed per symbol
+        # and only backfilled from its own history the first time it is asked for
+        self.aggregated_bars = os.getenv('BAR_AGGREGATION', 'true').lower() in ('1', 'true', 'yes')
+        if self.aggregated_bars:
+            self.bar_cache = bar_aggregator.AggregatedBarCache(
+                fetcher=self.data_provider.get_bars,
+                aggregator=bar_aggregator.BarAggregator(capacity=int(os.getenv('BAR_BUFFER_SIZE', '2048'))),
+                ttl=0 if self.replay_feed is not None else None,
+                fallback=self.bar_cache
+            )
+        
+        # Batched, briefly cached quotes shared by every price lookup
+        self.quotes = data_providers.QuoteCache(self.data_provider)
+        
+        # Auto trading runs across the whole watchlist, one strategy per symbol,
+        # built in or declared in the rules directory (JSON/YAML)
+        rules = strategy_dsl.load_rule_book(os.getenv('STRATEGY_RULES_DIR', strategy_dsl.DEFAULT_RULES_DIR))
+        self.strategies = trading_strategies.TradingStrategies(bar_cache=self.bar_cache, rules=rules)
+        self.auto_trader = auto_trader.AutoTrader(self.strategies, self.watchlist)
+        
+        # Exposure, drawdown, daily loss and VaR, updated on every fill and quote
+        self.risk = risk_engine.PortfolioRiskEngine(returns=risk_engine.ReturnsCache(self.bar_cache))
+        
+        # Orders, fills and position changes go to an append-only journal, and
+        # trades and positions are rebuilt from it on startup
+        self.journal = TradeJournal(os.getenv('TRADE_JOURNAL_FILE', TRADE_LOG_FILE),
+                                    fsync=os.getenv('JOURNAL_FSYNC', 'interval'))
+        state = self.journal.open()
+        
+        # Orders rest on a local simulated exchange and fill against the quote feed
+        self.order_manager = OrderManager(on_fill=self.on_order_fill, on_update=self.on_order_update,
+                                          first_id=state.last_order_id + 1)
+        self.restore_journal_state(state)
+        
+        self.risk.on_limit = self.on_daily_loss_limit
+        self.strategy_combo.configure(values=self.auto_trader.strategy_names())
+        self.backend_ready = True
+        self.apply_trading_config()
+        self.update_trade_history()
+        
+        self.service.schedule("market_data", 5, self.refresh_market_data)
+        self.service.schedule("risk_returns", 900, self.refresh_risk_returns)
+        self.status_bar.configure(text=f"Ready (trading engine loaded in {time.perf_counter() - self.started_at:.1f}s)")
+        
+        # The charting stack is only needed by the Charts tab; load it next
+        if FAST_STARTUP:
+            self.load_in_background(CHART_MODULES, self.start_live_chart)
+        else:
+            self.start_live_chart()
+            
+    def start_live_chart(self, error=None):
+        """Replace the Charts tab placeholder with the live chart (Tk thread)"""
+        if error is not None:
+            print(f"Failed to load charting: {error}")
+            self.chart_placeholder.configure(text=f"Charts unavailable: {error}")
+            return
+        self.chart_placeholder.destroy()
+        self.live_chart = live_chart.LiveChart(self.chart_frame)
+        self.live_chart.show(self.current_symbol, self.timeframe_var.get())
+        self.service.schedule("chart", float(os.getenv('CHART_UPDATE_INTERVAL', '1')), self.refresh_chart)
+        self.update_diagnostics()
+        if os.getenv('STARTUP_PROFILE', 'false').lower() in ('1', 'true', 'yes'):
+            print(f"Import times:\n{import_report()}")
+        
+    def trading_ready(self):
+        """Whether trading actions can run yet; says so in the status bar if not"""
+        if not self.backend_ready:
+            self.status_bar.configure(text="Trading engine is still loading...")
+        return self.backend_ready
         
     def load_window_state(self):
         try:
@@ -182,6 +379,9 @@ class StockDayTradingApp(ctk.CTk):
             print(f"Error saving window state: {e}")
             
     def on_closing(self):
+        self.service.stop()
+        if self.backend_ready:
+            self.journal.close()
         self.save_window_state()
         self.save_commands()
         self.save_trading_config()
@@ -221,6 +421,16 @@ class StockDayTradingApp(ctk.CTk):
         )
         self.add_click_btn.pack(fill="x", padx=5, pady=5)
         
+        # Add Image Click button
+        self.add_image_click_btn = ctk.CTkButton(
+            parent,
+            text="🖼️ Add Image Click",
+            command=self.add_image_click,
+            fg_color="#4B8BBE",
+            hover_color="#306998"
+        )
+        self.add_image_click_btn.pack(fill="x", padx=5, pady=5)
+        
         # Add Type Text button
         self.add_type_btn = ctk.CTkButton(
             parent,
@@ -251,6 +461,16 @@ class StockDayTradingApp(ctk.CTk):
         )
         self.add_delay_btn.pack(fill="x", padx=5, pady=5)
         
+        # Add Wait / Loop / If / Call button
+        self.add_control_btn = ctk.CTkButton(
+            parent,
+            text="🧩 Add Wait / Loop / If / Call",
+            command=self.add_control_command,
+            fg_color="#4682B4",
+            hover_color="#3672A4"
+        )
+        self.add_control_btn.pack(fill="x", padx=5, pady=5)
+        
         # Separator
         separator = ctk.CTkFrame(parent, height=2, fg_color="gray")
         separator.pack(fill="x", padx=5, pady=10)
@@ -313,13 +533,14 @@ class StockDayTradingApp(ctk.CTk):
         ctk.CTkLabel(strategy_frame, text="Trading Strategy", font=("Arial", 14, "bold")).pack(pady=5)
         
         self.strategy_var = ctk.StringVar(value="DAILY_BUY")
-        strategy_combo = ctk.CTkComboBox(
+        # Filled with every strategy once the trading engine has loaded
+        self.strategy_combo = ctk.CTkComboBox(
             strategy_frame,
-            values=["DAILY_BUY", "PROFIT_TAKE"],
+            values=[self.strategy_var.get()],
             variable=self.strategy_var,
             command=self.on_strategy_change
         )
-        strategy_combo.pack(fill="x", padx=10, pady=5)
+        self.strategy_combo.pack(fill="x", padx=10, pady=5)
         
         # Symbol selection
         symbol_frame = ctk.CTkFrame(left_panel)
@@ -387,6 +608,9 @@ class StockDayTradingApp(ctk.CTk):
         self.pnl_label = ctk.CTkLabel(pnl_frame, text="$0.00", font=("Arial", 24, "bold"))
         self.pnl_label.pack(pady=5)
         
+        self.risk_label = ctk.CTkLabel(pnl_frame, text="Drawdown: $0.00 | Exposure: $0.00 | VaR (95%): $0.00")
+        self.risk_label.pack(pady=2)
+        
         # Open positions
         positions_frame = ctk.CTkFrame(right_panel)
         positions_frame.pack(fill="x", padx=5, pady=5)
@@ -398,7 +622,7 @@ class StockDayTradingApp(ctk.CTk):
         self.positions_tree.heading("Symbol", text="Symbol")
         self.positions_tree.heading("Qty", text="Qty")
         self.positions_tree.heading("Buy Price", text="Buy Price")
-        self.positions_tree.heading("Target", text="Target (5%)")
+        self.positions_tree.heading("Target", text="Target")
         self.positions_tree.heading("Current", text="Current")
         self.positions_tree.heading("P&L", text="P&L")
         
@@ -411,6 +635,8 @@ class StockDayTradingApp(ctk.CTk):
         self.positions_tree.column("P&L", width=80)
         
         self.positions_tree.pack(fill="x", padx=5, pady=5)
+        # Rows keyed by symbol; each refresh only touches positions that changed
+        self.positions_table = TreeTable(self.positions_tree)
         
         # Daily buy status
         daily_status_frame = ctk.CTkFrame(right_panel)
@@ -448,6 +674,21 @@ class StockDayTradingApp(ctk.CTk):
         scrollbar = ttk.Scrollbar(history_frame, orient="vertical", command=self.trade_tree.yview)
         self.trade_tree.configure(yscrollcommand=scrollbar.set)
         
+        # History is paged (newest first) from every fill in the journal, so it reaches back across
+        # sessions while the tree never holds more than one page
+        self.trade_history = PagedTable(self.trade_tree, lambda: self.journal.fills if self.journal else (),
+                                        lambda fill: self.format_trade_row(trade_from_journal(fill)))
+        
+        history_nav = ctk.CTkFrame(history_frame)
+        history_nav.pack(side="bottom", fill="x", padx=5, pady=2)
+        
+        ctk.CTkButton(history_nav, text="◀ Newer", width=80,
+                      command=lambda: self.page_trade_history(self.trade_history.newer)).pack(side="left", padx=2)
+        ctk.CTkButton(history_nav, text="Older ▶", width=80,
+                      command=lambda: self.page_trade_history(self.trade_history.older)).pack(side="right", padx=2)
+        self.history_page_label = ctk.CTkLabel(history_nav, text="")
+        self.history_page_label.pack(side="left", expand=True)
+        
         self.trade_tree.pack(side="left", fill="both", expand=True, padx=5, pady=5)
         scrollbar.pack(side="right", fill="y", pady=5)
         
@@ -474,12 +715,13 @@ class StockDayTradingApp(ctk.CTk):
         )
         timeframe_combo.pack(side="left", padx=5)
         
-        # Chart canvas
+        # Chart canvas; one figure for the app's lifetime, fed by the chart job.
+        # Created by start_live_chart once matplotlib has loaded in the background
         self.chart_frame = ctk.CTkFrame(charts_frame)
         self.chart_frame.pack(fill="both", expand=True, padx=5, pady=5)
         
-        # Initialize chart
-        self.create_chart()
+        self.chart_placeholder = ctk.CTkLabel(self.chart_frame, text="Loading charts...")
+        self.chart_placeholder.pack(expand=True)
         
     def create_settings_tab(self):
         """Create the settings tab for configuration"""
@@ -500,6 +742,15 @@ class StockDayTradingApp(ctk.CTk):
         max_pos_entry = ctk.CTkEntry(pos_size_frame, textvariable=self.max_pos_size_var)
         max_pos_entry.pack(side="right", padx=5)
         
+        # Max total exposure across all symbols
+        exposure_frame = ctk.CTkFrame(config_frame)
+        exposure_frame.pack(fill="x", padx=10, pady=5)
+        
+        ctk.CTkLabel(exposure_frame, text="Max Total Exposure ($):").pack(side="left", padx=5)
+        self.max_exposure_var = ctk.StringVar(value=str(self.trading_config['max_total_exposure']))
+        max_exposure_entry = ctk.CTkEntry(exposure_frame, textvariable=self.max_exposure_var)
+        max_exposure_entry.pack(side="right", padx=5)
+        
         # Daily loss limit
         loss_limit_frame = ctk.CTkFrame(config_frame)
         loss_limit_frame.pack(fill="x", padx=10, pady=5)
@@ -559,6 +810,36 @@ class StockDayTradingApp(ctk.CTk):
         )
         save_settings_btn.pack(pady=10)
         
+        # Diagnostics: hot-path latency histograms
+        diagnostics_frame = ctk.CTkFrame(settings_frame)
+        diagnostics_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        
+        ctk.CTkLabel(diagnostics_frame, text="Diagnostics", font=("Arial", 16, "bold")).pack(pady=10)
+        
+        diagnostics_controls = ctk.CTkFrame(diagnostics_frame)
+        diagnostics_controls.pack(fill="x", padx=10, pady=5)
+        
+        self.instrumentation_var = ctk.BooleanVar(value=instruments.enabled)
+        ctk.CTkSwitch(
+            diagnostics_controls,
+            text="Record Timings",
+            variable=self.instrumentation_var,
+            command=self.toggle_instrumentation
+        ).pack(side="left", padx=5)
+        
+        ctk.CTkButton(diagnostics_controls, text="Refresh", width=80,
+                      command=self.update_diagnostics).pack(side="left", padx=5)
+        ctk.CTkButton(diagnostics_controls, text="Reset", width=80,
+                      command=self.reset_diagnostics).pack(side="left", padx=5)
+        ctk.CTkButton(diagnostics_controls, text="Export JSON", width=100,
+                      command=lambda: self.export_diagnostics(".json")).pack(side="left", padx=5)
+        ctk.CTkButton(diagnostics_controls, text="Export Prometheus", width=130,
+                      command=lambda: self.export_diagnostics(".prom")).pack(side="left", padx=5)
+        
+        self.diagnostics_text = ctk.CTkTextbox(diagnostics_frame, height=180, font=("Courier", 12))
+        self.diagnostics_text.pack(fill="both", expand=True, padx=10, pady=5)
+        self.update_diagnostics()
+        
         # Emergency stop info
         emergency_frame = ctk.CTkFrame(settings_frame)
         emergency_frame.pack(fill="x", padx=5, pady=10)
@@ -583,6 +864,23 @@ class StockDayTradingApp(ctk.CTk):
         
         self.status_bar.configure(text=f"Added click command at ({x}, {y})")
         
+    def add_image_click(self):
+        """Add a click command that finds the area under the mouse by image when it runs"""
+        x, y = pyautogui.position()
+        path = os.path.join(ANCHOR_DIR, f"anchor_{datetime.now():%Y%m%d_%H%M%S_%f}.png")
+        try:
+            offset_x, offset_y = image_anchor.capture_reference(path, (x, y))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to capture reference image: {e}")
+            return
+        
+        command = Command(type=CommandType.CLICK, x=x, y=y, offset_x=offset_x, offset_y=offset_y, image=path)
+        self.commands.append(command)
+        self.create_screen_marker(x, y, len(self.commands) - 1)
+        self.update_command_list()
+        
+        self.status_bar.configure(text=f"Added image click at ({x}, {y}), reference saved to {path}")
+        
     def create_screen_marker(self, x, y, index):
         """Create a visual marker on screen"""
         marker = tk.Toplevel()
@@ -668,6 +966,68 @@ class StockDayTradingApp(ctk.CTk):
             self.update_command_list()
             self.status_bar.configure(text=f"Added delay command: {seconds}s")
             
+    def add_control_command(self):
+        """Add a WAIT_UNTIL, LOOP, IF, ELSE, END or CALL command"""
+        kind = simpledialog.askstring("Add Control Command",
+                                      "Command (WAIT_UNTIL, LOOP, IF, ELSE, END, CALL):")
+        if not kind or kind.strip().upper() not in ('WAIT_UNTIL', 'LOOP', 'IF', 'ELSE', 'END', 'CALL'):
+            return
+        command = Command(type=CommandType[kind.strip().upper()])
+        
+        if command.type == CommandType.LOOP:
+            command.count = simpledialog.askinteger("Add Loop", "Repeat how many times?", minvalue=1)
+            if not command.count:
+                return
+        elif command.type == CommandType.CALL:
+            command.script = simpledialog.askstring("Add Call", "Commands file to run (saved commands JSON):")
+            if not command.script:
+                return
+        elif command.type in (CommandType.WAIT_UNTIL, CommandType.IF):
+            if not self.ask_condition(command):
+                return
+            if command.type == CommandType.WAIT_UNTIL:
+                command.seconds = simpledialog.askfloat("Add Wait", "Give up after how many seconds?",
+                                                        initialvalue=10.0, minvalue=0.1)
+                if not command.seconds:
+                    return
+        
+        self.commands.append(command)
+        self.update_command_list()
+        self.status_bar.configure(text=f"Added command: {describe_command(command)}")
+        
+    def ask_condition(self, command) -> bool:
+        """Fill in a WAIT_UNTIL/IF condition from the mouse position and prompts; False if cancelled"""
+        choices = "pixel, image" if command.type == CommandType.IF else "pixel, image, region_changed, region_stable"
+        condition = simpledialog.askstring("Condition", f"Condition ({choices}), checked at the mouse position:")
+        if not condition or condition.strip().lower() not in choices.split(", "):
+            return False
+        command.condition = condition.strip().lower()
+        x, y = pyautogui.position()
+        
+        if command.condition == 'pixel':
+            current = pyautogui.pixel(x, y)
+            command.x, command.y = x, y
+            command.color = simpledialog.askstring("Pixel Condition", f"Colour at ({x}, {y}) to wait for:",
+                                                   initialvalue="#{:02x}{:02x}{:02x}".format(*current[:3]))
+            if not command.color:
+                return False
+        elif command.condition == 'image':
+            command.image = os.path.join(ANCHOR_DIR, f"anchor_{datetime.now():%Y%m%d_%H%M%S_%f}.png")
+            try:
+                image_anchor.capture_reference(command.image, (x, y))
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to capture reference image: {e}")
+                return False
+        else:
+            region = simpledialog.askstring("Region Condition", "Region to watch (left, top, width, height):",
+                                            initialvalue=f"{max(0, x - 100)}, {max(0, y - 50)}, 200, 100")
+            try:
+                command.region = tuple(int(value) for value in region.split(','))
+            except (AttributeError, ValueError):
+                return False
+        command.negate = messagebox.askyesno("Condition", "Wait for / branch on the condition NOT holding?")
+        return True
+        
     def update_command_list(self):
         """Update the command list display"""
         # Clear existing widgets
@@ -680,7 +1040,9 @@ class StockDayTradingApp(ctk.CTk):
             command_frame.pack(fill="x", padx=5, pady=2)
             
             # Command info
-            if command.type == CommandType.CLICK:
+            if command.type == CommandType.CLICK and command.image:
+                info_text = f"Click image {os.path.basename(command.image)}"
+            elif command.type == CommandType.CLICK:
                 info_text = f"Click at ({command.x}, {command.y})"
             elif command.type == CommandType.TYPE:
                 info_text = f"Type: {command.text}"
@@ -688,6 +1050,8 @@ class StockDayTradingApp(ctk.CTk):
                 info_text = f"Hotkey: {command.keys}"
             elif command.type == CommandType.DELAY:
                 info_text = f"Delay: {command.seconds}s"
+            else:
+                info_text = describe_command(command)
                 
             ctk.CTkLabel(command_frame, text=info_text).pack(side="left", padx=5)
             
@@ -719,40 +1083,60 @@ class StockDayTradingApp(ctk.CTk):
         if self.running:
             messagebox.showwarning("Warning", "Automation already running!")
             return
+        
+        try:
+            self.input_driver = self.automation_driver()
+        except (ImportError, RuntimeError, ValueError) as e:
+            messagebox.showerror("Error", f"Can't open the input driver: {e}")
+            return
+        
+        if self.image_matcher is None and any(command.image for command in self.commands):
+            # Kept across runs so each image is looked for where it was last seen first
+            self.image_matcher = image_anchor.TemplateMatcher(
+                grab=lambda region=None: self.input_driver.screenshot(region=region),
+                threshold=float(os.getenv('IMAGE_MATCH_THRESHOLD', '0.85')))
+        
+        # Compile first, so a bad command is reported before any input is sent
+        try:
+            program = compile_commands(self.commands, driver=self.input_driver,
+                                       settle=float(os.getenv('AUTOMATION_SETTLE', '0')),
+                                       matcher=self.image_matcher, load_script=read_commands_file)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Can't run commands: {e}")
+            return
             
         self.running = True
-        self.status_bar.configure(text="Running automation...")
+        self.status_bar.configure(text=f"Running automation ({len(program)} steps)...")
         
-        # Run in separate thread
-        thread = threading.Thread(target=self.run_commands_thread)
-        thread.daemon = True
-        thread.start()
+        # Run on the service's executor, off the Tk thread
+        self.service.submit(self.run_command_sequence, program, self.input_driver)
         
-    def run_commands_thread(self):
-        """Run commands in separate thread"""
+    def automation_driver(self):
+        """Input driver named by AUTOMATION_DRIVER: pyautogui (default), xtest or dry-run"""
+        name = os.getenv('AUTOMATION_DRIVER', 'pyautogui').lower()
+        # pyautogui stays lazily imported
+        return pyautogui if name == 'pyautogui' else get_driver(name)
+        
+    def run_command_sequence(self, program, driver=None):
+        """Run a compiled command program (called off the Tk thread)"""
+        report = None
         try:
-            for i, command in enumerate(self.commands):
-                if not self.running:
-                    break
-                    
-                if command.type == CommandType.CLICK:
-                    pyautogui.click(command.x + command.offset_x, command.y + command.offset_y)
-                elif command.type == CommandType.TYPE:
-                    pyautogui.typewrite(command.text)
-                elif command.type == CommandType.HOTKEY:
-                    pyautogui.hotkey(*command.keys.split('+'))
-                elif command.type == CommandType.DELAY:
-                    time.sleep(command.seconds)
-                    
-                # Small delay between commands
-                time.sleep(0.1)
-                
+            report = program.run(should_continue=lambda: self.running, record=instruments.record)
+            if report.error:
+                print(f"Error running commands: {report.error}")
+            if os.getenv('AUTOMATION_REPORT', 'false').lower() in ('1', 'true', 'yes'):
+                print(report.table())
+            if isinstance(driver, RecordingDriver):
+                path = os.getenv('AUTOMATION_TRACE', 'automation_trace.jsonl')
+                driver.trace.save(path)
+                print(f"Dry run: {len(driver.trace.inputs())} actions in {driver.trace.total:.3f}s "
+                      f"simulated, trace saved to {path}")
         except Exception as e:
             print(f"Error running commands: {e}")
-            self.status_bar.configure(text=f"Error: {e}")
         finally:
             self.running = False
-            self.status_bar.configure(text="Automation completed")
+            self.ui_queue.post(self.status_bar.configure,
+                               text=f"Automation: {report.summary()}" if report else "Automation failed")
             
     def stop_automation(self):
         """Stop automation"""
@@ -760,9 +1144,13 @@ class StockDayTradingApp(ctk.CTk):
         self.status_bar.configure(text="Automation stopped")
         
     def emergency_stop(self):
-        """Emergency stop all automation and trading"""
+        """Emergency stop all automation and trading (safe to call from the hotkey thread)"""
         self.running = False
         self.trading_active = False
+        self.ui_queue.post(self.show_emergency_stop)
+        
+    def show_emergency_stop(self):
+        """Reflect an emergency stop in the UI"""
         self.auto_trading_var.set(False)
         self.status_bar.configure(text="🚨 EMERGENCY STOP ACTIVATED")
         messagebox.showwarning("Emergency Stop", "All automation and trading has been stopped!")
@@ -770,19 +1158,7 @@ class StockDayTradingApp(ctk.CTk):
     def save_commands(self):
         """Save commands to file"""
         try:
-            commands_data = []
-            for command in self.commands:
-                cmd_data = {
-                    'type': command.type.name,
-                    'x': command.x,
-                    'y': command.y,
-                    'offset_x': command.offset_x,
-                    'offset_y': command.offset_y,
-                    'text': command.text,
-                    'keys': command.keys,
-                    'seconds': command.seconds
-                }
-                commands_data.append(cmd_data)
+            commands_data = [command_to_data(command) for command in self.commands]
                 
             with open(COMMANDS_FILE, 'w') as f:
                 json.dump(commands_data, f, indent=2)
@@ -795,23 +1171,7 @@ class StockDayTradingApp(ctk.CTk):
         """Load commands from file"""
         try:
             if os.path.exists(COMMANDS_FILE):
-                with open(COMMANDS_FILE, 'r') as f:
-                    commands_data = json.load(f)
-                    
-                self.commands = []
-                for cmd_data in commands_data:
-                    command = Command(
-                        type=CommandType[cmd_data['type']],
-                        x=cmd_data.get('x'),
-                        y=cmd_data.get('y'),
-                        offset_x=cmd_data.get('offset_x', 0),
-                        offset_y=cmd_data.get('offset_y', 0),
-                        text=cmd_data.get('text'),
-                        keys=cmd_data.get('keys'),
-                        seconds=cmd_data.get('seconds')
-                    )
-                    self.commands.append(command)
-                    
+                self.commands = read_commands_file(COMMANDS_FILE)
                 self.update_command_list()
                 self.status_bar.configure(text="Commands loaded successfully")
         except Exception as e:
@@ -822,6 +1182,7 @@ class StockDayTradingApp(ctk.CTk):
         try:
             self.trading_config.update({
                 'max_position_size': float(self.max_pos_size_var.get()),
+                'max_total_exposure': float(self.max_exposure_var.get()),
                 'daily_loss_limit': float(self.daily_loss_var.get()),
                 'stop_loss_percent': float(self.stop_loss_var.get()),
                 'take_profit_percent': float(self.take_profit_var.get()),
@@ -829,6 +1190,9 @@ class StockDayTradingApp(ctk.CTk):
                 'daily_buy_enabled': self.daily_buy_var.get(),
                 'shares_per_day': int(self.shares_per_day_var.get())
             })
+            if self.backend_ready:
+                self.trading_config['symbol_strategies'] = self.auto_trader.assignments()
+                self.apply_trading_config()
             
             with open(TRADING_CONFIG_FILE, 'w') as f:
                 json.dump(self.trading_config, f, indent=2)
@@ -846,27 +1210,46 @@ class StockDayTradingApp(ctk.CTk):
                     
                 # Update UI
                 self.max_pos_size_var.set(str(self.trading_config.get('max_position_size', 1000)))
+                self.max_exposure_var.set(str(self.trading_config.get('max_total_exposure', 5000)))
                 self.daily_loss_var.set(str(self.trading_config.get('daily_loss_limit', 500)))
                 self.stop_loss_var.set(str(self.trading_config.get('stop_loss_percent', 2.0)))
                 self.take_profit_var.set(str(self.trading_config.get('take_profit_percent', 5.0)))
                 self.auto_trading_var.set(self.trading_config.get('auto_trading', False))
+                
+                if self.backend_ready:
+                    self.apply_trading_config()
         except Exception as e:
             print(f"Failed to load trading configuration: {e}")
             
+    def apply_trading_config(self):
+        """Hand the trading configuration to the auto trader and risk engine"""
+        self.auto_trader.set_watchlist(self.watchlist, self.trading_config.get('symbol_strategies'))
+        self.auto_trader.budget = auto_trader.RiskBudget.from_config(self.trading_config)
+        self.risk.daily_loss_limit = float(self.trading_config.get('daily_loss_limit', 500))
+        self.strategy_var.set(self.auto_trader.states[self.current_symbol].strategy)
+            
     def on_strategy_change(self, value):
-        """Handle strategy change"""
+        """Assign the selected strategy to the current symbol"""
+        if not self.trading_ready():
+            return
         self.current_strategy = value
-        self.status_bar.configure(text=f"Strategy changed to: {value}")
+        self.auto_trader.assign(self.current_symbol, value)
+        self.status_bar.configure(text=f"{self.current_symbol} strategy changed to: {value}")
         
     def on_symbol_change(self, value):
         """Handle symbol change"""
         self.current_symbol = value
+        if self.backend_ready and value in self.auto_trader.states:
+            self.current_strategy = self.auto_trader.states[value].strategy
+            self.strategy_var.set(self.current_strategy)
         self.update_chart()
         self.status_bar.configure(text=f"Symbol changed to: {value}")
         
     def toggle_auto_trading(self):
         """Toggle auto trading"""
-        if self.auto_trading_var.get():
+        if not self.trading_ready():
+            self.auto_trading_var.set(False)
+        elif self.auto_trading_var.get():
             self.start_auto_trading()
         else:
             self.stop_auto_trading()
@@ -876,156 +1259,182 @@ class StockDayTradingApp(ctk.CTk):
         self.trading_active = True
         self.status_bar.configure(text="Auto trading started")
         
-        # Start trading thread
-        thread = threading.Thread(target=self.auto_trading_thread)
-        thread.daemon = True
-        thread.start()
+        # Evaluate right away instead of waiting for the next refresh
+        self.service.trigger("market_data")
         
     def stop_auto_trading(self):
         """Stop automated trading"""
         self.trading_active = False
         self.status_bar.configure(text="Auto trading stopped")
         
-    def auto_trading_thread(self):
-        """Automated trading thread"""
-        while self.trading_active:
-            try:
-                # Get current market data
-                ticker = yf.Ticker(self.current_symbol)
-                current_price = ticker.info.get('regularMarketPrice', 0)
-                
-                if current_price > 0:
-                    # Implement trading strategy
-                    self.execute_strategy(current_price)
-                    
-                time.sleep(5)  # Check every 5 seconds
-                
-            except Exception as e:
-                print(f"Error in auto trading: {e}")
-                time.sleep(10)
+    @timed("orders.execute")
+    def execute_orders(self, orders):
+        """Submit auto-trader orders to the order manager (Tk thread)"""
+        for order in orders:
+            if order.side == "BUY":
+                self.order_manager.submit_bracket(order.symbol, "BUY", order.quantity,
+                                                  stop_loss=order.stop_loss, take_profit=order.take_profit,
+                                                  strategy=order.strategy, reason=order.reason)
+            else:
+                # A strategy exit replaces the position's resting stop and target
+                self.order_manager.cancel_symbol(order.symbol, side="SELL")
+                self.order_manager.submit(order.symbol, "SELL", order.quantity,
+                                          strategy=order.strategy, reason=order.reason)
                 
-    def execute_strategy(self, current_price):
-        """Execute trading strategy"""
-        strategy = self.current_strategy
-        current_date = datetime.now().date()
-        
-        if strategy == "DAILY_BUY":
-            # Check if we already bought today
-            if current_date not in self.daily_buys:
-                self.daily_buys[current_date] = []
+    def on_order_update(self, order):
+        """Journal every order status change"""
+        self.journal.append(ORDER, **asdict(order))
+        
+    def on_order_fill(self, order):
+        """Apply a fill to trades, positions, risk and the journal (Tk thread)"""
+        symbol, price = order.symbol, order.fill_price
+        current_date = order.filled_at.date()
+        pnl = self.risk.on_fill(symbol, order.side, order.quantity, price)
+        trade = Trade(
+            symbol=symbol,
+            side=order.side,
+            quantity=order.quantity,
+            price=price,
+            timestamp=order.filled_at,
+            strategy=order.strategy,
+            status='EXECUTED',
+            pnl=pnl
+        )
+        self.trades.append(trade)
+        self.journal.append(FILL, order_id=order.order_id, **asdict(trade))
+        
+        position = self.risk.positions.get(symbol)
+        if position is None:
+            self.open_positions.pop(symbol, None)
+            # Exits still resting for the closed position are obsolete
+            self.order_manager.cancel_symbol(symbol, side=order.side)
+            self.journal.append(POSITION, symbol=symbol, position=None)
+        else:
+            previous = self.open_positions.get(symbol, {})
+            self.open_positions[symbol] = {
+                'buy_price': position.avg_price,
+                'quantity': position.quantity,
+                'buy_date': previous.get('buy_date', current_date),
+                'stop_loss': order.stop_loss or previous.get('stop_loss'),
+                'take_profit': order.take_profit or previous.get('take_profit')
+            }
+            self.journal.append(POSITION, symbol=symbol, position=self.open_positions[symbol])
             
-            # Check if we already bought this symbol today
-            if self.current_symbol not in [buy['symbol'] for buy in self.daily_buys[current_date]]:
-                # Buy 1 share
-                self.place_trade("BUY", 1, current_price)
-                # Track the purchase
-                self.daily_buys[current_date].append({
-                    'symbol': self.current_symbol,
-                    'quantity': 1,
-                    'price': current_price,
-                    'timestamp': datetime.now()
-                })
-                # Track open position
-                self.open_positions[self.current_symbol] = {
-                    'buy_price': current_price,
-                    'quantity': 1,
-                    'buy_date': current_date
-                }
-                self.status_bar.configure(text=f"Daily buy executed: 1 share of {self.current_symbol} @ ${current_price:.2f}")
-        
-        elif strategy == "PROFIT_TAKE":
-            # Check if we have an open position for this symbol
-            if self.current_symbol in self.open_positions:
-                buy_price = self.open_positions[self.current_symbol]['buy_price']
-                target_price = buy_price * 1.05  # 5% profit target
-                
-                if current_price >= target_price:
-                    # Sell the position
-                    quantity = self.open_positions[self.current_symbol]['quantity']
-                    self.place_trade("SELL", quantity, current_price)
-                    # Remove from open positions
-                    del self.open_positions[self.current_symbol]
-                    self.status_bar.configure(text=f"Profit target reached: Sold {quantity} share(s) of {self.current_symbol} @ ${current_price:.2f}")
-                else:
-                    self.status_bar.configure(text=f"Waiting for 5% profit: {current_price:.2f} < {target_price:.2f}")
+        if order.side == "BUY" and order.strategy == "DAILY_BUY":
+            buy = {
+                'symbol': symbol,
+                'quantity': order.quantity,
+                'price': price,
+                'timestamp': order.filled_at
+            }
+            self.daily_buys.setdefault(current_date, []).append(buy)
+            self.journal.append(DAILY_BUY, date=current_date, buy=buy)
             
+        self.auto_trader.record_fill(symbol, order.side, order.quantity, price)
+        self.update_trade_history()
+        self.status_bar.configure(text=f"{order.strategy}: {order.side} {order.quantity} {symbol} "
+                                       f"filled @ ${price:.2f} {order.reason}".rstrip())
+            
+    def restore_journal_state(self, state):
+        """Rebuild trades, positions and daily buys from the journal's state"""
+        self.trades = [trade_from_journal(trade) for trade in state.recent_trades]
+        self.archived_pnl = state.realized_pnl - sum(trade.pnl for trade in self.trades)
+        self.open_positions = {
+            symbol: {**position, 'buy_date': datetime.fromisoformat(position['buy_date']).date()}
+            for symbol, position in state.positions.items()
+        }
+        self.daily_buys = {
+            datetime.fromisoformat(day).date(): [{**buy, 'timestamp': datetime.fromisoformat(buy['timestamp'])}
+                                                 for buy in buys]
+            for day, buys in state.daily_buys.items()
+        }
+        # Symbols already bought today must not be bought again after a restart
+        for buy in self.daily_buys.get(datetime.now().date(), []):
+            if buy['symbol'] in self.auto_trader.states:
+                self.auto_trader.states[buy['symbol']].last_buy_date = datetime.now().date()
+        self.risk.seed(self.open_positions, state.realized_pnl,
+                       state.daily_realized.get(datetime.now().date().isoformat(), 0.0))
+        # Resting exits don't survive a restart; put them back for positions that had them
+        for symbol, position in self.open_positions.items():
+            if position['quantity'] > 0 and (position.get('stop_loss') or position.get('take_profit')):
+                self.order_manager.protect(symbol, position['quantity'], position.get('stop_loss'),
+                                           position.get('take_profit'), strategy="RESTORED")
+            
+    def on_daily_loss_limit(self, daily_pnl):
+        """Called by the risk engine when the day's P&L crosses the loss limit"""
+        print(f"Daily loss limit reached: ${daily_pnl:.2f}")
+        self.status_bar.configure(text=f"Daily loss limit reached (${daily_pnl:.2f}) - no new positions today")
+            
+    def get_current_price(self, symbol, default=0):
+        """Latest price for one symbol from the quote cache"""
+        return self.quotes.get_quotes([symbol]).get(symbol, default)
+    
     def manual_buy(self):
         """Manual buy order"""
+        if not self.trading_ready():
+            return
         quantity = simpledialog.askinteger("Buy Order", "Enter quantity:")
         if quantity:
-            ticker = yf.Ticker(self.current_symbol)
-            current_price = ticker.info.get('regularMarketPrice', 0)
+            current_price = self.get_current_price(self.current_symbol)
             if current_price > 0:
                 self.place_trade("BUY", quantity, current_price)
                 
     def manual_sell(self):
         """Manual sell order"""
+        if not self.trading_ready():
+            return
         quantity = simpledialog.askinteger("Sell Order", "Enter quantity:")
         if quantity:
-            ticker = yf.Ticker(self.current_symbol)
-            current_price = ticker.info.get('regularMarketPrice', 0)
+            current_price = self.get_current_price(self.current_symbol)
             if current_price > 0:
                 self.place_trade("SELL", quantity, current_price)
                 
-    def place_trade(self, side, quantity, price):
-        """Place a trade"""
-        trade = Trade(
-            symbol=self.current_symbol,
-            side=side,
-            quantity=quantity,
-            price=price,
-            timestamp=datetime.now(),
-            strategy=self.current_strategy or "MANUAL"
-        )
-        
-        self.trades.append(trade)
-        self.update_trade_history()
-        self.status_bar.configure(text=f"{side} order placed: {quantity} {self.current_symbol} @ ${price:.2f}")
+    @timed("orders.place_trade")
+    def place_trade(self, side, quantity, price, symbol=None, strategy=None):
+        """Market order filled against the given price (defaults to the current symbol and strategy)"""
+        symbol = symbol or self.current_symbol
+        self.order_manager.submit(symbol, side, quantity, strategy=strategy or self.current_strategy or "MANUAL")
+        self.order_manager.process_quotes({symbol: price})
         
     def update_trade_history(self):
-        """Update trade history display"""
-        # Clear existing items
-        for item in self.trade_tree.get_children():
-            self.trade_tree.delete(item)
-            
-        # Add trades
-        for trade in reversed(self.trades[-50:]):  # Show last 50 trades
-            self.trade_tree.insert("", "end", values=(
-                trade.timestamp.strftime("%H:%M:%S"),
-                trade.symbol,
-                trade.side,
-                trade.quantity,
-                f"${trade.price:.2f}",
-                f"${trade.pnl:.2f}"
-            ))
+        """Sync the visible page of the trade history"""
+        self.trade_history.refresh()
+        self.history_page_label.configure(text=self.trade_history.describe())
+        
+    def page_trade_history(self, move):
+        """Go to a newer or older page of the trade history"""
+        move()
+        self.history_page_label.configure(text=self.trade_history.describe())
+        
+    @staticmethod
+    def format_trade_row(trade):
+        return (
+            trade.timestamp.strftime("%m-%d %H:%M:%S"),
+            trade.symbol,
+            trade.side,
+            trade.quantity,
+            f"${trade.price:.2f}",
+            f"${trade.pnl:.2f}"
+        )
     
-    def update_open_positions(self):
-        """Update open positions display"""
-        # Clear existing items
-        for item in self.positions_tree.get_children():
-            self.positions_tree.delete(item)
-            
-        # Get current prices for open positions
+    def update_open_positions(self, prices):
+        """Sync the open positions table from a symbol -> price dict"""
+        rows = []
         for symbol, position in self.open_positions.items():
-            try:
-                ticker = yf.Ticker(symbol)
-                current_price = ticker.info.get('regularMarketPrice', position['buy_price'])
-                
-                buy_price = position['buy_price']
-                quantity = position['quantity']
-                target_price = buy_price * 1.05
-                current_pnl = (current_price - buy_price) * quantity
-                
-                self.positions_tree.insert("", "end", values=(
-                    symbol,
-                    quantity,
-                    f"${buy_price:.2f}",
-                    f"${target_price:.2f}",
-                    f"${current_price:.2f}",
-                    f"${current_pnl:.2f}"
-                ))
-            except Exception as e:
-                print(f"Error updating position for {symbol}: {e}")
+            current_price = prices.get(symbol, position['buy_price'])
+            buy_price = position['buy_price']
+            quantity = position['quantity']
+            target_price = position.get('take_profit') or buy_price * 1.05
+            current_pnl = (current_price - buy_price) * quantity
+            rows.append((symbol, (
+                symbol,
+                quantity,
+                f"${buy_price:.2f}",
+                f"${target_price:.2f}",
+                f"${current_price:.2f}",
+                f"${current_pnl:.2f}"
+            )))
+        self.positions_table.sync(rows)
     
     def update_daily_status(self):
         """Update daily buy status"""
@@ -1040,60 +1449,125 @@ class StockDayTradingApp(ctk.CTk):
         else:
             self.daily_status_label.configure(text=f"Ready to buy {self.current_symbol} today")
             
-    def create_chart(self):
-        """Create price chart"""
-        try:
-            # Get historical data
-            ticker = yf.Ticker(self.current_symbol)
-            data = ticker.history(period="1d", interval="1m")
+    def update_chart(self, timeframe=None):
+        """Switch the chart to the current symbol and timeframe and fetch its bars now"""
+        if self.live_chart is None:
+            return
+        self.live_chart.show(self.current_symbol, self.timeframe_var.get())
+        self.service.trigger("chart")
+        
+    async def refresh_chart(self):
+        """Fetch the charted symbol's bars and latest quote (service loop)"""
+        if self.live_chart.current is None:
+            return
+        symbol, interval = self.live_chart.current
+        data = await self.service.run_blocking(self.bar_cache.get_bars, symbol,
+                                               live_chart.CHART_PERIODS.get(interval, "1d"), interval)
+        quotes = await self.service.run_blocking(self.quotes.get_quotes, [symbol])
+        self.ui_queue.post(self.apply_chart_data, symbol, interval, data, quotes.get(symbol))
+        
+    def apply_chart_data(self, symbol, interval, data, price):
+        """Append new bars to the live chart and move its last bar to the latest quote (Tk thread)"""
+        with instruments.timer("ui.chart"):
+            self.live_chart.update(symbol, interval, data)
+            if price:
+                self.live_chart.tick(symbol, price)
+        
+    async def refresh_market_data(self):
+        """
+        One market data cycle on the service loop: a single batched quote
+        request for the current symbol and every open position, handed to the
+        Tk thread for strategy evaluation and position marking
+        """
+        started = time.perf_counter()
+        symbols = list(dict.fromkeys(self.watchlist + [self.current_symbol] + list(self.open_positions)))
+        with instruments.timer("data_fetch.quotes"):
+            prices = await self.service.run_blocking(self.quotes.get_quotes, symbols)
+        if self.aggregated_bars:
+            # Quotes move the forming bars of every timeframe between 1m polls
+            self.bar_cache.ingest_quotes(prices, self.replay_feed.now_ns() if self.replay_feed else None)
+        
+        # Indicator strategies read bar history, so they run concurrently off the Tk thread
+        signals = {}
+        if self.trading_active:
+            signal_symbols = self.auto_trader.signal_symbols()
+            results = await self.service.map_blocking(self.auto_trader.evaluate_signal, signal_symbols)
+            for symbol, result in zip(signal_symbols, results):
+                if isinstance(result, Exception):
+                    print(f"Error evaluating {symbol}: {result}")
+                else:
+                    signals[symbol] = result
+        self.ui_queue.post(self.apply_market_data, prices, signals, started)
+        
+    async def refresh_risk_returns(self):
+        """Reload the daily returns behind the VaR estimate (service loop)"""
+        symbols = set(self.watchlist) | set(self.open_positions)
+        await self.service.run_blocking(self.risk.returns.refresh, symbols)
+        
+    def update_risk_display(self):
+        """Show drawdown, gross exposure and VaR from the risk engine"""
+        var = self.risk.value_at_risk()['var']
+        self.risk_label.configure(
+            text=f"Drawdown: ${self.risk.drawdown:.2f} | Exposure: ${self.risk.gross_exposure:.2f} | VaR (95%): ${var:.2f}",
+            text_color="#FF6B6B" if self.risk.limit_breached else self.pnl_label.cget("text_color")
+        )
+        
+    def apply_market_data(self, prices, signals, started=None):
+        """Act on refreshed prices and signals (Tk thread); started is when the cycle's fetch began"""
+        self.risk.on_prices(prices)
+        # Resting stops and targets fill first, so the auto trader sees the positions they leave
+        self.order_manager.process_quotes(prices)
+        if self.trading_active:
+            orders = self.auto_trader.decide(prices, signals, self.open_positions, self.risk.daily_pnl)
+            self.execute_orders(orders)
+            self.order_manager.process_quotes(prices)
+        if started is not None:
+            instruments.record("tick_to_decision", time.perf_counter() - started)
             
-            if not data.empty:
-                # Create matplotlib figure
-                fig, ax = plt.subplots(figsize=(10, 6))
-                ax.plot(data.index, data['Close'])
-                ax.set_title(f"{self.current_symbol} Price Chart")
-                ax.set_xlabel("Time")
-                ax.set_ylabel("Price ($)")
-                ax.grid(True)
-                
-                # Create canvas
-                canvas = FigureCanvasTkAgg(fig, self.chart_frame)
-                canvas.draw()
-                canvas.get_tk_widget().pack(fill="both", expand=True)
-                
-        except Exception as e:
-            print(f"Error creating chart: {e}")
+        with instruments.timer("ui.refresh"):
+            # Update P&L
+            total_pnl = self.archived_pnl + sum(trade.pnl for trade in self.trades)
+            self.pnl_label.configure(text=f"${total_pnl:.2f}")
+            self.update_risk_display()
             
-    def update_chart(self, timeframe=None):
-        """Update the chart"""
-        # Implementation for updating chart
-        pass
-        
-    def start_market_data_thread(self):
-        """Start market data update thread"""
-        thread = threading.Thread(target=self.market_data_thread)
-        thread.daemon = True
-        thread.start()
-        
-    def market_data_thread(self):
-        """Market data update thread"""
-        while True:
-            try:
-                # Update P&L
-                total_pnl = sum(trade.pnl for trade in self.trades)
-                self.pnl_label.configure(text=f"${total_pnl:.2f}")
-                
-                # Update open positions
-                self.update_open_positions()
-                
-                # Update daily status
-                self.update_daily_status()
-                
-                time.sleep(5)  # Update every 5 seconds
-                
-            except Exception as e:
-                print(f"Error in market data thread: {e}")
-                time.sleep(10)
+            # Update open positions
+            self.update_open_positions(prices)
+            
+            # Update daily status
+            self.update_daily_status()
+        if instruments.enabled:
+            self.update_diagnostics()
+        
+    def toggle_instrumentation(self):
+        """Switch the hot-path timers on or off"""
+        instruments.enabled = self.instrumentation_var.get()
+        self.update_diagnostics()
+        
+    def update_diagnostics(self):
+        """Show the latest latency percentiles in the Settings tab"""
+        if instruments.histograms:
+            text = instruments.report()
+        elif instruments.enabled:
+            text = "Waiting for the first market data cycle..."
+        else:
+            text = "Timings are off. Switch on Record Timings (or set INSTRUMENTATION=true) to collect them."
+        if IMPORT_TIMES:
+            text += f"\n\nStartup imports\n{import_report()}"
+        self.diagnostics_text.delete("1.0", "end")
+        self.diagnostics_text.insert("1.0", text)
+        
+    def reset_diagnostics(self):
+        instruments.reset()
+        self.update_diagnostics()
+        
+    def export_diagnostics(self, extension):
+        """Write the timings as JSON or Prometheus text next to the app"""
+        path = DIAGNOSTICS_FILE + extension
+        try:
+            instruments.dump(path)
+            self.status_bar.configure(text=f"Diagnostics written to {path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export diagnostics: {e}")
 
 def main():
     """Main function"""
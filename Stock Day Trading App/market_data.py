@@ -0,0 +1,210 @@
+"""
+Market Data Module
+Shared OHLCV bar cache so strategies don't re-download the same history on every call.
+"""
+
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from datetime import datetime
+
+import pandas as pd
+import yfinance as yf
+
+from instrumentation import instruments
+
+logger = logging.getLogger(__name__)
+
+# How long cached bars are served before we ask the source for newer ones (seconds)
+DEFAULT_TTL = {
+    '1m': 30,
+    '2m': 60,
+    '5m': 60,
+    '15m': 120,
+    '30m': 300,
+    '1h': 300,
+    '1d': 1800,
+}
+
+# Approximate trading-day length of yfinance period strings, used to decide
+# whether a cached entry already covers a requested period
+PERIOD_DAYS = {
+    '1d': 1,
+    '5d': 5,
+    '7d': 7,
+    '30d': 30,
+    '60d': 60,
+    '1mo': 30,
+    '3mo': 90,
+    '6mo': 180,
+    '1y': 365,
+    '2y': 730,
+    '5y': 1825,
+    '10y': 3650,
+    'max': 100000,
+}
+
+Fetcher = Callable[..., pd.DataFrame]
+
+
+def yfinance_fetcher(symbol: str, interval: str, period: Optional[str] = None,
+                     start: Optional[datetime] = None) -> pd.DataFrame:
+    """Download bars from yfinance, either a full period or everything since start"""
+    ticker = yf.Ticker(symbol)
+    if start is not None:
+        return ticker.history(start=start, interval=interval)
+    return ticker.history(period=period, interval=interval)
+
+
+def download_panel(symbols: List[str], period: str = "30d", interval: str = "1h") -> pd.DataFrame:
+    """
+    Download bars for many symbols in a single request. The result is grouped
+    by field, so panel['Close'] is a time x symbols DataFrame.
+    """
+    return yf.download(list(symbols), period=period, interval=interval,
+                       group_by='column', auto_adjust=True, progress=False)
+
+
+def period_days(period: str) -> int:
+    """Convert a yfinance period string ('5d', '1mo', ...) to a day count"""
+    if period in PERIOD_DAYS:
+        return PERIOD_DAYS[period]
+    if period.endswith('d') and period[:-1].isdigit():
+        return int(period[:-1])
+    return PERIOD_DAYS['max']
+
+
+def covered_span(data: pd.DataFrame, period: str) -> pd.Timedelta:
+    """Time an entry keeps: the period in days, or what the fetch actually covered if that is longer"""
+    span = pd.Timedelta(days=period_days(period))
+    if len(data) > 1 and isinstance(data.index, pd.DatetimeIndex):
+        span = max(span, data.index[-1] - data.index[0])
+    return span
+
+
+@dataclass
+class BarEntry:
+    """Cached bars for a single (symbol, interval) pair"""
+    data: pd.DataFrame
+    period: str
+    span: pd.Timedelta  # bars older than this before the newest one are dropped
+    fetched_at: float
+
+
+class BarCache:
+    """Per-(symbol, interval) OHLCV store with TTL and incremental append"""
+
+    def __init__(self, fetcher: Optional[Fetcher] = None, ttl: Optional[Dict[str, float]] = None):
+        self.fetcher = fetcher or yfinance_fetcher
+        self.ttl = dict(DEFAULT_TTL)
+        if ttl:
+            self.ttl.update(ttl)
+        self._entries: Dict[Tuple[str, str], BarEntry] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'incremental_fetches': 0,
+            'fetch_count': 0,
+            'fetch_errors': 0,
+            'fetch_time_total': 0.0,
+            'fetch_time_max': 0.0,
+        }
+
+    def get_bars(self, symbol: str, period: str = "5d", interval: str = "1d") -> pd.DataFrame:
+        """Return bars covering at least `period`, fetching only what is missing"""
+        key = (symbol, interval)
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            now = time.monotonic()
+
+            if entry is None or period_days(period) > period_days(entry.period):
+                self._record('misses')
+                data = self._fetch(symbol, interval, period=period)
+                self._entries[key] = BarEntry(data=data, period=period,
+                                              span=covered_span(data, period), fetched_at=now)
+                return data
+
+            if now - entry.fetched_at < self.ttl.get(interval, 60):
+                self._record('hits')
+                return entry.data
+
+            self._record('incremental_fetches')
+            self._append_newer(symbol, interval, entry)
+            entry.fetched_at = now
+            return entry.data
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Drop cached bars for one symbol, or for everything"""
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == symbol]:
+                    del self._entries[key]
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and fetch latency"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        requests = stats['hits'] + stats['misses'] + stats['incremental_fetches']
+        stats['hit_rate'] = stats['hits'] / requests if requests else 0.0
+        stats['fetch_time_avg_ms'] = (stats['fetch_time_total'] / stats['fetch_count'] * 1000
+                                      if stats['fetch_count'] else 0.0)
+        stats['fetch_time_max_ms'] = stats['fetch_time_max'] * 1000
+        return stats
+
+    def _append_newer(self, symbol: str, interval: str, entry: BarEntry):
+        """Fetch bars from the last cached timestamp on and merge them in"""
+        if entry.data.empty:
+            entry.data = self._fetch(symbol, interval, period=entry.period)
+            entry.span = covered_span(entry.data, entry.period)
+            return
+
+        try:
+            newer = self._fetch(symbol, interval, start=entry.data.index[-1])
+        except Exception as e:
+            # Keep serving what we have; the next call will retry
+            logger.warning(f"Incremental fetch failed for {symbol} {interval}: {e}")
+            return
+
+        if newer.empty:
+            return
+
+        # The last cached bar may have been partial, so the fresh copy wins
+        merged = pd.concat([entry.data, newer])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        # Trimmed by time, not row count, so a window that started small (pre-market) still fills up
+        if isinstance(merged.index, pd.DatetimeIndex):
+            merged = merged[merged.index >= merged.index[-1] - entry.span]
+        entry.data = merged
+
+    def _fetch(self, symbol: str, interval: str, **kwargs) -> pd.DataFrame:
+        start = time.perf_counter()
+        try:
+            data = self.fetcher(symbol, interval, **kwargs)
+        except Exception:
+            self._record('fetch_errors')
+            raise
+        elapsed = time.perf_counter() - start
+        instruments.record("data_fetch.bars", elapsed)
+
+        with self._lock:
+            self._stats['fetch_count'] += 1
+            self._stats['fetch_time_total'] += elapsed
+            self._stats['fetch_time_max'] = max(self._stats['fetch_time_max'], elapsed)
+        return data
+
+    def _key_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _record(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
@@ -0,0 +1,334 @@
+"""
+Optimizer Module
+Parallel parameter sweeps over strategy thresholds, scored by backtesting.
+
+Bars are copied once into shared memory; worker processes attach to the
+blocks when they start, so a task only pickles its parameter dict. Every
+finished evaluation is appended to a JSONL checkpoint and is not re-run
+when an interrupted sweep is started again. Checkpoint records carry a
+fingerprint of the bars, backtest config and objective they were produced
+with, and only records with the current fingerprint are resumed.
+
+A search space maps parameter names (see STRATEGY_PARAMS) to either a list
+of choices or a (low, high) tuple for a continuous range; ranges with two
+ints are sampled as ints.
+"""
+
+import os
+import json
+import hashlib
+import random
+import logging
+import itertools
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+from backtester import BacktestConfig, Backtester
+
+try:
+    from scipy.stats import norm
+    from sklearn.gaussian_process import GaussianProcessRegressor
+    from sklearn.gaussian_process.kernels import Matern
+except ImportError:  # scikit-learn is optional; Bayesian search falls back to random sampling
+    GaussianProcessRegressor = None
+
+logger = logging.getLogger(__name__)
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+METRICS = ['total_return', 'sharpe', 'max_drawdown', 'win_rate', 'trades']
+
+# Metrics where lower is better
+MINIMIZE = {'max_drawdown'}
+
+SearchSpace = Dict[str, Union[list, Tuple[float, float]]]
+
+
+@dataclass
+class SharedBars:
+    """Picklable handle to one symbol's bars in a shared memory block"""
+    symbol: str
+    name: str
+    rows: int
+    tz: Optional[str]
+    datetime_index: bool
+
+    def frame(self, buffer) -> pd.DataFrame:
+        """View the block as a read-only OHLCV DataFrame without copying"""
+        values = np.ndarray((self.rows, len(BAR_COLUMNS)), dtype=np.float64, buffer=buffer)
+        values.flags.writeable = False
+        stamps = np.ndarray((self.rows,), dtype=np.int64, buffer=buffer,
+                            offset=self.rows * len(BAR_COLUMNS) * 8)
+        if self.datetime_index:
+            index = pd.DatetimeIndex(stamps.view('datetime64[ns]'))
+            if self.tz:
+                index = index.tz_localize('UTC').tz_convert(self.tz)
+        else:
+            index = pd.RangeIndex(self.rows)
+        return pd.DataFrame(values, columns=BAR_COLUMNS, index=index, copy=False)
+
+
+def share_bars(bars: Dict[str, pd.DataFrame]) -> Tuple[List[SharedBars], List[shared_memory.SharedMemory]]:
+    """Copy OHLCV frames into shared memory; the caller must close and unlink the blocks"""
+    handles, blocks = [], []
+    for symbol, data in bars.items():
+        rows = len(data)
+        block = shared_memory.SharedMemory(create=True, size=max(rows * (len(BAR_COLUMNS) + 1) * 8, 1))
+        blocks.append(block)
+
+        datetime_index = isinstance(data.index, pd.DatetimeIndex)
+        handle = SharedBars(symbol, block.name, rows,
+                            str(data.index.tz) if datetime_index and data.index.tz else None,
+                            datetime_index)
+        values = np.ndarray((rows, len(BAR_COLUMNS)), dtype=np.float64, buffer=block.buf)
+        values[:] = data[BAR_COLUMNS].to_numpy(dtype=np.float64)
+        if datetime_index:
+            index = data.index.tz_convert('UTC').tz_localize(None) if data.index.tz else data.index
+            stamps = np.ndarray((rows,), dtype=np.int64, buffer=block.buf, offset=rows * len(BAR_COLUMNS) * 8)
+            stamps[:] = index.as_unit('ns').asi8
+        handles.append(handle)
+    return handles, blocks
+
+
+# Per-process state of sweep workers, set up once by _init_worker
+_worker_blocks: List[shared_memory.SharedMemory] = []
+_worker_bars: Dict[str, pd.DataFrame] = {}
+_worker_backtester: Optional[Backtester] = None
+_worker_strategy = ""
+
+
+def _init_worker(handles: List[SharedBars], strategy: str, config: BacktestConfig):
+    global _worker_backtester, _worker_strategy
+    for handle in handles:
+        # Workers share the parent's resource tracker, which unlinks the block on cleanup
+        block = shared_memory.SharedMemory(name=handle.name)
+        _worker_blocks.append(block)
+        _worker_bars[handle.symbol] = handle.frame(block.buf)
+    _worker_backtester = Backtester(config)
+    _worker_strategy = strategy
+
+
+def _evaluate(params: Dict) -> Dict:
+    """Backtest one parameter set on every shared symbol and aggregate the metrics"""
+    results = [_worker_backtester.run(data, _worker_strategy, symbol, params)
+               for symbol, data in _worker_bars.items()]
+    return aggregate_metrics(results)
+
+
+def aggregate_metrics(results) -> Dict:
+    """Combine per-symbol backtests: averages, worst drawdown and total trade count"""
+    if not results:
+        return {metric: 0.0 for metric in METRICS}
+    return {
+        'total_return': float(np.mean([r.total_return for r in results])),
+        'sharpe': float(np.mean([r.sharpe for r in results])),
+        'max_drawdown': float(max(r.max_drawdown for r in results)),
+        'win_rate': float(np.mean([r.win_rate for r in results])),
+        'trades': int(sum(len(r.trades) for r in results)),
+    }
+
+
+class StrategyOptimizer:
+    """Grid, random and Bayesian parameter sweeps for one strategy"""
+
+    def __init__(self, strategy: str, bars: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
+                 config: Optional[BacktestConfig] = None, objective: str = "sharpe",
+                 max_workers: Optional[int] = None, checkpoint_path: Optional[str] = None):
+        self.strategy = strategy
+        self.bars = bars if isinstance(bars, dict) else {"": bars}
+        self.config = config or BacktestConfig()
+        self.objective = objective
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.checkpoint_path = checkpoint_path
+        self.fingerprint = sweep_fingerprint(self.bars, self.config, objective)
+        self.completed = self._load_checkpoint()
+
+    def grid_search(self, space: SearchSpace) -> pd.DataFrame:
+        """Evaluate every combination of the listed choices"""
+        for key, values in space.items():
+            if not isinstance(values, list):
+                raise ValueError(f"Grid search needs a list of values for {key}")
+        keys = list(space)
+        candidates = (dict(zip(keys, combo)) for combo in itertools.product(*space.values()))
+        with self._pool() as pool:
+            return self._rank(self._run(pool, candidates))
+
+    def random_search(self, space: SearchSpace, n_iter: int, seed: Optional[int] = None) -> pd.DataFrame:
+        """Evaluate n_iter random draws from the space"""
+        rng = random.Random(seed)
+        candidates = (self._sample(space, rng) for _ in range(n_iter))
+        with self._pool() as pool:
+            return self._rank(self._run(pool, candidates))
+
+    def bayesian_search(self, space: SearchSpace, n_iter: int, n_initial: Optional[int] = None,
+                 seed: Optional[int] = None, pool_size: int = 1000) -> pd.DataFrame:
+        """
+        Gaussian-process search: after n_initial random draws, each batch (one
+        candidate per worker) maximizes expected improvement over pool_size
+        random candidates
+        """
+        rng = random.Random(seed)
+        if GaussianProcessRegressor is None:
+            logger.warning("scikit-learn is not installed; running a random search instead")
+            return self.random_search(space, n_iter, seed)
+
+        n_initial = min(n_iter, n_initial or max(10, 2 * len(space)))
+        sign = -1 if self.objective in MINIMIZE else 1
+        with self._pool() as pool:
+            records = self._run(pool, (self._sample(space, rng) for _ in range(n_initial)))
+            while len(records) < n_iter:
+                x = np.array([self._encode(space, record['params']) for record in records])
+                y = np.array([sign * record['metrics'][self.objective] for record in records])
+                y[~np.isfinite(y)] = np.nanmin(y[np.isfinite(y)]) if np.isfinite(y).any() else 0.0
+
+                model = GaussianProcessRegressor(kernel=Matern(nu=2.5), normalize_y=True, alpha=1e-6,
+                                                 random_state=rng.randrange(2 ** 31))
+                model.fit(x, y)
+
+                pool_candidates = [self._sample(space, rng) for _ in range(pool_size)]
+                mean, std = model.predict(np.array([self._encode(space, c) for c in pool_candidates]),
+                                          return_std=True)
+                improvement = mean - y.max()
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    z = improvement / std
+                    expected = np.where(std > 0, improvement * norm.cdf(z) + std * norm.pdf(z), 0.0)
+
+                batch = min(self.max_workers, n_iter - len(records))
+                chosen = [pool_candidates[i] for i in np.argsort(expected)[::-1][:batch]]
+                records += self._run(pool, chosen)
+        return self._rank(records)
+
+    @contextmanager
+    def _pool(self) -> Iterator[ProcessPoolExecutor]:
+        handles, blocks = share_bars(self.bars)
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                     initargs=(handles, self.strategy, self.config)) as pool:
+                yield pool
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def _run(self, pool: ProcessPoolExecutor, candidates: Iterable[Dict]) -> List[Dict]:
+        """Evaluate candidates, keeping the pool busy but the number of queued tasks bounded"""
+        records, pending = [], {}
+        limit = self.max_workers * 4
+        for params in candidates:
+            params = _plain(params)
+            key = _key(params)
+            if key in self.completed:
+                records.append(self.completed[key])
+                continue
+            pending[pool.submit(_evaluate, params)] = params
+            if len(pending) >= limit:
+                records += self._collect(pending)
+        while pending:
+            records += self._collect(pending)
+        return records
+
+    def _collect(self, pending: Dict) -> List[Dict]:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        records = []
+        for future in done:
+            params = pending.pop(future)
+            record = {'params': params, 'metrics': future.result()}
+            self.completed[_key(params)] = record
+            self._checkpoint(record)
+            records.append(record)
+        if len(self.completed) % 100 == 0:
+            logger.info(f"{self.strategy} sweep: {len(self.completed)} evaluations")
+        return records
+
+    def _rank(self, records: List[Dict]) -> pd.DataFrame:
+        """One row per parameter set, best objective first"""
+        unique = {_key(record['params']): record for record in records}
+        rows = [{**record['params'], **record['metrics']} for record in unique.values()]
+        if not rows:
+            return pd.DataFrame(columns=METRICS)
+        result = pd.DataFrame(rows)
+        return result.sort_values(self.objective, ascending=self.objective in MINIMIZE,
+                                  ignore_index=True)
+
+    def _load_checkpoint(self) -> Dict[str, Dict]:
+        completed = {}
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return completed
+        stale = 0
+        with open(self.checkpoint_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash; it is simply re-evaluated
+                    continue
+                if record.get('strategy') != self.strategy:
+                    continue
+                if record.get('fingerprint') != self.fingerprint:
+                    # Produced from other bars, config or objective
+                    stale += 1
+                    continue
+                completed[_key(record['params'])] = record
+        if stale:
+            logger.info(f"Ignoring {stale} checkpointed {self.strategy} evaluations from a different sweep")
+        logger.info(f"Resuming {self.strategy} sweep with {len(completed)} checkpointed evaluations")
+        return completed
+
+    def _checkpoint(self, record: Dict):
+        if not self.checkpoint_path:
+            return
+        with open(self.checkpoint_path, 'a') as f:
+            f.write(json.dumps({'strategy': self.strategy, 'fingerprint': self.fingerprint, **record}) + '\n')
+
+    @staticmethod
+    def _sample(space: SearchSpace, rng: random.Random) -> Dict:
+        params = {}
+        for key, values in space.items():
+            if isinstance(values, list):
+                params[key] = rng.choice(values)
+            elif isinstance(values[0], int) and isinstance(values[1], int):
+                params[key] = rng.randint(values[0], values[1])
+            else:
+                params[key] = rng.uniform(values[0], values[1])
+        return params
+
+    @staticmethod
+    def _encode(space: SearchSpace, params: Dict) -> List[float]:
+        """Map a parameter set onto the unit cube for the Gaussian process"""
+        point = []
+        for key, values in space.items():
+            value = params[key]
+            if isinstance(values, list):
+                position = values.index(value) if value in values else 0
+                point.append(position / max(len(values) - 1, 1))
+            else:
+                low, high = values
+                point.append((value - low) / (high - low) if high != low else 0.0)
+        return point
+
+
+def sweep_fingerprint(bars: Dict[str, pd.DataFrame], config: BacktestConfig, objective: str) -> str:
+    """Hash of everything besides the parameters that a sweep's results depend on"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps({'symbols': sorted(bars), 'config': asdict(config), 'objective': objective},
+                             sort_keys=True, default=str).encode())
+    for symbol in sorted(bars):
+        frame = bars[symbol]
+        digest.update(symbol.encode())
+        digest.update(pd.util.hash_pandas_object(frame.index, index=False).to_numpy().tobytes())
+        digest.update(np.ascontiguousarray(frame[BAR_COLUMNS].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+
+def _plain(params: Dict) -> Dict:
+    """Convert numpy scalars so parameter sets serialize to JSON"""
+    return {key: value.item() if isinstance(value, np.generic) else value for key, value in params.items()}
+
+
+def _key(params: Dict) -> str:
+    return json.dumps(params, sort_keys=True)
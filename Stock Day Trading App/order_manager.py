@@ -0,0 +1,294 @@
+"""
+Order Manager Module
+Order lifecycle (ids, market/limit/stop/bracket orders) and a local simulated exchange.
+
+Resting orders sit in four heaps per symbol: buy limits and sell stops keyed
+by descending price, sell limits and buy stops by ascending price. Matching
+a quote or bar only looks at the top of each heap and pops while it is
+triggered, so a tick costs O(fills * log n) however many orders are
+resting. Cancelled orders are skipped lazily when they reach the top.
+Bracket children are held until their entry fills, then rest as a
+one-cancels-other pair.
+"""
+
+import heapq
+import itertools
+import logging
+from enum import Enum, auto
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Order statuses; EXECUTED and CANCELLED are final
+HELD = 'HELD'  # bracket child waiting for its entry to fill
+PENDING = 'PENDING'
+EXECUTED = 'EXECUTED'
+CANCELLED = 'CANCELLED'
+
+
+class OrderType(Enum):
+    MARKET = auto()
+    LIMIT = auto()
+    STOP = auto()
+
+
+@dataclass
+class ManagedOrder:
+    """An order and its lifecycle"""
+    order_id: int
+    symbol: str
+    side: str  # 'BUY' or 'SELL'
+    quantity: int
+    order_type: OrderType = OrderType.MARKET
+    limit_price: Optional[float] = None
+    stop_price: Optional[float] = None
+    strategy: str = "MANUAL"
+    reason: str = ""
+    status: str = PENDING
+    created_at: Optional[datetime] = None
+    filled_at: Optional[datetime] = None
+    fill_price: Optional[float] = None
+    parent_id: Optional[int] = None
+    oco_id: Optional[int] = None  # sibling cancelled when this order fills
+    stop_loss: Optional[float] = None  # bracket levels, kept on the entry for reference
+    take_profit: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (HELD, PENDING)
+
+
+class OrderBook:
+    """Resting orders of one symbol, indexed by trigger price"""
+
+    def __init__(self):
+        # Heap entries are (key, order_id); the id keeps time priority at equal prices
+        self.buy_limits: List[Tuple[float, int]] = []  # key -limit: highest limit first
+        self.sell_limits: List[Tuple[float, int]] = []  # key limit: lowest limit first
+        self.buy_stops: List[Tuple[float, int]] = []  # key stop: lowest stop first
+        self.sell_stops: List[Tuple[float, int]] = []  # key -stop: highest stop first
+        self.market: List[int] = []
+        self.dead = 0  # cancelled entries still in the heaps
+
+    def add(self, order: ManagedOrder):
+        if order.order_type == OrderType.MARKET:
+            self.market.append(order.order_id)
+        elif order.order_type == OrderType.LIMIT:
+            if order.side == "BUY":
+                heapq.heappush(self.buy_limits, (-order.limit_price, order.order_id))
+            else:
+                heapq.heappush(self.sell_limits, (order.limit_price, order.order_id))
+        elif order.side == "BUY":
+            heapq.heappush(self.buy_stops, (order.stop_price, order.order_id))
+        else:
+            heapq.heappush(self.sell_stops, (-order.stop_price, order.order_id))
+
+    def compact(self, live: Dict[int, ManagedOrder]):
+        """Drop entries of orders that are no longer live"""
+        for name in ('buy_limits', 'sell_limits', 'buy_stops', 'sell_stops'):
+            heap = [entry for entry in getattr(self, name) if entry[1] in live]
+            heapq.heapify(heap)
+            setattr(self, name, heap)
+        self.market = [order_id for order_id in self.market if order_id in live]
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.buy_limits) + len(self.sell_limits) + len(self.buy_stops) + len(self.sell_stops) + len(self.market)
+
+
+class SimulatedExchange:
+    """Matches resting orders against quotes or bars"""
+
+    def __init__(self, slippage_bps: float = 0.0):
+        self.slippage_bps = slippage_bps
+        self.books: Dict[str, OrderBook] = {}
+        self.orders: Dict[int, ManagedOrder] = {}
+
+    def add(self, order: ManagedOrder):
+        self.orders[order.order_id] = order
+        self.books.setdefault(order.symbol, OrderBook()).add(order)
+
+    def discard(self, order: ManagedOrder):
+        """Forget a cancelled order; its heap entry is skipped, and compacted once dead entries dominate"""
+        if self.orders.pop(order.order_id, None) is None:
+            return
+        book = self.books[order.symbol]
+        book.dead += 1
+        if book.dead > 64 and book.dead * 2 > len(book):
+            book.compact(self.orders)
+
+    def resting(self) -> int:
+        """Heap entries, including cancelled orders not yet popped"""
+        return sum(len(book) for book in self.books.values())
+
+    def match(self, symbol: str, open_price: float, high: float, low: float) -> Iterator[Tuple[ManagedOrder, float]]:
+        """Yield (order, fill price) for every order the bar or quote triggers.
+
+        Lazy, so the caller can cancel a bracket sibling before it is reached.
+        Stops are checked before limits, the conservative order within a bar.
+        """
+        book = self.books.get(symbol)
+        if book is None:
+            return
+
+        slip = self.slippage_bps / 10000
+        market, book.market = book.market, []
+        for order_id in market:
+            order = self._live(order_id)
+            if order is not None:
+                yield order, open_price * (1 + slip if order.side == "BUY" else 1 - slip)
+
+        while book.sell_stops and -book.sell_stops[0][0] >= low:
+            order = self._live(heapq.heappop(book.sell_stops)[1])
+            if order is not None:
+                yield order, min(open_price, order.stop_price) * (1 - slip)
+        while book.buy_stops and book.buy_stops[0][0] <= high:
+            order = self._live(heapq.heappop(book.buy_stops)[1])
+            if order is not None:
+                yield order, max(open_price, order.stop_price) * (1 + slip)
+        while book.buy_limits and -book.buy_limits[0][0] >= low:
+            order = self._live(heapq.heappop(book.buy_limits)[1])
+            if order is not None:
+                yield order, min(open_price, order.limit_price)
+        while book.sell_limits and book.sell_limits[0][0] <= high:
+            order = self._live(heapq.heappop(book.sell_limits)[1])
+            if order is not None:
+                yield order, max(open_price, order.limit_price)
+
+    def _live(self, order_id: int) -> Optional[ManagedOrder]:
+        order = self.orders.pop(order_id, None)
+        return order if order is not None and order.status == PENDING else None
+
+
+class OrderManager:
+    """Creates orders, routes them to the simulated exchange and tracks their status"""
+
+    def __init__(self, exchange: Optional[SimulatedExchange] = None,
+                 on_fill: Optional[Callable[[ManagedOrder], None]] = None,
+                 on_update: Optional[Callable[[ManagedOrder], None]] = None, first_id: int = 1):
+        self.exchange = exchange or SimulatedExchange()
+        self.on_fill = on_fill
+        self.on_update = on_update
+        self.orders: Dict[int, ManagedOrder] = {}  # active orders only
+        self._children: Dict[int, List[int]] = {}
+        self._ids = itertools.count(first_id)
+
+    def submit(self, symbol: str, side: str, quantity: int, order_type: OrderType = OrderType.MARKET,
+               limit_price: Optional[float] = None, stop_price: Optional[float] = None,
+               strategy: str = "MANUAL", reason: str = "", parent_id: Optional[int] = None) -> ManagedOrder:
+        if side not in ("BUY", "SELL"):
+            raise ValueError(f"Unknown order side: {side}")
+        if quantity <= 0:
+            raise ValueError(f"Order quantity must be positive, got {quantity}")
+        if order_type == OrderType.LIMIT and limit_price is None:
+            raise ValueError("Limit orders need a limit price")
+        if order_type == OrderType.STOP and stop_price is None:
+            raise ValueError("Stop orders need a stop price")
+
+        order = ManagedOrder(next(self._ids), symbol, side, quantity, order_type, limit_price, stop_price,
+                             strategy, reason, HELD if parent_id is not None else PENDING,
+                             created_at=datetime.now(), parent_id=parent_id)
+        self.orders[order.order_id] = order
+        if order.status == PENDING:
+            self.exchange.add(order)
+        self._notify(order)
+        return order
+
+    def submit_bracket(self, symbol: str, side: str, quantity: int, stop_loss: Optional[float] = None,
+                       take_profit: Optional[float] = None, limit_price: Optional[float] = None,
+                       strategy: str = "MANUAL", reason: str = "") -> ManagedOrder:
+        """Entry (market, or limit when limit_price is given) with stop-loss and take-profit exits"""
+        entry = self.submit(symbol, side, quantity,
+                            OrderType.LIMIT if limit_price is not None else OrderType.MARKET,
+                            limit_price=limit_price, strategy=strategy, reason=reason)
+        entry.stop_loss, entry.take_profit = stop_loss, take_profit
+        self._children[entry.order_id] = [
+            order.order_id for order in self._exits(symbol, "SELL" if side == "BUY" else "BUY", quantity,
+                                                    stop_loss, take_profit, strategy, parent_id=entry.order_id)
+        ]
+        return entry
+
+    def protect(self, symbol: str, quantity: int, stop_loss: Optional[float] = None,
+                take_profit: Optional[float] = None, strategy: str = "MANUAL") -> List[ManagedOrder]:
+        """Resting stop-loss/take-profit pair for an existing long position"""
+        return self._exits(symbol, "SELL", quantity, stop_loss, take_profit, strategy)
+
+    def cancel(self, order_id: int) -> bool:
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return False
+        order.status = CANCELLED
+        self.exchange.discard(order)
+        self._notify(order)
+        # Children of an unfilled entry can never activate
+        for child_id in self._children.pop(order_id, []):
+            self.cancel(child_id)
+        return True
+
+    def cancel_symbol(self, symbol: str, side: Optional[str] = None) -> int:
+        """Cancel every active order for a symbol, or only those on one side"""
+        order_ids = [order_id for order_id, order in self.orders.items()
+                     if order.symbol == symbol and (side is None or order.side == side)]
+        return sum(self.cancel(order_id) for order_id in order_ids)
+
+    def open_orders(self, symbol: Optional[str] = None) -> List[ManagedOrder]:
+        return [order for order in self.orders.values() if symbol is None or order.symbol == symbol]
+
+    def process_quotes(self, prices: Dict[str, float]) -> List[ManagedOrder]:
+        """Match every symbol's resting orders against its latest price"""
+        fills = []
+        for symbol, price in prices.items():
+            if price > 0:
+                fills.extend(self.process_bar(symbol, price, price, price))
+        return fills
+
+    def process_bar(self, symbol: str, open_price: float, high: float, low: float) -> List[ManagedOrder]:
+        """Match a symbol's resting orders against one bar (or a quote with open = high = low)"""
+        fills = []
+        for order, price in self.exchange.match(symbol, open_price, high, low):
+            self._fill(order, price)
+            fills.append(order)
+        return fills
+
+    def _exits(self, symbol: str, side: str, quantity: int, stop_loss: Optional[float],
+               take_profit: Optional[float], strategy: str, parent_id: Optional[int] = None) -> List[ManagedOrder]:
+        exits = []
+        if stop_loss is not None:
+            exits.append(self.submit(symbol, side, quantity, OrderType.STOP, stop_price=stop_loss, strategy=strategy,
+                                     reason=f"Stop loss at {stop_loss:.2f}", parent_id=parent_id))
+        if take_profit is not None:
+            exits.append(self.submit(symbol, side, quantity, OrderType.LIMIT, limit_price=take_profit,
+                                     strategy=strategy, reason=f"Take profit at {take_profit:.2f}",
+                                     parent_id=parent_id))
+        if len(exits) == 2:
+            exits[0].oco_id, exits[1].oco_id = exits[1].order_id, exits[0].order_id
+        return exits
+
+    def _fill(self, order: ManagedOrder, price: float):
+        self.orders.pop(order.order_id, None)
+        order.status = EXECUTED
+        order.fill_price = price
+        order.filled_at = datetime.now()
+
+        if order.oco_id is not None:
+            self.cancel(order.oco_id)
+        # An entry's exits start resting once it fills
+        for child_id in self._children.pop(order.order_id, []):
+            child = self.orders.get(child_id)
+            if child is not None and child.status == HELD:
+                child.status = PENDING
+                self.exchange.add(child)
+                self._notify(child)
+
+        self._notify(order)
+        if self.on_fill is not None:
+            self.on_fill(order)
+
+    def _notify(self, order: ManagedOrder):
+        if self.on_update is not None:
+            try:
+                self.on_update(order)
+            except Exception as e:
+                logger.error(f"Order update callback failed for order {order.order_id}: {e}")
@@ -0,0 +1,246 @@
+"""
+Risk Engine Module
+Incremental, position-keyed portfolio risk.
+
+Fills and price ticks update only the positions they touch and adjust the
+portfolio totals by the difference, so each update costs O(changed
+positions) instead of a scan over the trade history. Equity is tracked
+against its high-water mark for a true drawdown, and the daily loss limit
+is re-checked on every update. Historical-simulation VaR uses a cached
+matrix of daily returns and is a single matrix-vector product plus a
+quantile per call.
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from market_data import BarCache
+from trading_strategies import RiskManager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PositionRisk:
+    """Signed position in one symbol, marked to the latest price"""
+    symbol: str
+    quantity: int = 0  # negative when short
+    avg_price: float = 0.0
+    last_price: float = 0.0
+
+    @property
+    def market_value(self) -> float:
+        return self.quantity * self.last_price
+
+    @property
+    def unrealized_pnl(self) -> float:
+        return (self.last_price - self.avg_price) * self.quantity
+
+
+class ReturnsCache:
+    """Aligned daily returns of a set of symbols, refreshed at most every `ttl` seconds"""
+
+    def __init__(self, bar_cache: BarCache, period: str = "1y", ttl: float = 3600.0):
+        self.bar_cache = bar_cache
+        self.period = period
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._symbols: Tuple[str, ...] = ()
+        self._matrix = np.empty((0, 0))
+        self._fetched_at = 0.0
+
+    def matrix(self) -> Tuple[Tuple[str, ...], np.ndarray]:
+        """(symbols, returns with one row per day and one column per symbol)"""
+        return self._symbols, self._matrix
+
+    def refresh(self, symbols: Iterable[str], force: bool = False):
+        """Reload returns if the symbol set changed or the cache expired (blocking)"""
+        symbols = tuple(sorted(set(symbols)))
+        with self._lock:
+            if not force and symbols == self._symbols and time.monotonic() - self._fetched_at < self.ttl:
+                return
+            closes = {}
+            for symbol in symbols:
+                try:
+                    data = self.bar_cache.get_bars(symbol, period=self.period, interval="1d")
+                except Exception as e:
+                    logger.warning(f"No return history for {symbol}: {e}")
+                    continue
+                if not data.empty:
+                    closes[symbol] = data['Close']
+            if closes:
+                returns = pd.DataFrame(closes).pct_change().dropna(how='any')
+                matrix = returns.reindex(columns=list(symbols)).fillna(0.0).to_numpy(dtype=np.float64)
+            else:
+                matrix = np.zeros((0, len(symbols)))
+            # Swapped together so readers on other threads never see a mismatched pair
+            self._symbols, self._matrix = symbols, matrix
+            self._fetched_at = time.monotonic()
+
+
+class PortfolioRiskEngine:
+    """Running exposure, P&L, drawdown, daily loss and VaR of the open portfolio"""
+
+    def __init__(self, initial_equity: float = 0.0, daily_loss_limit: float = 500.0,
+                 returns: Optional[ReturnsCache] = None,
+                 on_limit: Optional[Callable[[float], None]] = None):
+        self.initial_equity = initial_equity
+        self.daily_loss_limit = daily_loss_limit
+        self.returns = returns
+        self.on_limit = on_limit
+        self.positions: Dict[str, PositionRisk] = {}
+
+        self.realized_pnl = 0.0
+        self.unrealized_pnl = 0.0
+        self.gross_exposure = 0.0
+        self.net_exposure = 0.0
+        self.day = datetime.now().date()
+        self.day_realized = 0.0
+
+        self.high_water_mark = initial_equity
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.limit_breached = False
+
+    @property
+    def equity(self) -> float:
+        return self.initial_equity + self.realized_pnl + self.unrealized_pnl
+
+    @property
+    def daily_pnl(self) -> float:
+        """Realized P&L of today's fills plus unrealized P&L of open positions"""
+        return self.day_realized + self.unrealized_pnl
+
+    def seed(self, positions: Dict[str, Dict], realized_pnl: float = 0.0, day_realized: float = 0.0):
+        """Start from restored positions ({symbol: {'quantity', 'buy_price'}}) and realized P&L"""
+        self.positions = {}
+        self.realized_pnl = realized_pnl
+        self.day_realized = day_realized
+        self.unrealized_pnl = self.gross_exposure = self.net_exposure = 0.0
+        for symbol, position in positions.items():
+            price = float(position['buy_price'])
+            self.positions[symbol] = PositionRisk(symbol, int(position['quantity']), price, price)
+            self._add(self.positions[symbol], 1)
+        self.high_water_mark = max(self.high_water_mark, self.equity)
+        self._evaluate()
+
+    def on_fill(self, symbol: str, side: str, quantity: int, price: float) -> float:
+        """Apply a fill; returns the P&L it realized"""
+        position = self.positions.get(symbol) or PositionRisk(symbol)
+        self._add(position, -1)
+
+        signed = quantity if side == "BUY" else -quantity
+        realized = 0.0
+        if position.quantity and (position.quantity > 0) != (signed > 0):
+            # Reducing or flipping: the closed part realizes against the average price
+            closed = min(abs(signed), abs(position.quantity))
+            realized = (price - position.avg_price) * closed * (1 if position.quantity > 0 else -1)
+        new_quantity = position.quantity + signed
+        if new_quantity == 0:
+            position.avg_price = 0.0
+        elif position.quantity == 0 or (position.quantity > 0) != (new_quantity > 0):
+            position.avg_price = price
+        elif abs(new_quantity) > abs(position.quantity):
+            position.avg_price = (position.avg_price * position.quantity + price * signed) / new_quantity
+        position.quantity = new_quantity
+        position.last_price = price
+
+        if position.quantity:
+            self.positions[symbol] = position
+            self._add(position, 1)
+        else:
+            self.positions.pop(symbol, None)
+        if not self.positions:
+            # Flat: reset the totals so float drift can't accumulate
+            self.unrealized_pnl = self.gross_exposure = self.net_exposure = 0.0
+
+        self._roll_day()
+        self.realized_pnl += realized
+        self.day_realized += realized
+        self._evaluate()
+        return realized
+
+    def on_price(self, symbol: str, price: float):
+        self.on_prices({symbol: price})
+
+    def on_prices(self, prices: Dict[str, float]):
+        """Mark positions to new prices; symbols without a position are ignored"""
+        for symbol, price in prices.items():
+            position = self.positions.get(symbol)
+            if position is None or price <= 0 or price == position.last_price:
+                continue
+            self._add(position, -1)
+            position.last_price = price
+            self._add(position, 1)
+        self._roll_day()
+        self._evaluate()
+
+    def exposure(self) -> Dict[str, float]:
+        """Market value per symbol"""
+        return {symbol: position.market_value for symbol, position in self.positions.items()}
+
+    def value_at_risk(self, confidence: float = 0.95) -> Dict[str, float]:
+        """One-day historical-simulation VaR and expected shortfall of the current positions"""
+        if self.returns is None:
+            return {'var': 0.0, 'expected_shortfall': 0.0, 'observations': 0}
+        symbols, matrix = self.returns.matrix()
+        if not len(matrix):
+            return {'var': 0.0, 'expected_shortfall': 0.0, 'observations': 0}
+
+        weights = np.array([self.positions[s].market_value if s in self.positions else 0.0 for s in symbols])
+        pnl = matrix @ weights
+        cutoff = np.quantile(pnl, 1 - confidence)
+        tail = pnl[pnl <= cutoff]
+        return {
+            'var': float(max(-cutoff, 0.0)),
+            'expected_shortfall': float(max(-tail.mean(), 0.0)) if len(tail) else 0.0,
+            'observations': int(len(pnl))
+        }
+
+    def metrics(self) -> Dict:
+        return {
+            'equity': self.equity,
+            'realized_pnl': self.realized_pnl,
+            'unrealized_pnl': self.unrealized_pnl,
+            'daily_pnl': self.daily_pnl,
+            'gross_exposure': self.gross_exposure,
+            'net_exposure': self.net_exposure,
+            'high_water_mark': self.high_water_mark,
+            'drawdown': self.drawdown,
+            'drawdown_percent': (self.drawdown / self.high_water_mark * 100) if self.high_water_mark > 0 else 0.0,
+            'max_drawdown': self.max_drawdown,
+            'daily_limit_breached': self.limit_breached,
+            'positions': len(self.positions)
+        }
+
+    def _add(self, position: PositionRisk, sign: int):
+        """Add (+1) or remove (-1) a position's contribution to the totals"""
+        value = position.market_value
+        self.unrealized_pnl += sign * position.unrealized_pnl
+        self.gross_exposure += sign * abs(value)
+        self.net_exposure += sign * value
+
+    def _roll_day(self):
+        today = datetime.now().date()
+        if today != self.day:
+            self.day = today
+            self.day_realized = 0.0
+
+    def _evaluate(self):
+        equity = self.equity
+        if equity > self.high_water_mark:
+            self.high_water_mark = equity
+        self.drawdown = self.high_water_mark - equity
+        self.max_drawdown = max(self.max_drawdown, self.drawdown)
+
+        breached = RiskManager.check_daily_loss_limit(self.daily_pnl, self.daily_loss_limit)
+        if breached and not self.limit_breached and self.on_limit is not None:
+            self.on_limit(self.daily_pnl)
+        self.limit_breached = breached
@@ -0,0 +1,425 @@
+"""
+Robustness Module
+Walk-forward analysis and Monte Carlo trade resampling for backtested strategies.
+
+Walk-forward analysis splits the history into consecutive windows, picks
+the best parameters on each training window and backtests them on the
+window that follows, next to the strategy's default parameters. Every
+backtest of every fold runs in a process pool over bars that are copied
+once into shared memory (see optimizer.share_bars), so a task only pickles
+its parameters and window bounds. Test windows are preceded by warm-up
+bars that prime the indicators without trading.
+
+Monte Carlo resampling reorders (or bootstraps) a backtest's per-trade
+returns thousands of times to estimate the distribution of drawdowns and
+final returns the same edge could have produced. Each symbol is backtested
+on its own account, so trades are taken in exit-time order as returns on
+the combined equity of all the symbols' accounts; compounded, a fold's
+trades give exactly its (symbol-averaged) total return.
+
+    python robustness.py AAPL MSFT --strategy MEAN_REVERSION --interval 15m --period 60d
+"""
+
+import os
+import random
+import logging
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from backtester import BacktestConfig, Backtester
+from optimizer import MINIMIZE, SearchSpace, SharedBars, StrategyOptimizer, aggregate_metrics, share_bars
+from trading_strategies import STRATEGY_PARAMS
+
+logger = logging.getLogger(__name__)
+
+# Indicator warm-up before each window: enough for the 200-bar SMA
+DEFAULT_WARMUP = 200
+DEFAULT_SIMULATIONS = 10000
+# Cells per Monte Carlo batch (simulations x trades), to bound memory
+MC_BATCH_CELLS = 2_000_000
+
+# Parameters searched when no space is given, around each strategy's defaults
+DEFAULT_SPACES: Dict[str, SearchSpace] = {
+    "SWING": {
+        'rsi_oversold': [25, 30, 35],
+        'rsi_overbought': [65, 70, 75],
+        'resistance_band': [0.01, 0.02, 0.03],
+        'entry_strength': [0.5, 0.6, 0.7],
+        'reward_risk': [1.5, 2.0, 3.0],
+    },
+    "MEAN_REVERSION": {
+        'bb_low': [0.05, 0.1, 0.2],
+        'bb_high': [0.8, 0.9, 0.95],
+        'rsi_oversold': [25, 30, 35],
+        'rsi_overbought': [65, 70, 75],
+        'entry_strength': [0.5, 0.6, 0.7],
+    },
+    "BREAKOUT": {
+        'atr_multiplier': [0.25, 0.5, 1.0],
+        'volume_surge': [1.5, 2.0, 3.0],
+        'entry_strength': [0.6, 0.7, 0.8],
+        'reward_risk': [1.5, 2.0, 3.0],
+    },
+}
+
+Window = Tuple[int, int, int]  # (first warm-up bar, first traded bar, end) as bar positions
+
+
+def walk_forward_windows(bars: int, train_bars: int, test_bars: int, step: Optional[int] = None,
+                         warmup: int = DEFAULT_WARMUP, anchored: bool = False) -> List[Tuple[Window, Window]]:
+    """
+    (train, test) windows over `bars` bars: train on [start, start + train_bars),
+    test on the test_bars after it, then move on by `step` (default test_bars).
+    Anchored training windows always start at the first bar.
+    """
+    step = step or test_bars
+    folds = []
+    start = warmup
+    while start + train_bars + test_bars <= bars:
+        train_start = warmup if anchored else start
+        train_end = start + train_bars
+        folds.append(((max(0, train_start - warmup), train_start, train_end),
+                      (train_end - warmup, train_end, train_end + test_bars)))
+        start += step
+    return folds
+
+
+def candidates(space: SearchSpace, n_iter: Optional[int] = None, seed: Optional[int] = None) -> List[Dict]:
+    """Every combination of a space of choices, or n_iter random draws"""
+    if n_iter is None:
+        for key, values in space.items():
+            if not isinstance(values, list):
+                raise ValueError(f"Give n_iter to sample the range of {key}")
+        keys = list(space)
+        return [dict(zip(keys, combo)) for combo in itertools.product(*space.values())]
+    rng = random.Random(seed)
+    return [StrategyOptimizer._sample(space, rng) for _ in range(n_iter)]
+
+
+# Per-process state of pool workers, set up once by _init_worker
+_worker_blocks: List[shared_memory.SharedMemory] = []
+_worker_bars: Dict[str, pd.DataFrame] = {}
+_worker_backtester: Optional[Backtester] = None
+_worker_strategy = ""
+
+
+def _init_worker(handles: List[SharedBars], strategy: str, config: BacktestConfig):
+    global _worker_backtester, _worker_strategy
+    for handle in handles:
+        block = shared_memory.SharedMemory(name=handle.name)
+        _worker_blocks.append(block)
+        _worker_bars[handle.symbol] = handle.frame(block.buf)
+    _worker_backtester = Backtester(config)
+    _worker_strategy = strategy
+
+
+def _evaluate(params: Dict, window: Window, with_trades: bool = False) -> Tuple[Dict, np.ndarray]:
+    """Backtest one parameter set over a window of every shared symbol"""
+    lo, start, end = window
+    results = [_worker_backtester.run(data.iloc[lo:end], _worker_strategy, symbol, params, warmup=start - lo)
+               for symbol, data in _worker_bars.items()]
+    initial = _worker_backtester.config.initial_balance
+    trades = trade_returns(results, initial) if with_trades else np.empty(0)
+    return aggregate_metrics(results), trades
+
+
+def trade_returns(results: Sequence, initial_balance: float) -> np.ndarray:
+    """
+    Trades of every result in exit-time order, each one's P&L as a fraction
+    of the combined equity of all the results' accounts (initial_balance
+    each) before it closed. With one result that is the account's equity.
+    """
+    trades = sorted((trade for result in results for trade in result.trades), key=lambda trade: trade.exit_time)
+    pnl = np.array([trade.pnl for trade in trades], dtype=float)
+    equity = len(results) * initial_balance + np.concatenate([[0.0], np.cumsum(pnl)[:-1]])
+    return pnl / equity
+
+
+@dataclass
+class WalkForwardFold:
+    """Best training parameters of one fold and how they, and the defaults, did out of sample"""
+    fold: int
+    train: Tuple[object, object]
+    test: Tuple[object, object]
+    params: Dict
+    train_metrics: Dict
+    test_metrics: Dict
+    default_metrics: Dict
+
+
+@dataclass
+class WalkForwardResult:
+    strategy: str
+    objective: str
+    folds: List[WalkForwardFold]
+    # Per-trade returns of every test window, for monte_carlo()
+    test_trades: np.ndarray = field(default_factory=lambda: np.empty(0))
+    default_trades: np.ndarray = field(default_factory=lambda: np.empty(0))
+
+    def table(self) -> pd.DataFrame:
+        """One row per fold: windows, chosen parameters, in- and out-of-sample objective"""
+        rows = []
+        for fold in self.folds:
+            rows.append({
+                'fold': fold.fold,
+                'train_start': fold.train[0], 'test_start': fold.test[0], 'test_end': fold.test[1],
+                **fold.params,
+                f'train_{self.objective}': fold.train_metrics[self.objective],
+                f'test_{self.objective}': fold.test_metrics[self.objective],
+                f'default_{self.objective}': fold.default_metrics[self.objective],
+                'test_return': fold.test_metrics['total_return'],
+                'default_return': fold.default_metrics['total_return'],
+                'test_trades': fold.test_metrics['trades'],
+            })
+        return pd.DataFrame(rows)
+
+    def summary(self) -> Dict:
+        """Out-of-sample results of the re-optimized and the default parameters across folds"""
+        if not self.folds:
+            return {}
+        objective = self.objective
+        train = np.array([fold.train_metrics[objective] for fold in self.folds], dtype=float)
+        test = np.array([fold.test_metrics[objective] for fold in self.folds], dtype=float)
+        default = np.array([fold.default_metrics[objective] for fold in self.folds], dtype=float)
+        better = test < default if objective in MINIMIZE else test > default
+        return {
+            'folds': len(self.folds),
+            f'train_{objective}': float(train.mean()),
+            f'test_{objective}': float(test.mean()),
+            f'default_{objective}': float(default.mean()),
+            # Share of a positive in-sample result kept out of sample; well below 1 suggests overfitting
+            'efficiency': float(test.mean() / train.mean()) if train.mean() > 0 else float('nan'),
+            'optimized_beats_default': float(better.mean()),
+            'test_return': _compounded(fold.test_metrics['total_return'] for fold in self.folds),
+            'default_return': _compounded(fold.default_metrics['total_return'] for fold in self.folds),
+            'test_max_drawdown': max(fold.test_metrics['max_drawdown'] for fold in self.folds),
+            'default_max_drawdown': max(fold.default_metrics['max_drawdown'] for fold in self.folds),
+            'profitable_test_folds': float(np.mean([fold.test_metrics['total_return'] > 0 for fold in self.folds])),
+            'profitable_default_folds': float(np.mean([fold.default_metrics['total_return'] > 0
+                                                       for fold in self.folds])),
+        }
+
+
+def _compounded(returns) -> float:
+    return float(np.prod([1 + r for r in returns]) - 1)
+
+
+class WalkForwardAnalysis:
+    """Rolling (or anchored) optimize-then-test runs of one strategy, in parallel"""
+
+    def __init__(self, strategy: str, bars: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
+                 config: Optional[BacktestConfig] = None, objective: str = "sharpe",
+                 max_workers: Optional[int] = None):
+        self.strategy = strategy
+        self.bars = bars if isinstance(bars, dict) else {"": bars}
+        self.config = config or BacktestConfig()
+        self.objective = objective
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def run(self, train_bars: int, test_bars: int, space: Optional[SearchSpace] = None,
+            n_iter: Optional[int] = None, step: Optional[int] = None, warmup: int = DEFAULT_WARMUP,
+            anchored: bool = False, seed: Optional[int] = None) -> WalkForwardResult:
+        """
+        Optimize over `space` (grid, or n_iter random draws) on each training
+        window and test the winner on the next window. Windows are bar
+        positions, so multiple symbols should cover the same dates.
+        """
+        space = space or DEFAULT_SPACES.get(self.strategy, {})
+        pool_candidates = candidates(space, n_iter, seed) if space else [{}]
+        rows = min(len(data) for data in self.bars.values())
+        windows = walk_forward_windows(rows, train_bars, test_bars, step, warmup, anchored)
+        if not windows:
+            raise ValueError(f"{rows} bars is too short for {train_bars} training, {test_bars} test "
+                             f"and {warmup} warm-up bars")
+        logger.info(f"Walk-forward {self.strategy}: {len(windows)} folds x {len(pool_candidates)} candidates")
+
+        with self._pool() as pool:
+            # Every fold's training runs are independent, so they all go in at once
+            training = {(index, position): pool.submit(_evaluate, params, train)
+                        for index, (train, _) in enumerate(windows)
+                        for position, params in enumerate(pool_candidates)}
+            best = []
+            for index in range(len(windows)):
+                scored = [(training[(index, position)].result()[0], params)
+                          for position, params in enumerate(pool_candidates)]
+                best.append(self._best(scored))
+
+            testing = [(pool.submit(_evaluate, params, test, True), pool.submit(_evaluate, {}, test, True))
+                       for (_, test), (_, params) in zip(windows, best)]
+            folds, test_trades, default_trades = [], [], []
+            index_of = next(iter(self.bars.values())).index
+            for fold, ((train, test), (train_metrics, params), (tested, default)) in enumerate(
+                    zip(windows, best, testing)):
+                test_metrics, trades = tested.result()
+                default_metrics, trades_default = default.result()
+                test_trades.append(trades)
+                default_trades.append(trades_default)
+                folds.append(WalkForwardFold(
+                    fold=fold,
+                    train=(index_of[train[1]], index_of[train[2] - 1]),
+                    test=(index_of[test[1]], index_of[test[2] - 1]),
+                    params=params,
+                    train_metrics=train_metrics,
+                    test_metrics=test_metrics,
+                    default_metrics=default_metrics
+                ))
+        return WalkForwardResult(self.strategy, self.objective, folds,
+                                 np.concatenate(test_trades) if test_trades else np.empty(0),
+                                 np.concatenate(default_trades) if default_trades else np.empty(0))
+
+    def _best(self, scored: List[Tuple[Dict, Dict]]) -> Tuple[Dict, Dict]:
+        def rank(item):
+            value = item[0][self.objective]
+            value = value if np.isfinite(value) else (np.inf if self.objective in MINIMIZE else -np.inf)
+            return value if self.objective in MINIMIZE else -value
+        return min(scored, key=rank)
+
+    @contextmanager
+    def _pool(self) -> Iterator[ProcessPoolExecutor]:
+        handles, blocks = share_bars(self.bars)
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                     initargs=(handles, self.strategy, self.config)) as pool:
+                yield pool
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+
+@dataclass
+class MonteCarloResult:
+    """Distribution of outcomes over resampled trade sequences (fractions, e.g. 0.12 = 12%)"""
+    method: str
+    simulations: int
+    trades: int
+    final_returns: np.ndarray
+    max_drawdowns: np.ndarray
+    historical_return: float
+    historical_drawdown: float
+
+    def percentile(self, values: np.ndarray, q: float) -> float:
+        return float(np.percentile(values, q)) if len(values) else 0.0
+
+    def probability(self, drawdown: float) -> float:
+        """Chance of a drawdown at least this deep"""
+        return float((self.max_drawdowns >= drawdown).mean()) if len(self.max_drawdowns) else 0.0
+
+    def summary(self, ruin_drawdown: float = 0.25) -> Dict:
+        return {
+            'method': self.method,
+            'simulations': self.simulations,
+            'trades': self.trades,
+            'historical_return': self.historical_return,
+            'return_p5': self.percentile(self.final_returns, 5),
+            'return_p50': self.percentile(self.final_returns, 50),
+            'return_p95': self.percentile(self.final_returns, 95),
+            'probability_of_loss': float((self.final_returns < 0).mean()) if len(self.final_returns) else 0.0,
+            'historical_drawdown': self.historical_drawdown,
+            'drawdown_p50': self.percentile(self.max_drawdowns, 50),
+            'drawdown_p95': self.percentile(self.max_drawdowns, 95),
+            'drawdown_p99': self.percentile(self.max_drawdowns, 99),
+            # How unusual the backtest's own drawdown is among the resampled ones
+            'historical_drawdown_rank': float((self.max_drawdowns <= self.historical_drawdown).mean())
+            if len(self.max_drawdowns) else 0.0,
+            f'probability_drawdown_{ruin_drawdown:g}': self.probability(ruin_drawdown),
+        }
+
+
+def monte_carlo(returns, simulations: int = DEFAULT_SIMULATIONS, method: str = "shuffle",
+                seed: Optional[int] = None) -> MonteCarloResult:
+    """
+    Resample per-trade returns (see trade_returns) into `simulations` equity
+    paths. "shuffle" reorders the trades, which keeps the final return and
+    varies only the path; "bootstrap" draws trades with replacement, which
+    varies both.
+    """
+    if method not in ("shuffle", "bootstrap"):
+        raise ValueError(f"Unknown Monte Carlo method: {method}")
+    returns = np.asarray(returns, dtype=float)
+    historical_return, historical_drawdown = _path_stats(returns[None, :])
+    if not len(returns):
+        return MonteCarloResult(method, 0, 0, np.empty(0), np.empty(0), 0.0, 0.0)
+
+    rng = np.random.default_rng(seed)
+    batch = max(1, MC_BATCH_CELLS // len(returns))
+    finals, drawdowns = [], []
+    for done in range(0, simulations, batch):
+        size = min(batch, simulations - done)
+        if method == "shuffle":
+            paths = rng.permuted(np.broadcast_to(returns, (size, len(returns))), axis=1)
+        else:
+            paths = rng.choice(returns, size=(size, len(returns)), replace=True)
+        final, drawdown = _path_stats(paths)
+        finals.append(final)
+        drawdowns.append(drawdown)
+    return MonteCarloResult(method, simulations, len(returns), np.concatenate(finals), np.concatenate(drawdowns),
+                            float(historical_return[0]), float(historical_drawdown[0]))
+
+
+def _path_stats(paths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Final return and maximum drawdown of each row of compounded trade returns"""
+    if not paths.shape[1]:
+        return np.zeros(len(paths)), np.zeros(len(paths))
+    equity = np.cumprod(1 + paths, axis=1)
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)  # the starting balance is a peak too
+    return equity[:, -1] - 1, ((peaks - equity) / peaks).max(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward and Monte Carlo robustness checks of a strategy")
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--strategy', default="MEAN_REVERSION", choices=sorted(STRATEGY_PARAMS))
+    parser.add_argument('--interval', default="15m")
+    parser.add_argument('--period', default="60d")
+    parser.add_argument('--store', help="Read bars from this bar store directory instead of yfinance")
+    parser.add_argument('--train', type=int, default=1000, help="Bars per training window")
+    parser.add_argument('--test', type=int, default=250, help="Bars per test window")
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+    parser.add_argument('--anchored', action='store_true', help="Grow the training window instead of rolling it")
+    parser.add_argument('--n-iter', type=int, help="Random draws per fold instead of the full grid")
+    parser.add_argument('--objective', default="sharpe")
+    parser.add_argument('--simulations', type=int, default=DEFAULT_SIMULATIONS)
+    parser.add_argument('--method', default="shuffle", choices=["shuffle", "bootstrap"])
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.store:
+        from bar_store import BarStore
+        store = BarStore(args.store)
+        bars = {symbol: store.fetcher(symbol, args.interval, period=args.period) for symbol in args.symbols}
+    else:
+        from market_data import BarCache
+        cache = BarCache()
+        bars = {symbol: cache.get_bars(symbol, period=args.period, interval=args.interval)
+                for symbol in args.symbols}
+
+    analysis = WalkForwardAnalysis(args.strategy, bars, BacktestConfig(interval=args.interval),
+                                   objective=args.objective, max_workers=args.workers)
+    result = analysis.run(args.train, args.test, n_iter=args.n_iter, warmup=args.warmup,
+                          anchored=args.anchored, seed=args.seed)
+
+    pd.set_option('display.width', 200)
+    print(result.table().to_string(index=False))
+    print()
+    for key, value in result.summary().items():
+        print(f"{key:28} {value:.4f}" if isinstance(value, float) else f"{key:28} {value}")
+    for label, returns in (("re-optimized", result.test_trades), ("defaults", result.default_trades)):
+        print(f"\nMonte Carlo, {label} parameters (out-of-sample trades):")
+        summary = monte_carlo(returns, args.simulations, args.method, args.seed).summary()
+        for key, value in summary.items():
+            print(f"{key:28} {value:.4f}" if isinstance(value, float) else f"{key:28} {value}")
+
+
+if __name__ == "__main__":
+    main()
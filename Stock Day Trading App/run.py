@@ -7,29 +7,27 @@ Simple script to launch the main application.
 import sys
 import os
 import subprocess
+import importlib.util
 
 def check_dependencies():
-    """Check if required dependencies are installed"""
-    required_packages = [
-        'customtkinter',
-        'pyautogui',
-        'yfinance',
-        'pandas',
-        'numpy',
-        'matplotlib',
-        'ta',
-        'keyboard',
-        'mouse',
-        'python-dotenv'
-    ]
+    """Check if required dependencies are installed (without importing them)"""
+    # pip package name -> module it installs
+    required_packages = {
+        'customtkinter': 'customtkinter',
+        'pyautogui': 'pyautogui',
+        'yfinance': 'yfinance',
+        'pandas': 'pandas',
+        'numpy': 'numpy',
+        'matplotlib': 'matplotlib',
+        'ta': 'ta',
+        'keyboard': 'keyboard',
+        'mouse': 'mouse',
+        'python-dotenv': 'dotenv'
+    }
     
-    missing_packages = []
-    
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            missing_packages.append(package)
+    # find_spec only locates the module; the app imports the heavy ones later, in the background
+    missing_packages = [package for package, module in required_packages.items()
+                        if importlib.util.find_spec(module) is None]
     
     if missing_packages:
         print("Missing required packages:")
@@ -0,0 +1,555 @@
+"""
+Strategy DSL Module
+Declarative rule-based strategies (JSON or YAML) compiled to vectorized pandas expressions.
+
+A strategy is a list of scored conditions, an entry threshold and
+stop/target expressions, in the style of the hand-coded StrategyScoring
+rules:
+
+    {
+      "name": "TREND_PULLBACK",
+      "interval": "1h", "period": "30d", "min_bars": 100,
+      "params": {"oversold": 30},
+      "rules": [
+        {"when": "close > sma(20) > sma(50)", "score": 0.4, "reason": "Uptrend"},
+        {"first": [
+          {"when": "rsi(14) < oversold", "score": 0.3, "reason": "Oversold RSI"},
+          {"when": "rsi(14) > 70", "score": -0.3, "reason": "Overbought RSI"}
+        ]}
+      ],
+      "entry_strength": 0.6,
+      "buy": {"stop_loss": "sma(50)", "take_profit": "close + (close - sma(50)) * 2"},
+      "sell": {"stop_loss": "sma(50)", "take_profit": "close - (sma(50) - close) * 2"}
+    }
+
+Rules in a "first" group are exclusive (the first matching one scores,
+like an if/elif chain). Expressions use Python syntax and are parsed with
+the ast module into nodes keyed by their structure, so sma(20) is the
+same node in every rule and strategy that uses it. A RuleBook evaluates
+its strategies over a whole bar history at once, computing each distinct
+node a single time.
+"""
+
+import os
+import ast
+import glob
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import ta
+
+from trading_strategies import Signal, TechnicalIndicators
+
+try:
+    import yaml
+except ImportError:  # YAML strategy files are optional; JSON always works
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_DIR = "strategies"
+RULE_FILE_PATTERNS = ("*.json", "*.yaml", "*.yml")
+
+FIELDS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+# Indicator name -> (default arguments, component index for multi-output indicators)
+INDICATORS = {
+    'sma': ((20,), None),
+    'ema': ((20,), None),
+    'rsi': ((14,), None),
+    'atr': ((14,), None),
+    'macd': ((12, 26, 9), 0),
+    'macd_signal': ((12, 26, 9), 1),
+    'macd_diff': ((12, 26, 9), 2),
+    'bb_upper': ((20, 2), 0),
+    'bb_lower': ((20, 2), 1),
+    'bb_middle': ((20, 2), 2),
+    'stoch_k': ((14, 3), 0),
+    'stoch_d': ((14, 3), 1),
+}
+# Multi-output indicators computed once for all of their components
+INDICATOR_FAMILIES = {
+    'macd': 'macd', 'macd_signal': 'macd', 'macd_diff': 'macd',
+    'bb_upper': 'bollinger', 'bb_lower': 'bollinger', 'bb_middle': 'bollinger',
+    'stoch_k': 'stochastic', 'stoch_d': 'stochastic',
+}
+# Functions of expressions: name -> number of expression arguments before the window/shift
+SERIES_FUNCTIONS = {
+    'prev': 1,  # prev(x, n=1): value n bars ago
+    'highest': 1,  # highest(x, n): rolling max
+    'lowest': 1,  # lowest(x, n): rolling min
+    'mean': 1,  # mean(x, n): rolling mean
+    'abs': 1,
+    'min': 2,  # elementwise
+    'max': 2,
+    'crosses_above': 2,  # a > b now and a <= b on the previous bar
+    'crosses_below': 2,
+}
+
+BINARY_OPS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/'}
+COMPARE_OPS = {ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=', ast.Eq: '==', ast.NotEq: '!='}
+COMMUTATIVE = {'+', '*', '==', '!=', 'and', 'or', 'min', 'max'}
+
+Node = Tuple  # structural key, e.g. ('sma', 20) or ('cmp', '<', ('field', 'Close'), ('sma', 50))
+
+
+def compile_expression(text: str, params: Optional[Dict[str, float]] = None) -> Node:
+    """Parse an expression into its node key; unknown names must be params"""
+    try:
+        tree = ast.parse(str(text), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression {text!r}: {e.msg}") from None
+    return _Compiler(params or {}, text).visit(tree.body)
+
+
+class _Compiler(ast.NodeVisitor):
+    def __init__(self, params: Dict[str, float], text: str):
+        self.params = params
+        self.text = text
+
+    def generic_visit(self, node):
+        raise ValueError(f"Unsupported syntax {type(node).__name__} in {self.text!r}")
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numbers are allowed as constants in {self.text!r}")
+        return ('const', float(node.value))
+
+    def visit_Name(self, node):
+        if node.id in FIELDS:
+            return ('field', FIELDS[node.id])
+        if node.id in self.params:
+            return ('const', float(self.params[node.id]))
+        raise ValueError(f"Unknown name {node.id!r} in {self.text!r}")
+
+    def visit_UnaryOp(self, node):
+        operand = self.visit(node.operand)
+        if isinstance(node.op, ast.USub):
+            return _fold(('neg', operand))
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if isinstance(node.op, ast.Not):
+            return ('not', operand)
+        return self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        op = BINARY_OPS.get(type(node.op))
+        if op is None:
+            return self.generic_visit(node)
+        left, right = self.visit(node.left), self.visit(node.right)
+        if op == '/' and right == ('const', 0.0):
+            raise ValueError(f"Division by zero in {self.text!r}")
+        return _fold(_ordered(op, left, right))
+
+    def visit_Compare(self, node):
+        # a < b < c means a < b and b < c
+        operands = [self.visit(node.left)] + [self.visit(c) for c in node.comparators]
+        terms = []
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            symbol = COMPARE_OPS.get(type(op))
+            if symbol is None:
+                return self.generic_visit(node)
+            terms.append(_ordered(symbol, left, right, kind='cmp'))
+        return _chain('and', terms)
+
+    def visit_BoolOp(self, node):
+        return _chain('and' if isinstance(node.op, ast.And) else 'or', [self.visit(v) for v in node.values])
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            raise ValueError(f"Only plain calls of known functions are allowed in {self.text!r}")
+        name = node.func.id
+        if name in INDICATORS:
+            defaults, component = INDICATORS[name]
+            if len(node.args) > len(defaults):
+                raise ValueError(f"{name}() takes at most {len(defaults)} arguments in {self.text!r}")
+            args = [self._number(arg) for arg in node.args] + list(defaults[len(node.args):])
+            if component is None:
+                return (name, *args)
+            return ('item', (INDICATOR_FAMILIES[name], *args), component)
+        if name in SERIES_FUNCTIONS:
+            series_args = SERIES_FUNCTIONS[name]
+            if name == 'prev' and len(node.args) == 1:
+                return ('prev', self.visit(node.args[0]), 1)
+            if name == 'abs' and len(node.args) == 1:
+                return ('abs', self.visit(node.args[0]))
+            if series_args == 2:
+                if len(node.args) != 2:
+                    raise ValueError(f"{name}() takes 2 arguments in {self.text!r}")
+                left, right = self.visit(node.args[0]), self.visit(node.args[1])
+                return _ordered(name, left, right, kind=name if name in ('min', 'max') else 'cross')
+            if len(node.args) != 2:
+                raise ValueError(f"{name}() takes an expression and a window in {self.text!r}")
+            return (name, self.visit(node.args[0]), int(self._number(node.args[1])))
+        raise ValueError(f"Unknown function {name}() in {self.text!r}")
+
+    def _number(self, node) -> float:
+        """Indicator windows must be constants (numbers or params)"""
+        key = self.visit(node)
+        if key[0] != 'const':
+            raise ValueError(f"Indicator arguments must be numbers in {self.text!r}")
+        value = key[1]
+        return int(value) if float(value).is_integer() else value
+
+
+def _ordered(op: str, left: Node, right: Node, kind: str = 'op') -> Node:
+    # Commutative operands in a fixed order, so a + b and b + a are one node
+    if op in COMMUTATIVE and repr(right) < repr(left):
+        left, right = right, left
+    if kind == 'op':
+        return ('op', op, left, right)
+    if kind == 'cmp':
+        return ('cmp', op, left, right)
+    if kind == 'cross':
+        return (op, left, right)
+    return (kind, left, right)
+
+
+def _chain(op: str, terms: List[Node]) -> Node:
+    if len(terms) == 1:
+        return terms[0]
+    return (op, *sorted(set(terms), key=repr))
+
+
+def _fold(node: Node) -> Node:
+    """Evaluate operations on constants at compile time"""
+    if node[0] == 'neg' and node[1][0] == 'const':
+        return ('const', -node[1][1])
+    if node[0] == 'op' and node[2][0] == 'const' and node[3][0] == 'const':
+        left, right = node[2][1], node[3][1]
+        return ('const', {'+': left + right, '-': left - right, '*': left * right, '/': left / right}[node[1]])
+    return node
+
+
+@dataclass
+class Rule:
+    """A scored condition; a rule with `first` set is an exclusive group of rules instead"""
+    when: Optional[Node] = None
+    score: float = 0.0
+    reason: str = ""
+    first: List["Rule"] = field(default_factory=list)
+
+
+@dataclass
+class RuleStrategy:
+    """A compiled declarative strategy"""
+    name: str
+    rules: List[Rule]
+    entry_strength: float = 0.6
+    min_bars: int = 0
+    interval: str = "1h"
+    period: str = "30d"
+    buy: Dict[str, Node] = field(default_factory=dict)  # 'stop_loss' / 'take_profit' -> expression
+    sell: Dict[str, Node] = field(default_factory=dict)
+    description: str = ""
+
+    def nodes(self) -> List[Node]:
+        """Root expressions of the strategy (conditions, stops and targets)"""
+        roots = []
+        for rule in self.rules:
+            roots.extend(r.when for r in (rule.first or [rule]))
+        roots.extend(self.buy.values())
+        roots.extend(self.sell.values())
+        return roots
+
+
+def compile_strategy(spec: Dict) -> RuleStrategy:
+    """Validate and compile one strategy definition"""
+    if not isinstance(spec, dict) or not spec.get('name'):
+        raise ValueError("A rule strategy needs a name")
+    name = str(spec['name']).upper()
+    params = dict(spec.get('params') or {})
+    for key, value in params.items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"{name}: param {key!r} must be a number")
+
+    def number(value, what):
+        if isinstance(value, str):
+            if value not in params:
+                raise ValueError(f"{name}: {what} {value!r} is not a number or param")
+            return float(params[value])
+        return float(value)
+
+    def expression(text, where) -> Node:
+        try:
+            return compile_expression(text, params)
+        except ValueError as e:
+            raise ValueError(f"{name}: {where}: {e}") from None
+
+    def rule(item, position) -> Rule:
+        if 'first' in item:
+            return Rule(first=[rule(sub, f"{position}.{i}") for i, sub in enumerate(item['first'], 1)])
+        if 'when' not in item or 'score' not in item:
+            raise ValueError(f"{name}: every rule needs 'when' and 'score'")
+        return Rule(expression(item['when'], f"rule {position}"), number(item['score'], 'score'),
+                    str(item.get('reason', item['when'])))
+
+    rules = [rule(item, str(i)) for i, item in enumerate(spec.get('rules') or [], 1)]
+    if not rules:
+        raise ValueError(f"{name}: no rules")
+    exits = {}
+    for side in ('buy', 'sell'):
+        exits[side] = {key: expression(text, f"{side} {key}")
+                       for key, text in (spec.get(side) or {}).items() if text is not None}
+        unknown = set(exits[side]) - {'stop_loss', 'take_profit'}
+        if unknown:
+            raise ValueError(f"{name}: unknown {side} keys {sorted(unknown)}")
+
+    return RuleStrategy(
+        name=name,
+        rules=rules,
+        entry_strength=number(spec.get('entry_strength', 0.6), 'entry_strength'),
+        min_bars=int(spec.get('min_bars', 0)),
+        interval=spec.get('interval', '1h'),
+        period=spec.get('period', '30d'),
+        buy=exits['buy'],
+        sell=exits['sell'],
+        description=spec.get('description', '')
+    )
+
+
+def load_strategies(path: str) -> List[RuleStrategy]:
+    """Compile the strategies in a JSON or YAML file (one strategy, a list, or {"strategies": [...]})"""
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ValueError(f"PyYAML is needed to read {path}; install it or use JSON")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if isinstance(data, dict) and 'strategies' in data:
+        data = data['strategies']
+    return [compile_strategy(spec) for spec in (data if isinstance(data, list) else [data])]
+
+
+def load_rule_book(directory: str = DEFAULT_RULES_DIR) -> "RuleBook":
+    """Every strategy file in a directory; files that fail to compile are logged and skipped"""
+    book = RuleBook()
+    paths = sorted(path for pattern in RULE_FILE_PATTERNS for path in glob.glob(os.path.join(directory, pattern)))
+    for path in paths:
+        try:
+            for strategy in load_strategies(path):
+                book.add(strategy)
+        except Exception as e:
+            logger.error(f"Skipping rule strategies in {path}: {e}")
+    if book.strategies:
+        logger.info(f"Loaded {len(book.strategies)} rule strategies ({book.node_count()} distinct expressions)")
+    return book
+
+
+class RuleBook:
+    """Compiled rule strategies evaluated together over shared expression nodes"""
+
+    def __init__(self, strategies: Iterable[RuleStrategy] = ()):
+        self.strategies: Dict[str, RuleStrategy] = {}
+        for strategy in strategies:
+            self.add(strategy)
+
+    def add(self, strategy: RuleStrategy):
+        if strategy.name in self.strategies:
+            raise ValueError(f"Duplicate rule strategy name: {strategy.name}")
+        self.strategies[strategy.name] = strategy
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.strategies)
+
+    def __contains__(self, name) -> bool:
+        return name in self.strategies
+
+    def __getitem__(self, name: str) -> RuleStrategy:
+        return self.strategies[name]
+
+    def node_count(self) -> int:
+        """Distinct expression nodes across every loaded strategy"""
+        seen = set()
+        stack = [node for strategy in self.strategies.values() for node in strategy.nodes()]
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            stack.extend(child for child in node[1:] if isinstance(child, tuple))
+        return len(seen)
+
+    def evaluate(self, data: pd.DataFrame, names: Optional[Iterable[str]] = None,
+                 cache: Optional[Dict[Node, object]] = None) -> Dict[str, pd.DataFrame]:
+        """
+        Strength, action, stop loss and take profit on every bar of an OHLCV
+        history, per strategy. Nodes shared between strategies are computed once.
+        """
+        evaluator = _Evaluator(data, cache)
+        results = {}
+        for name in (self.names if names is None else names):
+            strategy = self.strategies[name]
+            strength = np.zeros(len(data))
+            for rule in strategy.rules:
+                strength += self._scores(evaluator, rule)
+            if strategy.min_bars:
+                strength[:strategy.min_bars - 1] = 0.0
+
+            buy = strength >= strategy.entry_strength
+            sell = strength <= -strategy.entry_strength
+            frame = pd.DataFrame({
+                'strength': strength,
+                'action': np.select([buy, sell], ["BUY", "SELL"], "HOLD"),
+            }, index=data.index)
+            for key in ('stop_loss', 'take_profit'):
+                values = np.full(len(data), np.nan)
+                for side, mask in (('buy', buy), ('sell', sell)):
+                    expression = getattr(strategy, side).get(key)
+                    if expression is not None:
+                        values = np.where(mask, evaluator.values(expression), values)
+                frame[key] = values
+            results[name] = frame
+        return results
+
+    def signal(self, name: str, symbol: str, data: pd.DataFrame, timestamp: Optional[datetime] = None,
+               cache: Optional[Dict[Node, object]] = None) -> Signal:
+        """Signal for the latest bar, with the reasons of the rules that matched it"""
+        timestamp = timestamp or datetime.now()
+        strategy = self.strategies[name]
+        if data.empty:
+            return Signal(symbol, "HOLD", 0.0, 0.0, timestamp, name, "No data")
+        price = float(data['Close'].iloc[-1])
+        if len(data) < strategy.min_bars:
+            return Signal(symbol, "HOLD", 0.0, price, timestamp, name, "Insufficient data")
+
+        cache = {} if cache is None else cache
+        latest = self.evaluate(data, [name], cache)[name].iloc[-1]
+        evaluator = _Evaluator(data, cache)
+        reasons = []
+        for rule in strategy.rules:
+            for candidate in (rule.first or [rule]):
+                if evaluator.values(candidate.when)[-1]:
+                    reasons.append(candidate.reason)
+                    break
+        action = latest['action']
+        return Signal(
+            symbol=symbol,
+            action=action,
+            strength=abs(float(latest['strength'])),
+            price=price,
+            timestamp=timestamp,
+            strategy=name,
+            reason="".join(f"{reason}; " for reason in reasons).strip(),
+            stop_loss=None if action == "HOLD" or pd.isna(latest['stop_loss']) else float(latest['stop_loss']),
+            take_profit=None if action == "HOLD" or pd.isna(latest['take_profit']) else float(latest['take_profit'])
+        )
+
+    @staticmethod
+    def _scores(evaluator: "_Evaluator", rule: Rule) -> np.ndarray:
+        if rule.first:
+            conditions = [evaluator.values(r.when).astype(bool) for r in rule.first]
+            return np.select(conditions, [r.score for r in rule.first], 0.0)
+        return np.where(evaluator.values(rule.when).astype(bool), rule.score, 0.0)
+
+
+class _Evaluator:
+    """Computes nodes over one OHLCV history, each at most once"""
+
+    def __init__(self, data: pd.DataFrame, cache: Optional[Dict[Node, object]] = None):
+        self.data = data
+        self.cache = {} if cache is None else cache
+
+    def values(self, node: Node) -> np.ndarray:
+        """A node's values as a numpy array, one per bar (booleans for conditions)"""
+        result = self.series(node)
+        if np.isscalar(result):
+            return np.full(len(self.data), result)
+        return np.asarray(result)
+
+    def series(self, node: Node):
+        cached = self.cache.get(node)
+        if cached is None:
+            cached = self.cache[node] = self._compute(node)
+        return cached
+
+    def _compute(self, node: Node):
+        kind = node[0]
+        data = self.data
+        if kind == 'const':
+            return node[1]
+        if kind == 'field':
+            return data[node[1]].astype(float)
+        if kind == 'sma':
+            return ta.trend.SMAIndicator(data['Close'], window=node[1]).sma_indicator()
+        if kind == 'ema':
+            return ta.trend.EMAIndicator(data['Close'], window=node[1]).ema_indicator()
+        if kind == 'rsi':
+            return TechnicalIndicators.calculate_rsi(data, period=node[1])
+        if kind == 'atr':
+            return TechnicalIndicators.calculate_atr(data, period=node[1])
+        if kind == 'macd':
+            return TechnicalIndicators.calculate_macd(data, *node[1:])
+        if kind == 'bollinger':
+            return TechnicalIndicators.calculate_bollinger_bands(data, period=node[1], std=node[2])
+        if kind == 'stochastic':
+            return TechnicalIndicators.calculate_stochastic(data, k_period=node[1], d_period=node[2])
+        if kind == 'item':
+            return self.series(node[1])[node[2]]
+
+        if kind == 'neg':
+            return -self.series(node[1])
+        if kind == 'not':
+            return ~_bool(self.series(node[1]))
+        if kind == 'op':
+            left, right = self.series(node[2]), self.series(node[3])
+            if node[1] == '+':
+                return left + right
+            if node[1] == '-':
+                return left - right
+            if node[1] == '*':
+                return left * right
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return left / right
+        if kind == 'cmp':
+            left, right = self.series(node[2]), self.series(node[3])
+            return {'<': lambda: left < right, '<=': lambda: left <= right, '>': lambda: left > right,
+                    '>=': lambda: left >= right, '==': lambda: left == right,
+                    '!=': lambda: left != right}[node[1]]()
+        if kind in ('and', 'or'):
+            result = _bool(self.series(node[1]))
+            for child in node[2:]:
+                result = result & _bool(self.series(child)) if kind == 'and' else result | _bool(self.series(child))
+            return result
+
+        if kind == 'prev':
+            return self._as_series(node[1]).shift(node[2])
+        if kind == 'highest':
+            return self._as_series(node[1]).rolling(node[2]).max()
+        if kind == 'lowest':
+            return self._as_series(node[1]).rolling(node[2]).min()
+        if kind == 'mean':
+            return self._as_series(node[1]).rolling(node[2]).mean()
+        if kind == 'abs':
+            return abs(self.series(node[1]))
+        if kind in ('min', 'max'):
+            left, right = self._as_series(node[1]), self._as_series(node[2])
+            return np.fmin(left, right) if kind == 'min' else np.fmax(left, right)
+        if kind in ('crosses_above', 'crosses_below'):
+            left, right = self._as_series(node[1]), self._as_series(node[2])
+            if kind == 'crosses_above':
+                return (left > right) & (left.shift(1) <= right.shift(1))
+            return (left < right) & (left.shift(1) >= right.shift(1))
+        raise ValueError(f"Unknown expression node {kind}")
+
+    def _as_series(self, node: Node) -> pd.Series:
+        values = self.series(node)
+        if np.isscalar(values):
+            return pd.Series(values, index=self.data.index, dtype=float)
+        return values
+
+
+def _bool(values):
+    """Conditions as booleans; NaN (e.g. indicator warm-up) counts as false"""
+    if np.isscalar(values):
+        return bool(values)
+    if isinstance(values, pd.Series) and values.dtype != bool:
+        return values.fillna(0).astype(bool)
+    return values
@@ -0,0 +1,232 @@
+"""
+Strategy Scanner Module
+Vectorized multi-symbol strategy evaluation over a panel of bars.
+
+A panel is anything indexable by field name ('Open', 'High', 'Low', 'Close',
+'Volume') that returns a time x symbols DataFrame - a dict of DataFrames or
+the column-grouped frame returned by yf.download(). Indicators are computed
+column-wise for every symbol at once; the resulting latest values are scored
+with the same StrategyScoring rules the single-symbol strategies use.
+"""
+
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from trading_strategies import STRATEGY_SCORERS
+
+SIGNAL_COLUMNS = ['strategy', 'action', 'strength', 'price', 'stop_loss', 'take_profit', 'reason']
+
+
+class StrategyScanner:
+    """Screens a whole watchlist in one vectorized pass"""
+
+    def __init__(self, sma_periods: Iterable[int] = (20, 50, 200), rsi_period: int = 14,
+                 macd: tuple = (12, 26, 9), bb_period: int = 20, bb_std: float = 2,
+                 atr_period: int = 14, stochastic: tuple = (14, 3),
+                 range_window: int = 20, volume_window: int = 10):
+        self.sma_periods = tuple(sma_periods)
+        self.rsi_period = rsi_period
+        self.macd = macd
+        self.bb_period = bb_period
+        self.bb_std = bb_std
+        self.atr_period = atr_period
+        self.stochastic = stochastic
+        self.range_window = range_window
+        self.volume_window = volume_window
+
+    def indicator_snapshots(self, panel) -> pd.DataFrame:
+        """
+        Latest indicator values for every symbol (one row per symbol, columns
+        keyed like IndicatorEngine.snapshot())
+        """
+        symbols = panel['Close'].columns
+        close = np.asarray(panel['Close'], dtype=float)
+        high = np.asarray(panel['High'], dtype=float)
+        low = np.asarray(panel['Low'], dtype=float)
+        volume = np.asarray(panel['Volume'], dtype=float)
+
+        # Symbols that started trading later have leading NaNs; the recursive
+        # indicators are seeded at each symbol's first valid bar instead
+        observed = np.isfinite(close)
+        bars = observed.sum(axis=0)
+        first_valid = np.where(observed.any(axis=0), observed.argmax(axis=0), len(close))
+        filled_close = _fill_leading(close, first_valid)
+
+        columns = {
+            'bars': bars,
+            'price': close[-1],
+            'high': high[-1],
+            'low': low[-1],
+            'volume': volume[-1],
+        }
+
+        # Rolling indicators only need the tail of the panel
+        for period in self.sma_periods:
+            columns[f'sma_{period}'] = _tail(close, period).mean(axis=0)
+            columns[f'ema_{period}'] = _ewm_last(filled_close, 2.0 / (period + 1), period, bars)
+
+        columns['rsi'] = self._rsi(filled_close, bars)
+
+        fast, slow, sign = self.macd
+        macd_line = (_ewm(filled_close, 2.0 / (fast + 1), fast, bars)
+                     - _ewm(filled_close, 2.0 / (slow + 1), slow, bars))
+        macd_observations = bars - slow + 1
+        macd_line_filled = _fill_leading(macd_line, len(macd_line) - np.maximum(macd_observations, 0))
+        macd_signal = _ewm_last(macd_line_filled, 2.0 / (sign + 1), sign, macd_observations)
+        columns['macd'] = macd_line[-1]
+        columns['macd_signal'] = macd_signal
+        columns['macd_diff'] = macd_line[-1] - macd_signal
+        if len(macd_line) > 1:
+            prev_signal = _ewm_last(macd_line_filled[:-1], 2.0 / (sign + 1), sign, macd_observations - 1)
+            columns['macd_diff_prev'] = macd_line[-2] - prev_signal
+        else:
+            columns['macd_diff_prev'] = np.full(len(symbols), np.nan)
+
+        bb_close = _tail(close, self.bb_period)
+        bb_middle = bb_close.mean(axis=0)
+        bb_std = bb_close.std(axis=0)
+        columns['bb_middle'] = bb_middle
+        columns['bb_upper'] = bb_middle + self.bb_std * bb_std
+        columns['bb_lower'] = bb_middle - self.bb_std * bb_std
+
+        columns['atr'] = self._atr(high, low, close, first_valid)
+
+        k_period, d_period = self.stochastic
+        rows = k_period + d_period - 1
+        if len(close) >= rows:
+            lowest = sliding_window_view(low[-rows:], k_period, axis=0).min(axis=-1)
+            highest = sliding_window_view(high[-rows:], k_period, axis=0).max(axis=-1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                stoch_k = 100 * (close[-d_period:] - lowest) / (highest - lowest)
+            stoch_k[~np.isfinite(stoch_k)] = np.nan
+            columns['stoch_k'] = stoch_k[-1]
+            columns['stoch_d'] = stoch_k.mean(axis=0)
+        else:
+            columns['stoch_k'] = columns['stoch_d'] = np.full(len(symbols), np.nan)
+
+        columns['recent_high'] = _tail(high, self.range_window).max(axis=0)
+        columns['recent_low'] = _tail(low, self.range_window).min(axis=0)
+        columns['avg_volume'] = _tail(volume, self.volume_window).mean(axis=0)
+
+        return pd.DataFrame(columns, index=symbols)
+
+    def scan(self, panel, strategy: str = "SWING", snapshots: Optional[pd.DataFrame] = None,
+             timestamp: Optional[datetime] = None) -> pd.DataFrame:
+        """Evaluate one strategy for every symbol; returns one Signal row per symbol"""
+        scorer = STRATEGY_SCORERS[strategy]
+        if snapshots is None:
+            snapshots = self.indicator_snapshots(panel)
+        timestamp = timestamp or datetime.now()
+
+        keys = list(snapshots.columns)
+        rows = []
+        for symbol, values in zip(snapshots.index, snapshots.to_numpy().tolist()):
+            signal = scorer(symbol, dict(zip(keys, values)), timestamp)
+            rows.append(vars(signal))
+
+        result = pd.DataFrame(rows, columns=['symbol', 'timestamp'] + SIGNAL_COLUMNS)
+        return result.set_index('symbol')
+
+    def scan_all(self, panel, strategies: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        """Evaluate several strategies, sharing one indicator pass between them"""
+        snapshots = self.indicator_snapshots(panel)
+        timestamp = datetime.now()
+        return {strategy: self.scan(panel, strategy, snapshots, timestamp)
+                for strategy in (strategies or list(STRATEGY_SCORERS))}
+
+    def _rsi(self, close: np.ndarray, bars: np.ndarray) -> np.ndarray:
+        diff = np.diff(close, axis=0, prepend=close[:1])
+        up = np.where(diff > 0, diff, 0.0)
+        down = np.where(diff < 0, -diff, 0.0)
+        alpha = 1.0 / self.rsi_period
+        avg_up = _ewm_last(up, alpha, self.rsi_period, bars)
+        avg_down = _ewm_last(down, alpha, self.rsi_period, bars)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(avg_down == 0, 100.0, 100 - (100 / (1 + avg_up / avg_down)))
+        return np.where(np.isnan(avg_down), np.nan, rsi)
+
+    def _atr(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+             first_valid: np.ndarray) -> np.ndarray:
+        """Last Wilder ATR value per symbol"""
+        prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+        atr = _wilder_last(true_range, self.atr_period)
+        for column in np.flatnonzero(first_valid > 0):
+            atr[column] = _wilder_last(true_range[first_valid[column]:, column:column + 1], self.atr_period)[0]
+        return atr
+
+
+def _ewm(values: np.ndarray, alpha: float, min_periods: int, observations: np.ndarray) -> np.ndarray:
+    """
+    Full pandas ewm(alpha, adjust=False).mean() series for every column at once.
+    Inputs must be NaN-free (leading gaps filled with the first valid value,
+    which leaves the recursion unchanged); `observations` is the per-column
+    count of real bars.
+    """
+    result = np.empty_like(values)
+    state = values[0].copy()
+    step = np.empty_like(state)
+    result[0] = state
+    for i in range(1, len(values)):
+        np.subtract(values[i], state, out=step)
+        step *= alpha
+        state += step
+        result[i] = state
+
+    # Mask warm-up rows the way min_periods does
+    rows_seen = np.arange(1, len(values) + 1)[:, None] - (len(values) - observations)[None, :]
+    result[rows_seen < min_periods] = np.nan
+    return result
+
+
+def _ewm_last(values: np.ndarray, alpha: float, min_periods: int, observations: np.ndarray) -> np.ndarray:
+    """
+    Last row of _ewm(), with the recursion unrolled into one weighted sum
+    over the rows instead of a loop
+    """
+    rows = len(values)
+    weights = alpha * (1 - alpha) ** np.arange(rows - 1, -1, -1)
+    weights[0] = (1 - alpha) ** (rows - 1)
+    result = weights @ values
+    result[observations < min_periods] = np.nan
+    return result
+
+
+def _wilder_last(true_range: np.ndarray, window: int) -> np.ndarray:
+    """
+    Final value of ta's ATR recursion, unrolled into one weighted sum over the
+    true ranges so no Python loop over bars is needed
+    """
+    bars = len(true_range)
+    if bars < window:
+        return np.zeros(true_range.shape[1])
+
+    seed = true_range[:window].mean(axis=0)
+    decay = 1 - 1.0 / window
+    steps = bars - window
+    if not steps:
+        return seed
+    weights = (1.0 / window) * decay ** np.arange(steps - 1, -1, -1)
+    return seed * decay ** steps + weights @ true_range[window:]
+
+
+def _fill_leading(values: np.ndarray, first_valid: np.ndarray) -> np.ndarray:
+    """Replace each column's leading NaNs with its first valid value"""
+    if not first_valid.any():
+        return values
+    first_valid = np.minimum(first_valid, len(values) - 1)
+    first_values = values[first_valid, np.arange(values.shape[1])]
+    rows = np.arange(len(values))[:, None]
+    return np.where(rows < first_valid[None, :], first_values[None, :], values)
+
+
+def _tail(values: np.ndarray, rows: int) -> np.ndarray:
+    """Last `rows` rows, or an all-NaN row when the panel is too short"""
+    if len(values) < rows:
+        return np.full((1, values.shape[1]), np.nan)
+    return values[-rows:]
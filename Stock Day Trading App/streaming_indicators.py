@@ -0,0 +1,332 @@
+"""
+Streaming Indicators Module
+Incremental technical indicators that update in O(1) per bar.
+
+Each indicator reproduces the values of the matching `ta` indicator used in
+TechnicalIndicators, so replaying history bar-by-bar gives the same numbers
+as computing the whole DataFrame at once. Values that `ta` reports as NaN
+during warm-up are NaN here too.
+"""
+
+import math
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+NAN = float('nan')
+
+
+def _is_nan(value: float) -> bool:
+    return value != value
+
+
+class SMA:
+    """Simple moving average (pandas rolling(period).mean())"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window: Deque[float] = deque()
+        self.total = 0.0
+        self.nan_count = 0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        self.window.append(x)
+        if _is_nan(x):
+            self.nan_count += 1
+        else:
+            self.total += x
+        if len(self.window) > self.period:
+            old = self.window.popleft()
+            if _is_nan(old):
+                self.nan_count -= 1
+            else:
+                self.total -= old
+
+        if len(self.window) < self.period or self.nan_count:
+            self.value = NAN
+        else:
+            self.value = self.total / self.period
+        return self.value
+
+
+class EMA:
+    """Exponential moving average (pandas ewm(span=period, adjust=False))
+
+    Leading NaN inputs are skipped, matching pandas when the EMA is taken
+    of another indicator that is still warming up (e.g. the MACD signal).
+    """
+
+    def __init__(self, period: int = None, alpha: float = None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.count = 0
+        self.state = NAN
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if _is_nan(x):
+            if self.count:
+                self.value = self.state if self.count >= self.period else NAN
+            return self.value
+
+        if self.count == 0:
+            self.state = x
+        else:
+            self.state = (1 - self.alpha) * self.state + self.alpha * x
+        self.count += 1
+        self.value = self.state if self.count >= self.period else NAN
+        return self.value
+
+
+class RollingExtreme:
+    """Rolling max or min over a fixed window using a monotonic deque"""
+
+    def __init__(self, period: int, mode: str = "max"):
+        self.period = period
+        self.mode = mode
+        self.index = 0
+        self.candidates: Deque[Tuple[int, float]] = deque()
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if self.mode == "max":
+            while self.candidates and self.candidates[-1][1] <= x:
+                self.candidates.pop()
+        else:
+            while self.candidates and self.candidates[-1][1] >= x:
+                self.candidates.pop()
+        self.candidates.append((self.index, x))
+
+        if self.candidates[0][0] <= self.index - self.period:
+            self.candidates.popleft()
+
+        self.index += 1
+        self.value = self.candidates[0][1] if self.index >= self.period else NAN
+        return self.value
+
+
+class RollingStats:
+    """Rolling mean and population standard deviation (Welford add/remove)"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window: Deque[float] = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.std = NAN
+
+    def update(self, x: float) -> Tuple[float, float]:
+        self.window.append(x)
+        n = len(self.window)
+        delta = x - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (x - self.mean)
+
+        if n > self.period:
+            old = self.window.popleft()
+            n -= 1
+            delta = old - self.mean
+            self.mean -= delta / n
+            self.m2 -= delta * (old - self.mean)
+
+        if n < self.period:
+            self.std = NAN
+            return NAN, NAN
+        self.std = math.sqrt(max(self.m2, 0.0) / n)
+        return self.mean, self.std
+
+
+class RSI:
+    """Wilder RSI (ta.momentum.RSIIndicator)"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close = NAN
+        self.avg_up = EMA(period, alpha=1.0 / period)
+        self.avg_down = EMA(period, alpha=1.0 / period)
+        self.value = NAN
+
+    def update(self, close: float) -> float:
+        diff = close - self.prev_close
+        self.prev_close = close
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else 0.0
+
+        avg_up = self.avg_up.update(up)
+        avg_down = self.avg_down.update(down)
+        if _is_nan(avg_down):
+            self.value = NAN
+        elif avg_down == 0:
+            self.value = 100.0
+        else:
+            self.value = 100 - (100 / (1 + avg_up / avg_down))
+        return self.value
+
+
+class MACD:
+    """MACD line, signal and histogram (ta.trend.MACD)"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.macd = NAN
+        self.macd_signal = NAN
+        self.macd_diff = NAN
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        self.macd = self.fast.update(close) - self.slow.update(close)
+        self.macd_signal = self.signal.update(self.macd)
+        self.macd_diff = self.macd - self.macd_signal
+        return self.macd, self.macd_signal, self.macd_diff
+
+
+class BollingerBands:
+    """Bollinger Bands (ta.volatility.BollingerBands)"""
+
+    def __init__(self, period: int = 20, std: float = 2):
+        self.stats = RollingStats(period)
+        self.window_dev = std
+        self.upper = NAN
+        self.lower = NAN
+        self.middle = NAN
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        mean, std = self.stats.update(close)
+        self.middle = mean
+        self.upper = mean + self.window_dev * std
+        self.lower = mean - self.window_dev * std
+        return self.upper, self.lower, self.middle
+
+
+class ATR:
+    """Average True Range with Wilder smoothing (ta.volatility.AverageTrueRange)
+
+    Like `ta`, the value is 0.0 rather than NaN until a full window is seen.
+    """
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close = NAN
+        self.count = 0
+        self.seed_total = 0.0
+        self.value = 0.0
+
+    def update(self, high: float, low: float, close: float) -> float:
+        true_range = high - low
+        if not _is_nan(self.prev_close):
+            true_range = max(true_range, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.count += 1
+
+        if self.count < self.period:
+            self.seed_total += true_range
+        elif self.count == self.period:
+            self.value = (self.seed_total + true_range) / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + true_range) / float(self.period)
+        return self.value
+
+
+class Stochastic:
+    """Stochastic oscillator %K and %D (ta.momentum.StochasticOscillator)"""
+
+    def __init__(self, k_period: int = 14, d_period: int = 3):
+        self.lowest = RollingExtreme(k_period, "min")
+        self.highest = RollingExtreme(k_period, "max")
+        self.d = SMA(d_period)
+        self.k_value = NAN
+        self.d_value = NAN
+
+    def update(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        lowest = self.lowest.update(low)
+        highest = self.highest.update(high)
+        span = highest - lowest
+        if _is_nan(span) or span == 0:
+            self.k_value = NAN
+        else:
+            self.k_value = 100 * (close - lowest) / span
+        self.d_value = self.d.update(self.k_value)
+        return self.k_value, self.d_value
+
+
+class IndicatorEngine:
+    """Per-symbol bundle of the streaming indicators the strategies read
+
+    Call update() with each new bar; snapshot() returns the same values the
+    strategies take from `.iloc[-1]` / `.iloc[-2]` of the `ta` series.
+    """
+
+    def __init__(self, sma_periods: Iterable[int] = (20, 50, 200), rsi_period: int = 14,
+                 macd: Tuple[int, int, int] = (12, 26, 9), bb_period: int = 20, bb_std: float = 2,
+                 atr_period: int = 14, stochastic: Tuple[int, int] = (14, 3),
+                 range_window: int = 20, volume_window: int = 10):
+        self.smas = {period: SMA(period) for period in sma_periods}
+        self.emas = {period: EMA(period) for period in sma_periods}
+        self.rsi = RSI(rsi_period)
+        self.macd = MACD(*macd)
+        self.bollinger = BollingerBands(bb_period, bb_std)
+        self.atr = ATR(atr_period)
+        self.stochastic = Stochastic(*stochastic)
+        self.recent_high = RollingExtreme(range_window, "max")
+        self.recent_low = RollingExtreme(range_window, "min")
+        self.avg_volume = SMA(volume_window)
+        self.bars = 0
+        self.last_bar: Optional[Dict[str, float]] = None
+        self.prev_macd_diff = NAN
+
+    def update(self, open_: float, high: float, low: float, close: float, volume: float) -> Dict[str, float]:
+        """Feed one OHLCV bar and return the new snapshot"""
+        self.prev_macd_diff = self.macd.macd_diff
+        for period in self.smas:
+            self.smas[period].update(close)
+            self.emas[period].update(close)
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.bollinger.update(close)
+        self.atr.update(high, low, close)
+        self.stochastic.update(high, low, close)
+        self.recent_high.update(high)
+        self.recent_low.update(low)
+        self.avg_volume.update(volume)
+        self.bars += 1
+        self.last_bar = {'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}
+        return self.snapshot()
+
+    def update_from_dataframe(self, data) -> Dict[str, float]:
+        """Replay every bar of an OHLCV DataFrame (e.g. to warm up from history)"""
+        snapshot = self.snapshot()
+        for open_, high, low, close, volume in zip(data['Open'].to_numpy(), data['High'].to_numpy(),
+                                                   data['Low'].to_numpy(), data['Close'].to_numpy(),
+                                                   data['Volume'].to_numpy()):
+            snapshot = self.update(float(open_), float(high), float(low), float(close), float(volume))
+        return snapshot
+
+    def snapshot(self) -> Dict[str, float]:
+        """Latest indicator values keyed the way the strategy scorers expect"""
+        last = self.last_bar or {}
+        snapshot = {
+            'bars': self.bars,
+            'price': last.get('close', NAN),
+            'high': last.get('high', NAN),
+            'low': last.get('low', NAN),
+            'volume': last.get('volume', NAN),
+            'rsi': self.rsi.value,
+            'macd': self.macd.macd,
+            'macd_signal': self.macd.macd_signal,
+            'macd_diff': self.macd.macd_diff,
+            'macd_diff_prev': self.prev_macd_diff,
+            'bb_upper': self.bollinger.upper,
+            'bb_lower': self.bollinger.lower,
+            'bb_middle': self.bollinger.middle,
+            'atr': self.atr.value,
+            'stoch_k': self.stochastic.k_value,
+            'stoch_d': self.stochastic.d_value,
+            'recent_high': self.recent_high.value,
+            'recent_low': self.recent_low.value,
+            'avg_volume': self.avg_volume.value,
+        }
+        for period in self.smas:
+            snapshot[f'sma_{period}'] = self.smas[period].value
+            snapshot[f'ema_{period}'] = self.emas[period].value
+        return snapshot
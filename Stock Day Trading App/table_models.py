@@ -0,0 +1,103 @@
+"""
+Table Models Module
+Diff-based models behind the app's ttk.Treeview tables.
+
+A TreeTable remembers the rows it last showed, keyed by a stable id, and
+a sync only inserts new rows, updates rows whose values changed and
+deletes rows that went away. PagedTable shows one page of a long,
+append-only sequence (newest first), so the tree never holds more than a
+page of rows however long the history grows.
+"""
+
+from tkinter import ttk
+from typing import Callable, Dict, Hashable, Iterable, Sequence, Tuple
+
+Row = Tuple[Hashable, Tuple]
+
+
+class TreeTable:
+    """Keeps a Treeview in step with a list of (key, values) rows using minimal changes"""
+
+    def __init__(self, tree: ttk.Treeview):
+        self.tree = tree
+        self.rows: Dict[str, Tuple] = {}  # iid -> values currently shown, in display order
+        self.stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'moved': 0}
+
+    def sync(self, rows: Iterable[Row]):
+        """Show exactly these rows, in this order"""
+        wanted: Dict[str, Tuple] = {str(key): tuple(values) for key, values in rows}
+
+        for iid in [iid for iid in self.rows if iid not in wanted]:
+            self.tree.delete(iid)
+            self.stats['deleted'] += 1
+
+        for index, (iid, values) in enumerate(wanted.items()):
+            shown = self.rows.get(iid)
+            if shown is None:
+                self.tree.insert("", index, iid=iid, values=values)
+                self.stats['inserted'] += 1
+            elif shown != values:
+                self.tree.item(iid, values=values)
+                self.stats['updated'] += 1
+
+        # Reorder only when the order actually changed (rare: rows are mostly appended or removed)
+        if list(self.tree.get_children()) != list(wanted):
+            for index, iid in enumerate(wanted):
+                self.tree.move(iid, "", index)
+                self.stats['moved'] += 1
+        self.rows = wanted
+
+    def clear(self):
+        self.sync([])
+
+
+class PagedTable:
+    """Newest-first pages of an append-only sequence, shown through a TreeTable"""
+
+    def __init__(self, tree: ttk.Treeview, source: Callable[[], Sequence], format_row: Callable[[object], Tuple],
+                 page_size: int = 50):
+        self.table = TreeTable(tree)
+        self.source = source
+        self.format_row = format_row
+        self.page_size = page_size
+        self.page = 0
+        # Length of the sequence when an older page was opened, so new items don't shift it
+        self.anchor = None
+
+    @property
+    def total(self) -> int:
+        return len(self.source())
+
+    def refresh(self):
+        """Re-sync the current page; page 0 follows new items as they arrive"""
+        items = self.source()
+        end = len(items) if self.page == 0 or self.anchor is None else self.anchor
+        end = max(0, min(end - self.page * self.page_size, len(items)))
+        start = max(0, end - self.page_size)
+        self.table.sync((index, self.format_row(items[index])) for index in range(end - 1, start - 1, -1))
+
+    def go_to(self, page: int):
+        total = self.total
+        last_page = max(0, -(-total // self.page_size) - 1)
+        page = min(max(page, 0), last_page)
+        if page and not self.page:
+            self.anchor = total
+        elif not page:
+            self.anchor = None
+        self.page = page
+        self.refresh()
+
+    def older(self):
+        self.go_to(self.page + 1)
+
+    def newer(self):
+        self.go_to(self.page - 1)
+
+    def describe(self) -> str:
+        items = self.anchor if self.anchor is not None else self.total
+        if not items:
+            return "0 of 0"
+        last = max(0, items - self.page * self.page_size)
+        first = max(1, last - self.page_size + 1)
+        # Numbered newest first
+        return f"{items - last + 1}-{items - first + 1} of {items}"
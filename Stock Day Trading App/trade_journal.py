@@ -0,0 +1,361 @@
+"""
+Trade Journal Module
+Append-only, event-sourced journal of orders, fills and position changes.
+
+Every change to the app's trading state is appended to a JSONL file as an
+event with a sequence number. A background writer batches the lines, so
+appending never blocks the trading loop, and syncs them to disk according
+to the fsync policy. The writer also folds each event into a JournalState
+and periodically snapshots it next to the journal, so on startup only the
+events after the last snapshot have to be replayed.
+
+The state only keeps the most recent trades; the full trade history is
+served from the journal itself. The journal keeps the byte offset of every
+FILL event, so `fills` can hand out any page of tens of thousands of trades
+by seeking to just those lines. The offsets are saved with each snapshot in
+a small binary index next to the journal, so on startup only the fills
+after the snapshot are picked up, from the events being replayed anyway.
+"""
+
+import os
+import json
+import array
+import time
+import queue
+import logging
+import threading
+from enum import Enum
+from datetime import date, datetime
+from dataclasses import asdict, dataclass, field
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_FILE = "trade_journal.jsonl"
+
+# always: fsync every batch; interval: at most every fsync_interval seconds;
+# never: leave it to the OS
+FSYNC_POLICIES = ("always", "interval", "never")
+
+# Event types
+ORDER = "order"
+FILL = "fill"
+POSITION = "position"
+DAILY_BUY = "daily_buy"
+
+# Typecode of the fill index: one signed 64-bit byte offset per FILL event
+FILL_INDEX_TYPE = 'q'
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.name
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+@dataclass
+class JournalState:
+    """Trading state folded from the journal's events"""
+    seq: int = 0
+    positions: Dict[str, Dict] = field(default_factory=dict)
+    daily_buys: Dict[str, List[Dict]] = field(default_factory=dict)  # ISO date -> buys
+    daily_realized: Dict[str, float] = field(default_factory=dict)  # ISO date -> realized P&L
+    realized_pnl: float = 0.0
+    trade_count: int = 0
+    last_order_id: int = 0
+    recent_trades: List[Dict] = field(default_factory=list)
+
+    def apply(self, event: Dict, keep_trades: int = 500):
+        """Fold one event into the state"""
+        self.seq = event['seq']
+        kind = event['type']
+        if kind == FILL:
+            pnl = float(event.get('pnl', 0.0))
+            day = event['timestamp'][:10]
+            self.realized_pnl += pnl
+            self.daily_realized[day] = self.daily_realized.get(day, 0.0) + pnl
+            self.trade_count += 1
+            self.recent_trades.append({key: value for key, value in event.items() if key not in ('seq', 'type', 'logged_at', 'order_id')})
+            if len(self.recent_trades) > keep_trades:
+                del self.recent_trades[:-keep_trades]
+        elif kind == POSITION:
+            if event.get('position') is None:
+                self.positions.pop(event['symbol'], None)
+            else:
+                self.positions[event['symbol']] = event['position']
+        elif kind == DAILY_BUY:
+            self.daily_buys.setdefault(event['date'], []).append(event['buy'])
+        elif kind == ORDER:
+            # Order ids keep counting up across restarts
+            self.last_order_id = max(self.last_order_id, event.get('order_id') or 0)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "JournalState":
+        return cls(**data)
+
+
+class TradeJournal:
+    """Append-only JSONL journal with a batching background writer and snapshots"""
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_FILE, fsync: str = "interval", fsync_interval: float = 1.0,
+                 snapshot_every: int = 1000, keep_trades: int = 500, max_batch: int = 500):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync} (expected one of {', '.join(FSYNC_POLICIES)})")
+        self.path = path
+        self.snapshot_path = path + ".snapshot.json"
+        self.fill_index_path = path + ".fills"
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.keep_trades = keep_trades
+        self.max_batch = max_batch
+
+        self.state = JournalState()
+        self._offset = 0
+        self._last_seq = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._seq_lock = threading.Lock()
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self._since_snapshot = 0
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+        # Every FILL event, oldest first: its byte offset once written, the event itself until then
+        self._fills: List[Union[int, Dict]] = []
+        self._pending_fills: Dict[int, int] = {}  # seq -> position in _fills
+        self._indexed_fills = 0  # leading _fills saved in the fill index
+
+    def open(self) -> JournalState:
+        """Rebuild the state from the latest snapshot plus newer events, then start the writer"""
+        if self._thread is not None:
+            return self.state
+
+        started = time.perf_counter()
+        self.state, self._offset, fills = self._load_snapshot()
+        self._fills = list(fills)
+        self._indexed_fills = len(self._fills)
+        replayed = 0
+        for event, end in self._read_events(self._offset):
+            start, self._offset = self._offset, end
+            if event is None:
+                continue
+            self.state.apply(event, self.keep_trades)
+            if event['type'] == FILL:
+                self._fills.append(start)
+            replayed += 1
+        self._since_snapshot = replayed
+        self._last_seq = self.state.seq
+        logger.info(f"Journal rebuilt to seq {self.state.seq} ({replayed} events replayed) "
+                    f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        self._file = open(self.path, "ab")
+        # Drop a torn final line left by a crash so new events start on a clean line.
+        # Only a last line with no newline is left unread, so nothing else is cut.
+        if self._file.tell() != self._offset:
+            logger.warning(f"Truncating {self._file.tell() - self._offset} bytes of an incomplete final journal line")
+            self._file.truncate(self._offset)
+
+        self._thread = threading.Thread(target=self._run, name="trade-journal", daemon=True)
+        self._thread.start()
+        return self.state
+
+    def append(self, kind: str, **data) -> int:
+        """Queue an event; returns its sequence number without waiting for the write"""
+        if self._thread is None:
+            raise RuntimeError("Trade journal is not open")
+        with self._seq_lock:
+            self._last_seq += 1
+            seq = self._last_seq
+            event = {'seq': seq, 'type': kind, 'logged_at': datetime.now().isoformat(), **data}
+            if kind == FILL:
+                # Listed straight away, so the history shows the fill before the writer gets to it
+                self._pending_fills[seq] = len(self._fills)
+                self._fills.append(event)
+            self._queue.put(event)
+        return seq
+
+    def close(self):
+        """Write everything queued, sync it and take a final snapshot"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        self._file = None
+
+    @property
+    def fills(self) -> "FillHistory":
+        """Every FILL event ever journaled, oldest first, read from disk on access"""
+        return FillHistory(self)
+
+    def fill(self, index: int) -> Dict:
+        entry = self._fills[index]
+        if isinstance(entry, dict):
+            # Not written yet; returned as it will read back from disk
+            return json.loads(json.dumps(entry, default=_json_default))
+        with open(self.path, "rb") as f:
+            f.seek(entry)
+            return json.loads(f.readline())
+
+    def events(self, since_seq: int = 0) -> Iterator[Dict]:
+        """Every event on disk after since_seq, oldest first (full history, read lazily)"""
+        for event, _ in self._read_events(0):
+            if event is not None and event['seq'] > since_seq:
+                yield event
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [event for event in batch if event is not None]
+
+            try:
+                if batch:
+                    self._write(batch)
+                self._sync(force=stopping)
+                if self._since_snapshot >= self.snapshot_every or (stopping and self._since_snapshot):
+                    self._snapshot()
+            except Exception as e:
+                logger.error(f"Error writing trade journal: {e}")
+
+    def _write(self, batch: List[Dict]):
+        lines = [json.dumps(event, default=_json_default) + "\n" for event in batch]
+        data = "".join(lines).encode()
+        self._file.write(data)
+        self._file.flush()
+        # Folded from the written lines so the state matches what a rebuild would produce
+        offset = self._offset
+        for line in lines:
+            event = json.loads(line)
+            self.state.apply(event, self.keep_trades)
+            if event['type'] == FILL:
+                with self._seq_lock:
+                    position = self._pending_fills.pop(event['seq'], None)
+                if position is not None:
+                    self._fills[position] = offset
+            offset += len(line.encode())
+        self._offset += len(data)
+        self._since_snapshot += len(batch)
+        self._dirty = True
+
+    def _sync(self, force: bool = False):
+        if not self._dirty or self.fsync == "never":
+            return
+        now = time.monotonic()
+        if self.fsync == "always" or force or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+            self._dirty = False
+
+    def _snapshot(self):
+        fills = self._save_fill_index()
+        snapshot = {'offset': self._offset, 'fills': fills, 'state': self.state.to_dict()}
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, default=_json_default)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._since_snapshot = 0
+
+    def _save_fill_index(self) -> int:
+        """Append the offsets of fills written since the last snapshot to the fill index; returns its length"""
+        with self._seq_lock:
+            fills = self._fills[self._indexed_fills:]
+        offsets = array.array(FILL_INDEX_TYPE)
+        for entry in fills:
+            if not isinstance(entry, int):
+                break  # the rest are still queued
+            offsets.append(entry)
+        if not offsets:
+            return self._indexed_fills
+        with open(self.fill_index_path, "ab") as f:
+            # Drops entries from a snapshot that never finished
+            f.truncate(self._indexed_fills * offsets.itemsize)
+            offsets.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        self._indexed_fills += len(offsets)
+        return self._indexed_fills
+
+    def _load_snapshot(self) -> Tuple[JournalState, int, array.array]:
+        """(state, journal offset, fill offsets) from the latest snapshot, or a fresh start"""
+        fresh = JournalState(), 0, array.array(FILL_INDEX_TYPE)
+        if not os.path.exists(self.snapshot_path) or not os.path.exists(self.path):
+            return fresh
+        try:
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            state = JournalState.from_dict(snapshot['state'])
+            offset = int(snapshot['offset'])
+            fills = self._load_fill_index(int(snapshot['fills']))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable journal snapshot: {e}")
+            return fresh
+        # A journal shorter than the snapshot offset was replaced; replay it from scratch
+        if offset > os.path.getsize(self.path):
+            logger.warning("Journal is older than its snapshot; rebuilding from the full journal")
+            return fresh
+        return state, offset, fills
+
+    def _load_fill_index(self, count: int) -> array.array:
+        offsets = array.array(FILL_INDEX_TYPE)
+        if count:
+            with open(self.fill_index_path, "rb") as f:
+                offsets.fromfile(f, count)  # EOFError if the index is short
+        return offsets
+
+    def _read_events(self, offset: int) -> Iterator[Tuple[Optional[Dict], int]]:
+        """(event, end offset) for each complete line from offset; stops at a torn final line.
+
+        A complete line that can't be read as an event is logged and yielded as
+        None, so it is skipped without losing the events after it.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    return
+                try:
+                    event = json.loads(line)
+                    if not isinstance(event, dict) or 'seq' not in event or 'type' not in event:
+                        raise ValueError("not a journal event")
+                except ValueError as e:
+                    logger.error(f"Skipping unreadable journal line at byte {offset}: {e}")
+                    event = None
+                offset += len(line)
+                yield event, offset
+
+
+class FillHistory(Sequence):
+    """Read-only sequence view of a journal's FILL events (see TradeJournal.fills)"""
+
+    def __init__(self, journal: TradeJournal):
+        self.journal = journal
+
+    def __len__(self) -> int:
+        return len(self.journal._fills)
+
+    def __getitem__(self, index: int) -> Dict:
+        if isinstance(index, slice):
+            return [self.journal.fill(position) for position in range(*index.indices(len(self)))]
+        return self.journal.fill(index)
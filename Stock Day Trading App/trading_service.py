@@ -0,0 +1,151 @@
+"""
+Trading Service Module
+One asyncio event loop on a background thread for the app's periodic work.
+
+Jobs (quote refresh, strategy evaluation, position marking) are coroutines
+scheduled on the loop; blocking calls such as network requests or screen
+automation run in a bounded executor. Results go back to Tk through a
+UIQueue that the Tk thread drains with after(), so only the Tk thread ever
+touches widgets or the app's trading state.
+"""
+
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UIQueue:
+    """Thread-safe queue of callbacks run on the Tk thread"""
+
+    def __init__(self, widget, interval_ms: int = 50, max_batch: int = 200):
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+
+    def post(self, callback: Callable, *args, **kwargs):
+        """Queue callback(*args, **kwargs) to run on the Tk thread; safe from any thread"""
+        self._queue.put((callback, args, kwargs))
+
+    def start(self):
+        self.widget.after(self.interval_ms, self._drain)
+
+    def _drain(self):
+        # Bounded per tick so a burst of updates can't freeze the window
+        for _ in range(self.max_batch):
+            try:
+                callback, args, kwargs = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"UI callback {getattr(callback, '__name__', callback)} failed: {e}")
+        self.widget.after(self.interval_ms, self._drain)
+
+
+class TradingService:
+    """Background asyncio loop running periodic jobs with bounded concurrency"""
+
+    def __init__(self, max_concurrency: int = 4, error_backoff: float = 10.0):
+        self.max_concurrency = max_concurrency
+        self.error_backoff = error_backoff
+        self.loop = asyncio.new_event_loop()
+        # One extra worker so long-running automation can't starve the jobs
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency + 1, thread_name_prefix="trading-service")
+        self.thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="trading-service", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Cancel every job and stop the loop"""
+        if self.thread is None:
+            return
+
+        async def shutdown():
+            for task in list(self._jobs.values()):
+                task.cancel()
+            await asyncio.gather(*self._jobs.values(), return_exceptions=True)
+            self.loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop)
+        self.thread.join(timeout=5)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.thread = None
+
+    def schedule(self, name: str, interval: float, job: Callable[[], Awaitable[Any]]):
+        """Run `await job()` every `interval` seconds until cancelled; replaces a job of the same name"""
+        self.loop.call_soon_threadsafe(self._start_job, name, interval, job)
+
+    def cancel(self, name: str):
+        self.loop.call_soon_threadsafe(self._cancel_job, name)
+
+    def trigger(self, name: str):
+        """Run a scheduled job now instead of waiting out its interval"""
+        self.loop.call_soon_threadsafe(self._wake, name)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Run a blocking callable in the service's executor from any thread"""
+        return asyncio.run_coroutine_threadsafe(self.run_blocking(fn, *args, bounded=False), self.loop)
+
+    async def run_blocking(self, fn: Callable, *args, bounded: bool = True):
+        """Await a blocking callable; at most max_concurrency bounded calls run at once"""
+        if not bounded:
+            return await self.loop.run_in_executor(self.executor, fn, *args)
+        async with self._semaphore:
+            return await self.loop.run_in_executor(self.executor, fn, *args)
+
+    async def map_blocking(self, fn: Callable, items: Iterable) -> List:
+        """fn(item) for every item, concurrently but within the concurrency bound"""
+        return await asyncio.gather(*(self.run_blocking(fn, item) for item in items), return_exceptions=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.loop.run_forever()
+
+    def _start_job(self, name: str, interval: float, job: Callable[[], Awaitable[Any]]):
+        self._cancel_job(name)
+        self._wakeups[name] = asyncio.Event()
+        self._jobs[name] = self.loop.create_task(self._periodic(name, interval, job))
+
+    def _cancel_job(self, name: str):
+        task = self._jobs.pop(name, None)
+        if task is not None:
+            task.cancel()
+        self._wakeups.pop(name, None)
+
+    def _wake(self, name: str):
+        if name in self._wakeups:
+            self._wakeups[name].set()
+
+    async def _periodic(self, name: str, interval: float, job: Callable[[], Awaitable[Any]]):
+        wakeup = self._wakeups[name]
+        while True:
+            delay = interval
+            # Cleared before the run, so a trigger that arrives mid-run starts the next one right away
+            wakeup.clear()
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in {name} job: {e}")
+                delay = self.error_backoff
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
@@ -5,12 +5,17 @@ Contains various automated trading strategies and technical analysis functions.
 
 import pandas as pd
 import numpy as np
-import yfinance as yf
 import ta
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+import copy
 import logging
+import threading
+
+from market_data import BarCache
+from streaming_indicators import IndicatorEngine
+from instrumentation import instruments, timed
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -33,23 +38,27 @@ class TechnicalIndicators:
     """Technical analysis indicators"""
     
     @staticmethod
+    @timed("indicators.rsi")
     def calculate_rsi(data: pd.DataFrame, period: int = 14) -> pd.Series:
         """Calculate Relative Strength Index"""
         return ta.momentum.RSIIndicator(data['Close'], window=period).rsi()
     
     @staticmethod
+    @timed("indicators.macd")
     def calculate_macd(data: pd.DataFrame, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[pd.Series, pd.Series, pd.Series]:
         """Calculate MACD"""
         macd = ta.trend.MACD(data['Close'], window_fast=fast, window_slow=slow, window_sign=signal)
         return macd.macd(), macd.macd_signal(), macd.macd_diff()
     
     @staticmethod
+    @timed("indicators.bollinger_bands")
     def calculate_bollinger_bands(data: pd.DataFrame, period: int = 20, std: int = 2) -> Tuple[pd.Series, pd.Series, pd.Series]:
         """Calculate Bollinger Bands"""
         bb = ta.volatility.BollingerBands(data['Close'], window=period, window_dev=std)
         return bb.bollinger_hband(), bb.bollinger_lband(), bb.bollinger_mavg()
     
     @staticmethod
+    @timed("indicators.moving_averages")
     def calculate_moving_averages(data: pd.DataFrame, periods: List[int]) -> Dict[str, pd.Series]:
         """Calculate multiple moving averages"""
         ma_dict = {}
@@ -59,6 +68,7 @@ class TechnicalIndicators:
         return ma_dict
     
     @staticmethod
+    @timed("indicators.stochastic")
     def calculate_stochastic(data: pd.DataFrame, k_period: int = 14, d_period: int = 3) -> Tuple[pd.Series, pd.Series]:
         """Calculate Stochastic Oscillator"""
         stoch = ta.momentum.StochasticOscillator(data['High'], data['Low'], data['Close'], 
@@ -66,15 +76,362 @@ class TechnicalIndicators:
         return stoch.stoch(), stoch.stoch_signal()
     
     @staticmethod
+    @timed("indicators.atr")
     def calculate_atr(data: pd.DataFrame, period: int = 14) -> pd.Series:
         """Calculate Average True Range"""
         return ta.volatility.AverageTrueRange(data['High'], data['Low'], data['Close'], window=period).average_true_range()
 
+# Tunable thresholds and indicator windows per strategy. Scorers read the
+# thresholds; the *_period / *_window entries configure the indicators that
+# feed them (IndicatorEngine keyword arguments of the same name).
+STRATEGY_PARAMS = {
+    "SWING": {
+        'rsi_oversold': 30,
+        'rsi_overbought': 70,
+        'rsi_neutral_low': 40,
+        'rsi_neutral_high': 60,
+        'resistance_band': 0.02,
+        'entry_strength': 0.6,
+        'reward_risk': 2.0,
+        'rsi_period': 14,
+        'range_window': 20,
+    },
+    "MEAN_REVERSION": {
+        'bb_low': 0.1,
+        'bb_high': 0.9,
+        'rsi_oversold': 30,
+        'rsi_overbought': 70,
+        'stoch_oversold': 20,
+        'stoch_overbought': 80,
+        'volume_factor': 1.5,
+        'entry_strength': 0.6,
+        'rsi_period': 14,
+        'bb_period': 20,
+        'bb_std': 2,
+        'volume_window': 10,
+    },
+    "BREAKOUT": {
+        'atr_multiplier': 0.5,
+        'volume_surge': 2.0,
+        'volume_dry': 0.5,
+        'entry_strength': 0.7,
+        'reward_risk': 2.0,
+        'atr_period': 14,
+        'bb_period': 20,
+        'bb_std': 2,
+        'range_window': 20,
+        'volume_window': 10,
+    },
+}
+
+# IndicatorEngine keyword arguments among the strategy parameters
+ENGINE_KEYWORDS = ('rsi_period', 'bb_period', 'bb_std', 'atr_period', 'range_window', 'volume_window')
+
+# Bars each built-in strategy is evaluated on: (interval, period)
+STRATEGY_BARS = {
+    "SWING": ("1h", "30d"),
+    "MEAN_REVERSION": ("15m", "5d"),
+    "BREAKOUT": ("1h", "30d"),
+}
+
+def strategy_params(strategy: str, overrides: Optional[Dict] = None) -> Dict:
+    """Default parameters for a strategy with any overrides applied"""
+    params = dict(STRATEGY_PARAMS.get(strategy, {}))
+    if overrides:
+        params.update(overrides)
+    return params
+
+class StrategyScoring:
+    """
+    Signal scoring shared by the DataFrame (ta) path and the streaming path.
+    Each scorer reads the latest indicator values from a snapshot dict with
+    the keys produced by IndicatorEngine.snapshot(). Thresholds come from
+    `params`, falling back to STRATEGY_PARAMS.
+    """
+    
+    @staticmethod
+    def swing(symbol: str, snapshot: Dict[str, float], timestamp: Optional[datetime] = None,
+              params: Optional[Dict] = None) -> Signal:
+        """Trend, RSI, MACD turn and support/resistance scoring"""
+        timestamp = timestamp or datetime.now()
+        p = strategy_params("SWING", params)
+        current_price = snapshot['price']
+        if snapshot['bars'] < 100:
+            return Signal(symbol, "HOLD", 0.0, current_price, timestamp, "SWING", "Insufficient data")
+        
+        sma_20 = snapshot['sma_20']
+        sma_50 = snapshot['sma_50']
+        sma_200 = snapshot['sma_200']
+        current_rsi = snapshot['rsi']
+        
+        # Swing trading logic
+        signal_strength = 0.0
+        action = "HOLD"
+        reason = ""
+        
+        # Trend analysis
+        if current_price > sma_20 > sma_50 > sma_200:
+            signal_strength += 0.4
+            reason += "Strong uptrend; "
+        elif current_price < sma_20 < sma_50 < sma_200:
+            signal_strength -= 0.4
+            reason += "Strong downtrend; "
+        
+        # RSI conditions
+        if p['rsi_neutral_low'] < current_rsi < p['rsi_neutral_high']:
+            signal_strength += 0.2
+            reason += "Neutral RSI; "
+        elif current_rsi < p['rsi_oversold']:
+            signal_strength += 0.3
+            reason += "Oversold RSI; "
+        elif current_rsi > p['rsi_overbought']:
+            signal_strength -= 0.3
+            reason += "Overbought RSI; "
+        
+        # MACD trend confirmation
+        if snapshot['macd_diff'] > 0 and snapshot['macd_diff_prev'] < 0:
+            signal_strength += 0.3
+            reason += "MACD turning positive; "
+        elif snapshot['macd_diff'] < 0 and snapshot['macd_diff_prev'] > 0:
+            signal_strength -= 0.3
+            reason += "MACD turning negative; "
+        
+        # Support/Resistance levels
+        recent_high = snapshot['recent_high']
+        recent_low = snapshot['recent_low']
+        
+        if current_price > recent_high * (1 - p['resistance_band']):
+            signal_strength += 0.2
+            reason += "Breaking resistance; "
+        elif current_price < recent_low * (1 + p['resistance_band']):
+            signal_strength -= 0.2
+            reason += "Breaking support; "
+        
+        # Determine action
+        if signal_strength >= p['entry_strength']:
+            action = "BUY"
+            stop_loss = sma_50
+            take_profit = current_price + (current_price - sma_50) * p['reward_risk']
+        elif signal_strength <= -p['entry_strength']:
+            action = "SELL"
+            stop_loss = sma_50
+            take_profit = current_price - (sma_50 - current_price) * p['reward_risk']
+        else:
+            action = "HOLD"
+            stop_loss = None
+            take_profit = None
+        
+        return Signal(
+            symbol=symbol,
+            action=action,
+            strength=abs(signal_strength),
+            price=current_price,
+            timestamp=timestamp,
+            strategy="SWING",
+            reason=reason.strip(),
+            stop_loss=stop_loss,
+            take_profit=take_profit
+        )
+    
+    @staticmethod
+    def mean_reversion(symbol: str, snapshot: Dict[str, float], timestamp: Optional[datetime] = None,
+                       params: Optional[Dict] = None) -> Signal:
+        """Bollinger position, RSI, stochastic and volume scoring"""
+        timestamp = timestamp or datetime.now()
+        p = strategy_params("MEAN_REVERSION", params)
+        current_price = snapshot['price']
+        if snapshot['bars'] < 50:
+            return Signal(symbol, "HOLD", 0.0, current_price, timestamp, "MEAN_REVERSION", "Insufficient data")
+        
+        current_bb_upper = snapshot['bb_upper']
+        current_bb_lower = snapshot['bb_lower']
+        current_bb_middle = snapshot['bb_middle']
+        current_rsi = snapshot['rsi']
+        current_stoch_k = snapshot['stoch_k']
+        current_stoch_d = snapshot['stoch_d']
+        
+        # Mean reversion logic
+        signal_strength = 0.0
+        action = "HOLD"
+        reason = ""
+        
+        # Bollinger Bands mean reversion
+        bb_position = (current_price - current_bb_lower) / (current_bb_upper - current_bb_lower)
+        
+        if bb_position < p['bb_low']:  # Near lower band
+            signal_strength += 0.4
+            reason += "Price near lower BB; "
+        elif bb_position > p['bb_high']:  # Near upper band
+            signal_strength -= 0.4
+            reason += "Price near upper BB; "
+        
+        # RSI mean reversion
+        if current_rsi < p['rsi_oversold']:
+            signal_strength += 0.3
+            reason += "Oversold RSI; "
+        elif current_rsi > p['rsi_overbought']:
+            signal_strength -= 0.3
+            reason += "Overbought RSI; "
+        
+        # Stochastic mean reversion
+        if current_stoch_k < p['stoch_oversold'] and current_stoch_d < p['stoch_oversold']:
+            signal_strength += 0.2
+            reason += "Oversold stochastic; "
+        elif current_stoch_k > p['stoch_overbought'] and current_stoch_d > p['stoch_overbought']:
+            signal_strength -= 0.2
+            reason += "Overbought stochastic; "
+        
+        # Volume confirmation
+        if snapshot['volume'] > snapshot['avg_volume'] * p['volume_factor']:
+            signal_strength += 0.1
+            reason += "High volume; "
+        
+        # Determine action
+        if signal_strength >= p['entry_strength']:
+            action = "BUY"
+            stop_loss = current_bb_lower
+            take_profit = current_bb_middle
+        elif signal_strength <= -p['entry_strength']:
+            action = "SELL"
+            stop_loss = current_bb_upper
+            take_profit = current_bb_middle
+        else:
+            action = "HOLD"
+            stop_loss = None
+            take_profit = None
+        
+        return Signal(
+            symbol=symbol,
+            action=action,
+            strength=abs(signal_strength),
+            price=current_price,
+            timestamp=timestamp,
+            strategy="MEAN_REVERSION",
+            reason=reason.strip(),
+            stop_loss=stop_loss,
+            take_profit=take_profit
+        )
+    
+    @staticmethod
+    def breakout(symbol: str, snapshot: Dict[str, float], timestamp: Optional[datetime] = None,
+                 params: Optional[Dict] = None) -> Signal:
+        """Range breakout, volume, trend and Bollinger breakout scoring"""
+        timestamp = timestamp or datetime.now()
+        p = strategy_params("BREAKOUT", params)
+        current_price = snapshot['price']
+        if snapshot['bars'] < 100:
+            return Signal(symbol, "HOLD", 0.0, current_price, timestamp, "BREAKOUT", "Insufficient data")
+        
+        current_bb_upper = snapshot['bb_upper']
+        current_bb_lower = snapshot['bb_lower']
+        current_atr = snapshot['atr']
+        sma_20 = snapshot['sma_20']
+        sma_50 = snapshot['sma_50']
+        
+        # Breakout logic
+        signal_strength = 0.0
+        action = "HOLD"
+        reason = ""
+        
+        # Identify support and resistance levels
+        recent_high = snapshot['recent_high']
+        recent_low = snapshot['recent_low']
+        
+        # Breakout detection
+        breakout_threshold = current_atr * p['atr_multiplier']
+        
+        # Bullish breakout
+        if current_price > recent_high + breakout_threshold:
+            signal_strength += 0.5
+            reason += "Bullish breakout; "
+        # Bearish breakout
+        elif current_price < recent_low - breakout_threshold:
+            signal_strength -= 0.5
+            reason += "Bearish breakout; "
+        
+        # Volume confirmation
+        avg_volume = snapshot['avg_volume']
+        current_volume = snapshot['volume']
+        
+        if current_volume > avg_volume * p['volume_surge']:
+            signal_strength += 0.3
+            reason += "High volume breakout; "
+        elif current_volume < avg_volume * p['volume_dry']:
+            signal_strength -= 0.2
+            reason += "Low volume; "
+        
+        # Trend confirmation
+        if current_price > sma_20 > sma_50:
+            signal_strength += 0.2
+            reason += "Uptrend confirmation; "
+        elif current_price < sma_20 < sma_50:
+            signal_strength -= 0.2
+            reason += "Downtrend confirmation; "
+        
+        # Bollinger Bands breakout
+        if current_price > current_bb_upper:
+            signal_strength += 0.2
+            reason += "BB upper breakout; "
+        elif current_price < current_bb_lower:
+            signal_strength -= 0.2
+            reason += "BB lower breakout; "
+        
+        # Determine action
+        if signal_strength >= p['entry_strength']:
+            action = "BUY"
+            stop_loss = recent_high
+            take_profit = current_price + (current_price - recent_high) * p['reward_risk']
+        elif signal_strength <= -p['entry_strength']:
+            action = "SELL"
+            stop_loss = recent_low
+            take_profit = current_price - (recent_low - current_price) * p['reward_risk']
+        else:
+            action = "HOLD"
+            stop_loss = None
+            take_profit = None
+        
+        return Signal(
+            symbol=symbol,
+            action=action,
+            strength=abs(signal_strength),
+            price=current_price,
+            timestamp=timestamp,
+            strategy="BREAKOUT",
+            reason=reason.strip(),
+            stop_loss=stop_loss,
+            take_profit=take_profit
+        )
+
+# Strategy name -> snapshot scorer, for callers that evaluate precomputed indicators
+STRATEGY_SCORERS = {
+    "SWING": StrategyScoring.swing,
+    "MEAN_REVERSION": StrategyScoring.mean_reversion,
+    "BREAKOUT": StrategyScoring.breakout,
+}
+
+@dataclass
+class IndicatorStream:
+    """An IndicatorEngine and the timestamp of the last closed bar fed to it"""
+    engine: IndicatorEngine
+    last_time: Optional[object] = None
+
 class TradingStrategies:
     """Trading strategy implementations"""
     
-    def __init__(self):
+    def __init__(self, bar_cache: Optional[BarCache] = None, params: Optional[Dict[str, Dict]] = None,
+                 rules=None):
         self.indicators = TechnicalIndicators()
+        self.bar_cache = bar_cache or BarCache()
+        # Per-strategy overrides of STRATEGY_PARAMS, e.g. from an optimizer run
+        self.params = params or {}
+        # Incremental indicators per (symbol, interval, engine settings), fed from the bar cache
+        self.engines: Dict[Tuple, IndicatorStream] = {}
+        # Declarative strategies (strategy_dsl.RuleBook) loaded from JSON/YAML files
+        self.rules = rules
+        # Evaluated rule sub-expressions per (symbol, interval, period) bar window, shared by
+        # every rule strategy on that window until a new bar
+        self.rule_caches: Dict[Tuple[str, str, str], Tuple[tuple, Dict]] = {}
+        self._rule_cache_lock = threading.Lock()
         
     def daily_buy_strategy(self, symbol: str, timeframe: str = "1d") -> Signal:
         """
@@ -82,8 +439,7 @@ class TradingStrategies:
         """
         try:
             # Get recent data
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="5d", interval=timeframe)
+            data = self.bar_cache.get_bars(symbol, period="5d", interval=timeframe)
             
             if len(data) < 2:
                 return Signal(symbol, "HOLD", 0.0, data['Close'].iloc[-1], datetime.now(), "DAILY_BUY", "Insufficient data")
@@ -126,8 +482,7 @@ class TradingStrategies:
         """
         try:
             # Get current price
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1d", interval=timeframe)
+            data = self.bar_cache.get_bars(symbol, period="1d", interval=timeframe)
             
             if len(data) < 1:
                 return Signal(symbol, "HOLD", 0.0, 0.0, datetime.now(), "PROFIT_TAKE", "Insufficient data")
@@ -167,91 +522,30 @@ class TradingStrategies:
         """
         try:
             # Get historical data
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="30d", interval=timeframe)
+            data = self.bar_cache.get_bars(symbol, period="30d", interval=timeframe)
             
             if len(data) < 100:
                 return Signal(symbol, "HOLD", 0.0, data['Close'].iloc[-1], datetime.now(), "SWING", "Insufficient data")
             
             # Calculate indicators
+            p = strategy_params("SWING", self.params.get("SWING"))
             ma_dict = self.indicators.calculate_moving_averages(data, [20, 50, 200])
-            rsi = self.indicators.calculate_rsi(data, period=14)
+            rsi = self.indicators.calculate_rsi(data, period=p['rsi_period'])
             macd, macd_signal, macd_diff = self.indicators.calculate_macd(data)
             
-            current_price = data['Close'].iloc[-1]
-            sma_20 = ma_dict['SMA_20'].iloc[-1]
-            sma_50 = ma_dict['SMA_50'].iloc[-1]
-            sma_200 = ma_dict['SMA_200'].iloc[-1]
-            current_rsi = rsi.iloc[-1]
-            
-            # Swing trading logic
-            signal_strength = 0.0
-            action = "HOLD"
-            reason = ""
-            
-            # Trend analysis
-            if current_price > sma_20 > sma_50 > sma_200:
-                signal_strength += 0.4
-                reason += "Strong uptrend; "
-            elif current_price < sma_20 < sma_50 < sma_200:
-                signal_strength -= 0.4
-                reason += "Strong downtrend; "
-            
-            # RSI conditions
-            if 40 < current_rsi < 60:
-                signal_strength += 0.2
-                reason += "Neutral RSI; "
-            elif current_rsi < 30:
-                signal_strength += 0.3
-                reason += "Oversold RSI; "
-            elif current_rsi > 70:
-                signal_strength -= 0.3
-                reason += "Overbought RSI; "
-            
-            # MACD trend confirmation
-            if macd_diff.iloc[-1] > 0 and macd_diff.iloc[-2] < 0:
-                signal_strength += 0.3
-                reason += "MACD turning positive; "
-            elif macd_diff.iloc[-1] < 0 and macd_diff.iloc[-2] > 0:
-                signal_strength -= 0.3
-                reason += "MACD turning negative; "
-            
-            # Support/Resistance levels
-            recent_high = data['High'].rolling(20).max().iloc[-1]
-            recent_low = data['Low'].rolling(20).min().iloc[-1]
-            
-            if current_price > recent_high * 0.98:
-                signal_strength += 0.2
-                reason += "Breaking resistance; "
-            elif current_price < recent_low * 1.02:
-                signal_strength -= 0.2
-                reason += "Breaking support; "
-            
-            # Determine action
-            if signal_strength >= 0.6:
-                action = "BUY"
-                stop_loss = sma_50
-                take_profit = current_price + (current_price - sma_50) * 2
-            elif signal_strength <= -0.6:
-                action = "SELL"
-                stop_loss = sma_50
-                take_profit = current_price - (sma_50 - current_price) * 2
-            else:
-                action = "HOLD"
-                stop_loss = None
-                take_profit = None
-            
-            return Signal(
-                symbol=symbol,
-                action=action,
-                strength=abs(signal_strength),
-                price=current_price,
-                timestamp=datetime.now(),
-                strategy="SWING",
-                reason=reason.strip(),
-                stop_loss=stop_loss,
-                take_profit=take_profit
-            )
+            snapshot = {
+                'bars': len(data),
+                'price': data['Close'].iloc[-1],
+                'sma_20': ma_dict['SMA_20'].iloc[-1],
+                'sma_50': ma_dict['SMA_50'].iloc[-1],
+                'sma_200': ma_dict['SMA_200'].iloc[-1],
+                'rsi': rsi.iloc[-1],
+                'macd_diff': macd_diff.iloc[-1],
+                'macd_diff_prev': macd_diff.iloc[-2],
+                'recent_high': data['High'].rolling(p['range_window']).max().iloc[-1],
+                'recent_low': data['Low'].rolling(p['range_window']).min().iloc[-1],
+            }
+            return StrategyScoring.swing(symbol, snapshot, params=p)
             
         except Exception as e:
             logger.error(f"Error in swing trading strategy: {e}")
@@ -263,87 +557,31 @@ class TradingStrategies:
         """
         try:
             # Get historical data
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="5d", interval=timeframe)
+            data = self.bar_cache.get_bars(symbol, period="5d", interval=timeframe)
             
             if len(data) < 50:
                 return Signal(symbol, "HOLD", 0.0, data['Close'].iloc[-1], datetime.now(), "MEAN_REVERSION", "Insufficient data")
             
             # Calculate indicators
-            bb_upper, bb_lower, bb_middle = self.indicators.calculate_bollinger_bands(data)
-            rsi = self.indicators.calculate_rsi(data)
+            p = strategy_params("MEAN_REVERSION", self.params.get("MEAN_REVERSION"))
+            bb_upper, bb_lower, bb_middle = self.indicators.calculate_bollinger_bands(
+                data, period=p['bb_period'], std=p['bb_std'])
+            rsi = self.indicators.calculate_rsi(data, period=p['rsi_period'])
             stoch_k, stoch_d = self.indicators.calculate_stochastic(data)
             
-            current_price = data['Close'].iloc[-1]
-            current_bb_upper = bb_upper.iloc[-1]
-            current_bb_lower = bb_lower.iloc[-1]
-            current_bb_middle = bb_middle.iloc[-1]
-            current_rsi = rsi.iloc[-1]
-            current_stoch_k = stoch_k.iloc[-1]
-            current_stoch_d = stoch_d.iloc[-1]
-            
-            # Mean reversion logic
-            signal_strength = 0.0
-            action = "HOLD"
-            reason = ""
-            
-            # Bollinger Bands mean reversion
-            bb_position = (current_price - current_bb_lower) / (current_bb_upper - current_bb_lower)
-            
-            if bb_position < 0.1:  # Near lower band
-                signal_strength += 0.4
-                reason += "Price near lower BB; "
-            elif bb_position > 0.9:  # Near upper band
-                signal_strength -= 0.4
-                reason += "Price near upper BB; "
-            
-            # RSI mean reversion
-            if current_rsi < 30:
-                signal_strength += 0.3
-                reason += "Oversold RSI; "
-            elif current_rsi > 70:
-                signal_strength -= 0.3
-                reason += "Overbought RSI; "
-            
-            # Stochastic mean reversion
-            if current_stoch_k < 20 and current_stoch_d < 20:
-                signal_strength += 0.2
-                reason += "Oversold stochastic; "
-            elif current_stoch_k > 80 and current_stoch_d > 80:
-                signal_strength -= 0.2
-                reason += "Overbought stochastic; "
-            
-            # Volume confirmation
-            avg_volume = data['Volume'].rolling(10).mean().iloc[-1]
-            if data['Volume'].iloc[-1] > avg_volume * 1.5:
-                signal_strength += 0.1
-                reason += "High volume; "
-            
-            # Determine action
-            if signal_strength >= 0.6:
-                action = "BUY"
-                stop_loss = current_bb_lower
-                take_profit = current_bb_middle
-            elif signal_strength <= -0.6:
-                action = "SELL"
-                stop_loss = current_bb_upper
-                take_profit = current_bb_middle
-            else:
-                action = "HOLD"
-                stop_loss = None
-                take_profit = None
-            
-            return Signal(
-                symbol=symbol,
-                action=action,
-                strength=abs(signal_strength),
-                price=current_price,
-                timestamp=datetime.now(),
-                strategy="MEAN_REVERSION",
-                reason=reason.strip(),
-                stop_loss=stop_loss,
-                take_profit=take_profit
-            )
+            snapshot = {
+                'bars': len(data),
+                'price': data['Close'].iloc[-1],
+                'bb_upper': bb_upper.iloc[-1],
+                'bb_lower': bb_lower.iloc[-1],
+                'bb_middle': bb_middle.iloc[-1],
+                'rsi': rsi.iloc[-1],
+                'stoch_k': stoch_k.iloc[-1],
+                'stoch_d': stoch_d.iloc[-1],
+                'volume': data['Volume'].iloc[-1],
+                'avg_volume': data['Volume'].rolling(p['volume_window']).mean().iloc[-1],
+            }
+            return StrategyScoring.mean_reversion(symbol, snapshot, params=p)
             
         except Exception as e:
             logger.error(f"Error in mean reversion strategy: {e}")
@@ -355,112 +593,146 @@ class TradingStrategies:
         """
         try:
             # Get historical data
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="30d", interval=timeframe)
+            data = self.bar_cache.get_bars(symbol, period="30d", interval=timeframe)
             
             if len(data) < 100:
                 return Signal(symbol, "HOLD", 0.0, data['Close'].iloc[-1], datetime.now(), "BREAKOUT", "Insufficient data")
             
             # Calculate indicators
-            bb_upper, bb_lower, bb_middle = self.indicators.calculate_bollinger_bands(data)
-            atr = self.indicators.calculate_atr(data)
+            p = strategy_params("BREAKOUT", self.params.get("BREAKOUT"))
+            bb_upper, bb_lower, bb_middle = self.indicators.calculate_bollinger_bands(
+                data, period=p['bb_period'], std=p['bb_std'])
+            atr = self.indicators.calculate_atr(data, period=p['atr_period'])
             ma_dict = self.indicators.calculate_moving_averages(data, [20, 50])
             
-            current_price = data['Close'].iloc[-1]
-            current_bb_upper = bb_upper.iloc[-1]
-            current_bb_lower = bb_lower.iloc[-1]
-            current_atr = atr.iloc[-1]
-            sma_20 = ma_dict['SMA_20'].iloc[-1]
-            sma_50 = ma_dict['SMA_50'].iloc[-1]
-            
-            # Breakout logic
-            signal_strength = 0.0
-            action = "HOLD"
-            reason = ""
-            
-            # Identify support and resistance levels
-            recent_high = data['High'].rolling(20).max().iloc[-1]
-            recent_low = data['Low'].rolling(20).min().iloc[-1]
-            
-            # Breakout detection
-            breakout_threshold = current_atr * 0.5
-            
-            # Bullish breakout
-            if current_price > recent_high + breakout_threshold:
-                signal_strength += 0.5
-                reason += "Bullish breakout; "
-            # Bearish breakout
-            elif current_price < recent_low - breakout_threshold:
-                signal_strength -= 0.5
-                reason += "Bearish breakout; "
-            
-            # Volume confirmation
-            avg_volume = data['Volume'].rolling(10).mean().iloc[-1]
-            current_volume = data['Volume'].iloc[-1]
-            
-            if current_volume > avg_volume * 2:
-                signal_strength += 0.3
-                reason += "High volume breakout; "
-            elif current_volume < avg_volume * 0.5:
-                signal_strength -= 0.2
-                reason += "Low volume; "
-            
-            # Trend confirmation
-            if current_price > sma_20 > sma_50:
-                signal_strength += 0.2
-                reason += "Uptrend confirmation; "
-            elif current_price < sma_20 < sma_50:
-                signal_strength -= 0.2
-                reason += "Downtrend confirmation; "
-            
-            # Bollinger Bands breakout
-            if current_price > current_bb_upper:
-                signal_strength += 0.2
-                reason += "BB upper breakout; "
-            elif current_price < current_bb_lower:
-                signal_strength -= 0.2
-                reason += "BB lower breakout; "
-            
-            # Determine action
-            if signal_strength >= 0.7:
-                action = "BUY"
-                stop_loss = recent_high
-                take_profit = current_price + (current_price - recent_high) * 2
-            elif signal_strength <= -0.7:
-                action = "SELL"
-                stop_loss = recent_low
-                take_profit = current_price - (recent_low - current_price) * 2
-            else:
-                action = "HOLD"
-                stop_loss = None
-                take_profit = None
-            
-            return Signal(
-                symbol=symbol,
-                action=action,
-                strength=abs(signal_strength),
-                price=current_price,
-                timestamp=datetime.now(),
-                strategy="BREAKOUT",
-                reason=reason.strip(),
-                stop_loss=stop_loss,
-                take_profit=take_profit
-            )
+            snapshot = {
+                'bars': len(data),
+                'price': data['Close'].iloc[-1],
+                'bb_upper': bb_upper.iloc[-1],
+                'bb_lower': bb_lower.iloc[-1],
+                'atr': atr.iloc[-1],
+                'sma_20': ma_dict['SMA_20'].iloc[-1],
+                'sma_50': ma_dict['SMA_50'].iloc[-1],
+                'recent_high': data['High'].rolling(p['range_window']).max().iloc[-1],
+                'recent_low': data['Low'].rolling(p['range_window']).min().iloc[-1],
+                'volume': data['Volume'].iloc[-1],
+                'avg_volume': data['Volume'].rolling(p['volume_window']).mean().iloc[-1],
+            }
+            return StrategyScoring.breakout(symbol, snapshot, params=p)
             
         except Exception as e:
             logger.error(f"Error in breakout strategy: {e}")
             return Signal(symbol, "HOLD", 0.0, 0.0, datetime.now(), "BREAKOUT", f"Error: {e}")
     
+    def streaming_snapshot(self, symbol: str, strategy: str) -> Dict[str, float]:
+        """
+        Indicator snapshot for a built-in strategy from an incremental engine.
+        The engine is warmed up once from cached bars and then fed only the
+        bars that closed since the last call; the newest bar, which may still
+        be forming, is applied to a copy so it can be revised next time.
+        """
+        timeframe, period = STRATEGY_BARS[strategy]
+        p = strategy_params(strategy, self.params.get(strategy))
+        settings = {key: p[key] for key in ENGINE_KEYWORDS if key in p}
+        data = self.bar_cache.get_bars(symbol, period=period, interval=timeframe)
+        if data.empty:
+            return IndicatorEngine(**settings).snapshot()
+
+        key = (symbol, timeframe, tuple(sorted(settings.items())))
+        stream = self.engines.get(key)
+        closed = data.iloc[:-1]
+        if stream is None or (stream.last_time is not None and stream.last_time not in closed.index):
+            # First use, or the cached history no longer lines up with what was fed: start over
+            stream = self.engines[key] = IndicatorStream(IndicatorEngine(**settings))
+            new = closed
+        elif stream.last_time is None:
+            new = closed
+        else:
+            new = closed[closed.index > stream.last_time]
+        if len(new):
+            # Timed like the TechnicalIndicators calls this path replaces for the built-in strategies
+            with instruments.timer("indicators.stream_update"):
+                stream.engine.update_from_dataframe(new)
+            stream.last_time = new.index[-1]
+
+        forming = data.iloc[-1]
+        with instruments.timer("indicators.stream_preview"):
+            preview = copy.deepcopy(stream.engine)
+            return preview.update(float(forming['Open']), float(forming['High']), float(forming['Low']),
+                                  float(forming['Close']), float(forming['Volume']))
+
+    def streaming_signal(self, symbol: str, strategy: str) -> Signal:
+        """Built-in strategy signal from the incremental indicators, without recomputing the history"""
+        try:
+            return self.evaluate_snapshot(strategy, symbol, self.streaming_snapshot(symbol, strategy))
+        except Exception as e:
+            logger.error(f"Error in streaming {strategy} strategy: {e}")
+            return Signal(symbol, "HOLD", 0.0, 0.0, datetime.now(), strategy, f"Error: {e}")
+    
+    def evaluate_snapshot(self, strategy: str, symbol: str, snapshot: Dict[str, float],
+                          timestamp: Optional[datetime] = None) -> Signal:
+        """
+        Evaluate a strategy on precomputed indicator values, e.g. from a
+        streaming IndicatorEngine, without touching bar history
+        """
+        scorer = STRATEGY_SCORERS.get(strategy)
+        if scorer is None:
+            return Signal(symbol, "HOLD", 0.0, snapshot.get('price', 0.0), timestamp or datetime.now(),
+                          strategy, f"Unknown strategy: {strategy}")
+        return scorer(symbol, snapshot, timestamp, self.params.get(strategy))
+    
+    def has_rule_strategy(self, name: str) -> bool:
+        return self.rules is not None and name in self.rules
+
+    def rule_cache(self, symbol: str, interval: str, period: str, data: pd.DataFrame) -> Dict:
+        """
+        Node cache for rule strategies evaluated on these bars. Sub-expressions
+        common to several strategies are computed once per bar; each bar window
+        (interval and period) has its own cache, replaced when its bars change.
+        """
+        # The newest bar may still be forming, so its values are part of the key
+        bars = (len(data), data.index[0], data.index[-1], tuple(data.iloc[-1])) if len(data) else (0,)
+        key = (symbol, interval, period)
+        with self._rule_cache_lock:
+            cached = self.rule_caches.get(key)
+            if cached is None or cached[0] != bars:
+                cached = self.rule_caches[key] = (bars, {})
+            return cached[1]
+
+    def rule_strategy(self, symbol: str, name: str) -> Signal:
+        """Evaluate a loaded declarative (JSON/YAML) strategy on the latest bar"""
+        try:
+            strategy = self.rules[name]
+            data = self.bar_cache.get_bars(symbol, period=strategy.period, interval=strategy.interval)
+            return self.rules.signal(name, symbol, data, cache=self.rule_cache(symbol, strategy.interval, strategy.period, data))
+        except Exception as e:
+            logger.error(f"Error in rule strategy {name}: {e}")
+            return Signal(symbol, "HOLD", 0.0, 0.0, datetime.now(), name, f"Error: {e}")
+
     def custom_strategy(self, symbol: str, strategy_config: Dict) -> Signal:
         """
-        Custom strategy based on user-defined parameters
+        Custom strategy based on user-defined parameters. A config with
+        "rules" is compiled as a declarative strategy (see strategy_dsl);
+        otherwise it sets RSI thresholds.
         """
+        if 'rules' in strategy_config:
+            try:
+                from strategy_dsl import RuleBook, compile_strategy
+                rules = RuleBook([compile_strategy({'name': "CUSTOM", 'interval': '15m', 'period': '5d',
+                                                    'min_bars': 20, **strategy_config})])
+                name = rules.names[0]
+                strategy = rules[name]
+                data = self.bar_cache.get_bars(symbol, period=strategy.period, interval=strategy.interval)
+                return rules.signal(name, symbol, data, cache=self.rule_cache(symbol, strategy.interval, strategy.period, data))
+            except Exception as e:
+                logger.error(f"Error in custom strategy: {e}")
+                return Signal(symbol, "HOLD", 0.0, 0.0, datetime.now(), "CUSTOM", f"Error: {e}")
+
         try:
             # Get data based on config
-            ticker = yf.Ticker(symbol)
             period = strategy_config.get('period', '5d')
             interval = strategy_config.get('interval', '15m')
-            data = ticker.history(period=period, interval=interval)
+            data = self.bar_cache.get_bars(symbol, period=period, interval=interval)
             
             if len(data) < 20:
                 return Signal(symbol, "HOLD", 0.0, data['Close'].iloc[-1], datetime.now(), "CUSTOM", "Insufficient data")
@@ -526,26 +798,25 @@ class RiskManager:
     
     @staticmethod
     def calculate_portfolio_risk(trades: List, current_prices: Dict[str, float]) -> Dict:
-        """Calculate current portfolio risk metrics"""
-        total_value = 0
-        total_pnl = 0
-        max_drawdown = 0
+        """Calculate current portfolio risk metrics by replaying executed trades.
+        
+        One-off helper; keep a risk_engine.PortfolioRiskEngine updated on each
+        fill and price tick instead of calling this repeatedly.
+        """
+        from risk_engine import PortfolioRiskEngine
         
+        engine = PortfolioRiskEngine()
         for trade in trades:
             if trade.status == 'EXECUTED':
-                current_price = current_prices.get(trade.symbol, trade.price)
-                position_value = trade.quantity * current_price
-                position_pnl = (current_price - trade.price) * trade.quantity
-                
-                total_value += position_value
-                total_pnl += position_pnl
-                
-                if position_pnl < max_drawdown:
-                    max_drawdown = position_pnl
-        
-        return {
+                engine.on_fill(trade.symbol, trade.side, trade.quantity, trade.price)
+        engine.on_prices(current_prices)
+        
+        metrics = engine.metrics()
+        total_value = metrics['gross_exposure']
+        total_pnl = metrics['realized_pnl'] + metrics['unrealized_pnl']
+        metrics.update({
             'total_value': total_value,
             'total_pnl': total_pnl,
-            'max_drawdown': max_drawdown,
             'return_percent': (total_pnl / total_value * 100) if total_value > 0 else 0
-        }
\ No newline at end of file
+        })
+        return metrics
\ No newline at end of file